@@ -0,0 +1,96 @@
+"""Microbenchmark: magnet.parse_magnet vs the previous parse_qs/unquote code path.
+
+Run from the repository root:
+
+    python benchmarks/bench_magnet.py [results] [trackers]
+
+Each "search" parses the info hash and trackers of every result, the way the
+pipeline did before (hash via parse_qs(unquote(...)), trackers via the tr= loop).
+"""
+import os
+import random
+import sys
+import timeit
+from urllib.parse import parse_qs, quote, unquote
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from magnet import parse_magnet  # noqa: E402
+
+
+def legacy_trackers(magnet_uri):
+    query = magnet_uri.split('?')[1]
+    trackers = []
+    for part in query.split('&'):
+        if part.startswith('tr='):
+            trackers.append(unquote(part.split('=', 1)[1]))
+    out = []
+    seen = set()
+    for t in trackers:
+        t_str = t.strip()
+        if t_str and t_str not in seen:
+            out.append(t_str)
+            seen.add(t_str)
+    return out
+
+
+def legacy_hash(magnet_uri):
+    parsed = parse_qs(unquote(magnet_uri.split('?')[1]))
+    return parsed['xt'][0].split(':')[-1].lower() if 'xt' in parsed else None
+
+
+def make_magnets(count, trackers):
+    rnd = random.Random(42)
+    mags = []
+    for i in range(count):
+        info = '%040x' % rnd.getrandbits(160)
+        trs = '&'.join('tr=' + quote(f'udp://tracker{rnd.randrange(60)}.example.org:{1337 + i % 7}/announce', safe='')
+                       for _ in range(trackers))
+        mags.append(f'magnet:?xt=urn:btih:{info}&dn=Some.Show.S01E{i % 24:02d}.1080p.WEB.h264&{trs}')
+    return mags
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    trackers = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    mags = make_magnets(count, trackers)
+    # The pipeline used to parse each magnet about four times per search
+    # (hash extraction, consolidation, tracker map, feed rendering)
+    passes = 4
+
+    def legacy():
+        for _ in range(passes):
+            for m in mags:
+                legacy_hash(m)
+                legacy_trackers(m)
+
+    def legacy_once():
+        for m in mags:
+            legacy_hash(m)
+            legacy_trackers(m)
+
+    def cold():
+        parse_magnet.cache_clear()
+        for m in mags:
+            parse_magnet(m)
+
+    def warm():
+        for m in mags:
+            parse_magnet(m)
+
+    warm()
+    runs = 5
+    results = {
+        'legacy (4 passes)': min(timeit.repeat(legacy, number=1, repeat=runs)),
+        'legacy (1 pass)': min(timeit.repeat(legacy_once, number=1, repeat=runs)),
+        'parse_magnet, cold cache': min(timeit.repeat(cold, number=1, repeat=runs)),
+        'parse_magnet, warm cache': min(timeit.repeat(warm, number=1, repeat=runs)),
+    }
+    base = results['legacy (4 passes)']
+    print(f'{count} magnets x {trackers} trackers')
+    for name, seconds in results.items():
+        print(f'  {name:<26} {seconds * 1000:8.2f} ms  {base / seconds:6.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Single-pass magnet URI parsing.
+
+Search results can carry thousands of magnets with dozens of trackers each, and
+the same magnets come back on every repeated search, so parsing is done in one
+scan of the query string and memoised on the raw URI.
+"""
+from base64 import b32decode
+from functools import lru_cache
+from typing import NamedTuple, Optional, Tuple
+from urllib.parse import unquote
+
+# Distinct magnet URIs remembered by parse_magnet
+MAGNET_CACHE_SIZE = 8192
+
+# multihash prefix of a SHA-256 digest (0x12, 32 bytes) used by BitTorrent v2 btmh
+_SHA256_MULTIHASH = '1220'
+
+
+class Magnet(NamedTuple):
+    # First xt value exactly as given (unquoted), e.g. 'urn:btih:ABC...'
+    xt: Optional[str]
+    # Lowercased hex info hash: btih (base32 converted to hex), else the btmh SHA-256 digest
+    info_hash: Optional[str]
+    # Display name (dn), if any
+    name: Optional[str]
+    # Tracker URLs (tr), unquoted, stripped and de-duplicated in order
+    trackers: Tuple[str, ...]
+
+
+EMPTY_MAGNET = Magnet(None, None, None, ())
+
+
+def _btih_hex(value):
+    """Returns a btih value as lowercase hex, converting the 32-char base32 form."""
+    if len(value) == 32:
+        try:
+            return b32decode(value.upper()).hex()
+        except ValueError:
+            return value.lower()
+    return value.lower()
+
+
+@lru_cache(maxsize=MAGNET_CACHE_SIZE)
+def parse_magnet(uri):
+    """Parses xt, dn and tr from a magnet URI in a single scan of its query.
+
+    Returns EMPTY_MAGNET for values without a query string. Results are cached
+    per URI, so callers must not rely on getting a fresh object.
+    """
+    if not uri or '?' not in uri:
+        return EMPTY_MAGNET
+    xt = btih = btmh = name = None
+    trackers = []
+    seen = set()
+    for part in uri.split('?', 1)[1].split('&'):
+        key, _, value = part.partition('=')
+        if key == 'tr':
+            tracker = unquote(value).strip()
+            if tracker and tracker not in seen:
+                seen.add(tracker)
+                trackers.append(tracker)
+        elif key == 'xt' or key.startswith('xt.'):
+            value = unquote(value)
+            if not value:
+                continue
+            if xt is None:
+                xt = value
+            lowered = value.lower()
+            if btih is None and lowered.startswith('urn:btih:'):
+                btih = _btih_hex(value[9:])
+            elif btmh is None and lowered.startswith('urn:btmh:'):
+                digest = lowered[9:]
+                btmh = digest[4:] if digest.startswith(_SHA256_MULTIHASH) else digest
+        elif key == 'dn' and name is None:
+            name = unquote(value.replace('+', ' '))
+    return Magnet(xt, btih or btmh, name, tuple(trackers))
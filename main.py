@@ -1,11 +1,26 @@
 import os
 import asyncio
+import codecs
+import hashlib
+import hmac
+import json
+import random
+import sqlite3
+import time
+import zlib
+from collections import Counter, OrderedDict
 from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 import logging
+import re
 from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 import aiohttp
 from lxml import etree as ET
-from urllib.parse import urljoin, parse_qs, unquote
+from urllib.parse import urljoin
+
+from magnet import parse_magnet
+from tmdb_index import TitleIndex, build_index, export_kind
 
 app = FastAPI()
 PACHELARR_LOG_LEVEL = os.getenv("PACHELARR_LOG_LEVEL", "INFO").upper()
@@ -18,6 +33,10 @@ TORBOX_API_KEY = os.getenv("TORBOX_API_KEY")
 PACHELARR_API_KEY = os.getenv("PACHELARR_API_KEY")
 # Seed count used to boost cached items (default: 10000)
 PACHELARR_SEEDERS_BOOST = int(os.getenv("PACHELARR_SEEDERS_BOOST", "10000"))
+# Indent the Torznab XML feed (false sends it without whitespace, which is smaller)
+PACHELARR_XML_PRETTY = os.getenv("PACHELARR_XML_PRETTY", "true").lower() == "true"
+# zlib level (1-9) for gzip/deflate feed responses negotiated via Accept-Encoding (0 disables)
+PACHELARR_COMPRESSION_LEVEL = int(os.getenv("PACHELARR_COMPRESSION_LEVEL", "6"))
 
 TORBOX_CHECK_URL = os.getenv("TORBOX_CHECK_URL", "https://api.torbox.app/v1/api/torrents/checkcached")
 _configured_chunk = int(os.getenv("TORBOX_CHUNK_SIZE", "100"))
@@ -25,6 +44,17 @@ _configured_chunk = int(os.getenv("TORBOX_CHUNK_SIZE", "100"))
 TORBOX_CHUNK_SIZE = min(_configured_chunk, 100)
 TORBOX_MAX_RETRIES = int(os.getenv("TORBOX_MAX_RETRIES", "3"))
 TORBOX_RETRY_BACKOFF = float(os.getenv("TORBOX_RETRY_BACKOFF", "0.5"))
+# Maximum number of Torbox chunk requests in flight for a single cache check
+TORBOX_CONCURRENCY = int(os.getenv("TORBOX_CONCURRENCY", "4"))
+# Seconds to collect hashes from concurrent searches into shared Torbox requests while an
+# earlier batch is in flight; a lone search or a full 100-hash batch goes out at once (0 disables)
+TORBOX_BATCH_WINDOW = float(os.getenv("TORBOX_BATCH_WINDOW", "0.05"))
+# Process-wide Torbox request rate (requests/second, 0 disables) and burst size
+TORBOX_RATE_LIMIT = float(os.getenv("TORBOX_RATE_LIMIT", "5"))
+TORBOX_RATE_BURST = int(os.getenv("TORBOX_RATE_BURST", "10"))
+# Seconds a single cache check may spend waiting on rate limits and retries before
+# giving up on the remaining chunks (keeps Torbox within the search's time budget)
+TORBOX_RETRY_BUDGET = float(os.getenv("TORBOX_RETRY_BUDGET", "10"))
 TRACKER_SCRAPE_ENABLED = os.getenv("TRACKER_SCRAPE_ENABLED", "false").lower() in ("1", "true", "yes")
 TRACKER_SCRAPE_CONCURRENCY = int(os.getenv("TRACKER_SCRAPE_CONCURRENCY", "4"))
 TRACKER_SCRAPE_TIMEOUT = float(os.getenv("TRACKER_SCRAPE_TIMEOUT", "5.0"))
@@ -37,6 +67,725 @@ PACHELARR_TEST_FALLBACK_QUERY = os.getenv("PACHELARR_TEST_FALLBACK_QUERY", "")
 # Get a free key at: https://www.themoviedb.org/settings/api
 # This is REQUIRED for ID-based searches to work with indexers that don't support IDs
 TMDB_API_KEY = os.getenv("TMDB_API_KEY", "")
+# TMDB title lookups are cached per (source, id, search type): titles for TMDB_CACHE_TTL
+# seconds, "no title" answers for TMDB_CACHE_NEGATIVE_TTL, at most TMDB_CACHE_MAX_ENTRIES rows
+TMDB_CACHE_ENABLED = os.getenv("TMDB_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+TMDB_CACHE_TTL = float(os.getenv("TMDB_CACHE_TTL", "604800"))
+TMDB_CACHE_NEGATIVE_TTL = float(os.getenv("TMDB_CACHE_NEGATIVE_TTL", "3600"))
+TMDB_CACHE_MAX_ENTRIES = int(os.getenv("TMDB_CACHE_MAX_ENTRIES", "50000"))
+# TMDB client: at most TMDB_RATE_LIMIT requests/second with bursts of TMDB_RATE_BURST
+# (TMDB_RATE_LIMIT=0 disables the limiter). A 429 is retried up to TMDB_MAX_RETRIES attempts,
+# after Retry-After or a jittered TMDB_RETRY_BACKOFF, within TMDB_RETRY_BUDGET seconds.
+TMDB_RATE_LIMIT = float(os.getenv("TMDB_RATE_LIMIT", "4"))
+TMDB_RATE_BURST = int(os.getenv("TMDB_RATE_BURST", "10"))
+TMDB_MAX_RETRIES = int(os.getenv("TMDB_MAX_RETRIES", "3"))
+TMDB_RETRY_BACKOFF = float(os.getenv("TMDB_RETRY_BACKOFF", "1"))
+TMDB_RETRY_BUDGET = float(os.getenv("TMDB_RETRY_BUDGET", "5"))
+# Local state (SQLite caches) lives under this directory so it survives container restarts
+PACHELARR_DATA_DIR = os.getenv("PACHELARR_DATA_DIR", "data")
+PACHELARR_CACHE_DB = os.getenv("PACHELARR_CACHE_DB", os.path.join(PACHELARR_DATA_DIR, "pachelarr.sqlite3"))
+# Offline TMDB ID index (see tmdb_index.py). At startup it is rebuilt from the newest
+# movie_ids/tv_series_ids export files in TMDB_EXPORT_DIR when they are newer than
+# TMDB_INDEX_PATH. It answers direct TMDB IDs when the TMDB API fails or has no key.
+TMDB_EXPORT_DIR = os.getenv("TMDB_EXPORT_DIR", "")
+TMDB_INDEX_PATH = os.getenv("TMDB_INDEX_PATH", os.path.join(PACHELARR_DATA_DIR, "tmdb_titles.idx"))
+# Title warm-up: at startup (and on POST /admin/tmdb-warmup) pre-resolve the IDs in this
+# Sonarr/Radarr library export, TMDB_WARMUP_BATCH lookups every TMDB_WARMUP_INTERVAL seconds
+TMDB_WARMUP_FILE = os.getenv("TMDB_WARMUP_FILE", "")
+TMDB_WARMUP_BATCH = int(os.getenv("TMDB_WARMUP_BATCH", "5"))
+TMDB_WARMUP_INTERVAL = float(os.getenv("TMDB_WARMUP_INTERVAL", "2"))
+# Largest library export POST /admin/tmdb-warmup accepts, in bytes. The endpoint also
+# requires PACHELARR_API_KEY (X-Api-Key header or apikey parameter) and is off without it.
+TMDB_WARMUP_MAX_BODY = int(os.getenv("TMDB_WARMUP_MAX_BODY", str(32 * 1024 * 1024)))
+# Torbox cached-status cache. Positive entries (hash is cached on Torbox) rarely change,
+# negative ones can flip as soon as somebody adds the torrent, so they expire sooner.
+TORBOX_CACHE_ENABLED = os.getenv("TORBOX_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+TORBOX_CACHE_POSITIVE_TTL = float(os.getenv("TORBOX_CACHE_POSITIVE_TTL", "21600"))
+TORBOX_CACHE_NEGATIVE_TTL = float(os.getenv("TORBOX_CACHE_NEGATIVE_TTL", "1800"))
+# Expired entries are kept this long (seconds) as a fallback for when Torbox is unavailable
+TORBOX_CACHE_STALE_MAX_AGE = float(os.getenv("TORBOX_CACHE_STALE_MAX_AGE", "604800"))
+# Circuit breaker: open after this many consecutive failed (or slower than
+# TORBOX_BREAKER_LATENCY seconds) Torbox calls, then retry after TORBOX_BREAKER_RESET
+# seconds. TORBOX_BREAKER_FAILURES=0 disables the breaker.
+TORBOX_BREAKER_FAILURES = int(os.getenv("TORBOX_BREAKER_FAILURES", "5"))
+TORBOX_BREAKER_LATENCY = float(os.getenv("TORBOX_BREAKER_LATENCY", "5.0"))
+TORBOX_BREAKER_RESET = float(os.getenv("TORBOX_BREAKER_RESET", "30"))
+# Refresh-ahead: every TORBOX_REFRESH_INTERVAL seconds, re-check entries that were looked
+# up at least TORBOX_REFRESH_MIN_HITS times (decaying) and expire within TORBOX_REFRESH_AHEAD
+TORBOX_REFRESH_ENABLED = os.getenv("TORBOX_REFRESH_ENABLED", "true").lower() in ("1", "true", "yes")
+TORBOX_REFRESH_INTERVAL = float(os.getenv("TORBOX_REFRESH_INTERVAL", "60"))
+TORBOX_REFRESH_AHEAD = float(os.getenv("TORBOX_REFRESH_AHEAD", "300"))
+TORBOX_REFRESH_MIN_HITS = int(os.getenv("TORBOX_REFRESH_MIN_HITS", "2"))
+TORBOX_REFRESH_MAX_HASHES = int(os.getenv("TORBOX_REFRESH_MAX_HASHES", "1000"))
+
+# Prowlarr search-result cache: results are fresh for PROWLARR_CACHE_TTL seconds and then
+# served stale (while a background refresh runs) for another PROWLARR_CACHE_STALE_TTL seconds.
+# PROWLARR_CACHE_TTL=0 disables the cache.
+PROWLARR_CACHE_TTL = float(os.getenv("PROWLARR_CACHE_TTL", "300"))
+PROWLARR_CACHE_STALE_TTL = float(os.getenv("PROWLARR_CACHE_STALE_TTL", "600"))
+PROWLARR_CACHE_MAX_ENTRIES = int(os.getenv("PROWLARR_CACHE_MAX_ENTRIES", "256"))
+# Fan-out mode: search each enabled indexer separately and merge whatever has arrived
+# after PROWLARR_FANOUT_DEADLINE seconds, instead of waiting for the slowest indexer
+PROWLARR_FANOUT_ENABLED = os.getenv("PROWLARR_FANOUT_ENABLED", "false").lower() == "true"
+PROWLARR_FANOUT_DEADLINE = float(os.getenv("PROWLARR_FANOUT_DEADLINE", "10"))
+# Seconds between background reloads of the Prowlarr indexer list (0 disables the loop;
+# the list is then loaded once, on first use)
+PROWLARR_INDEXER_REFRESH = float(os.getenv("PROWLARR_INDEXER_REFRESH", "900"))
+# Indexer health routing: after PROWLARR_HEALTH_MIN_SAMPLES searches, an indexer whose
+# average latency (seconds), error rate (0-1) or results per search crosses these limits
+# is left out of searches, apart from one probe search every PROWLARR_HEALTH_PROBE_INTERVAL
+# seconds. PROWLARR_HEALTH_MIN_YIELD=0 disables the yield check.
+PROWLARR_HEALTH_ENABLED = os.getenv("PROWLARR_HEALTH_ENABLED", "true").lower() == "true"
+PROWLARR_HEALTH_MIN_SAMPLES = int(os.getenv("PROWLARR_HEALTH_MIN_SAMPLES", "5"))
+PROWLARR_HEALTH_MAX_LATENCY = float(os.getenv("PROWLARR_HEALTH_MAX_LATENCY", "15"))
+PROWLARR_HEALTH_MAX_ERROR_RATE = float(os.getenv("PROWLARR_HEALTH_MAX_ERROR_RATE", "0.5"))
+PROWLARR_HEALTH_MIN_YIELD = float(os.getenv("PROWLARR_HEALTH_MIN_YIELD", "0"))
+PROWLARR_HEALTH_PROBE_INTERVAL = float(os.getenv("PROWLARR_HEALTH_PROBE_INTERVAL", "300"))
+# Shared HTTP client pool: per-upstream connection limits and request timeouts (seconds),
+# plus DNS cache TTL and idle keep-alive for all upstreams
+PROWLARR_HTTP_LIMIT = int(os.getenv("PROWLARR_HTTP_LIMIT", "20"))
+PROWLARR_HTTP_TIMEOUT = float(os.getenv("PROWLARR_HTTP_TIMEOUT", "90"))
+TORBOX_HTTP_LIMIT = int(os.getenv("TORBOX_HTTP_LIMIT", "10"))
+TORBOX_HTTP_TIMEOUT = float(os.getenv("TORBOX_HTTP_TIMEOUT", "15"))
+TMDB_HTTP_LIMIT = int(os.getenv("TMDB_HTTP_LIMIT", "10"))
+TMDB_HTTP_TIMEOUT = float(os.getenv("TMDB_HTTP_TIMEOUT", "3"))
+PACHELARR_DNS_CACHE_TTL = int(os.getenv("PACHELARR_DNS_CACHE_TTL", "300"))
+PACHELARR_KEEPALIVE_TIMEOUT = float(os.getenv("PACHELARR_KEEPALIVE_TIMEOUT", "60"))
+
+# Process-wide counters, exposed via the /status endpoint
+METRICS = Counter()
+
+
+class TokenBucket:
+    """Process-wide token bucket rate limiter.
+
+    `acquire` waits for a token but gives up (returns False) rather than wait
+    past the caller's deadline. `pause_until` blocks every caller, which is how
+    an upstream Retry-After is applied to all in-flight searches at once.
+    Times are `time.monotonic()` values.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+    def pause_until(self, until):
+        self._paused_until = max(self._paused_until, until)
+
+    async def acquire(self, deadline=None):
+        while True:
+            now = time.monotonic()
+            wait = self._paused_until - now
+            if wait <= 0:
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if deadline is not None and now + wait > deadline:
+                return False
+            await asyncio.sleep(wait)
+
+
+class UpstreamClients:
+    """Application-lifetime aiohttp sessions, one per upstream.
+
+    Each upstream gets its own TCPConnector (connection limit, DNS cache,
+    keep-alive) and default timeout, so searches reuse warm connections
+    instead of paying TCP/TLS setup and DNS lookups every time. New versus
+    reused connections are counted per upstream for /status.
+    """
+
+    def __init__(self, settings):
+        # settings: name -> {'limit': int, 'timeout': seconds}
+        self.settings = settings
+        self._sessions = {}
+        self._loops = {}
+
+    def _trace_config(self, name):
+        trace = aiohttp.TraceConfig()
+
+        async def _on_request(session, ctx, params):
+            METRICS[f"http_{name}_requests"] += 1
+
+        async def _on_new_connection(session, ctx, params):
+            METRICS[f"http_{name}_connections_created"] += 1
+
+        async def _on_reused_connection(session, ctx, params):
+            METRICS[f"http_{name}_connections_reused"] += 1
+
+        trace.on_request_start.append(_on_request)
+        trace.on_connection_create_end.append(_on_new_connection)
+        trace.on_connection_reuseconn.append(_on_reused_connection)
+        return trace
+
+    def get(self, name):
+        """Return the session for `name`, creating it on first use.
+
+        Sessions are bound to the event loop they were created on; using the
+        pool from another loop raises RuntimeError until `close()` is awaited.
+        """
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(name)
+        if session is not None and not session.closed and self._loops.get(name) is not loop:
+            raise RuntimeError(f"{name} HTTP client belongs to another event loop; close the pool first")
+        if session is None or session.closed:
+            cfg = self.settings[name]
+            connector = aiohttp.TCPConnector(
+                limit=cfg['limit'],
+                ttl_dns_cache=PACHELARR_DNS_CACHE_TTL,
+                keepalive_timeout=PACHELARR_KEEPALIVE_TIMEOUT,
+            )
+            session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=cfg['timeout']),
+                trace_configs=[self._trace_config(name)],
+            )
+            self._sessions[name] = session
+            self._loops[name] = loop
+        return session
+
+    def start(self):
+        for name in self.settings:
+            self.get(name)
+
+    async def close(self):
+        sessions, self._sessions = list(self._sessions.values()), {}
+        self._loops = {}
+        for session in sessions:
+            if not session.closed:
+                await session.close()
+
+    def stats(self):
+        out = {}
+        for name, cfg in self.settings.items():
+            created = METRICS[f"http_{name}_connections_created"]
+            reused = METRICS[f"http_{name}_connections_reused"]
+            out[name] = {
+                "requests": METRICS[f"http_{name}_requests"],
+                "connections_created": created,
+                "connections_reused": reused,
+                "reuse_ratio": round(reused / (created + reused), 3) if created + reused else None,
+                "limit": cfg['limit'],
+                "timeout": cfg['timeout'],
+            }
+        return out
+
+
+HTTP_CLIENTS = UpstreamClients({
+    'prowlarr': {'limit': PROWLARR_HTTP_LIMIT, 'timeout': PROWLARR_HTTP_TIMEOUT},
+    'torbox': {'limit': TORBOX_HTTP_LIMIT, 'timeout': TORBOX_HTTP_TIMEOUT},
+    'tmdb': {'limit': TMDB_HTTP_LIMIT, 'timeout': TMDB_HTTP_TIMEOUT},
+})
+
+
+class SingleFlight:
+    """Collapses concurrent calls with the same key into one shared task.
+
+    The first caller for a key starts `factory()`; callers arriving while it
+    runs await the same task (shielded, so one caller being cancelled doesn't
+    cancel it for the rest) and get the same result or exception. With
+    `cancel_orphans`, the task is cancelled once every caller waiting on it
+    has been cancelled.
+    """
+
+    def __init__(self, name, cancel_orphans=False):
+        self.name = name
+        self.cancel_orphans = cancel_orphans
+        self._inflight = {}
+        self._waiters = Counter()
+
+    async def run(self, key, factory):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+
+            def _forget(done, key=key):
+                if self._inflight.get(key) is done:
+                    del self._inflight[key]
+
+            task.add_done_callback(_forget)
+        else:
+            METRICS[f"{self.name}_coalesced"] += 1
+        if not self.cancel_orphans:
+            return await asyncio.shield(task)
+        self._waiters[task] += 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+                task.cancel()
+
+    def __len__(self):
+        return len(self._inflight)
+
+
+def _parse_retry_after(headers):
+    """Return the Retry-After delay in seconds from response headers, or None."""
+    value = (headers or {}).get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+        return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def _retry_delay(base, attempt):
+    """Exponential backoff with jitter: somewhere in [base*2^(n-1) / 2, base*2^(n-1)]."""
+    ceiling = base * (2 ** (attempt - 1))
+    return random.uniform(ceiling / 2, ceiling)
+
+
+class CircuitBreaker:
+    """Closed / open / half-open circuit breaker for an upstream.
+
+    Calls that fail, or succeed slower than `latency_threshold` seconds, count
+    as failures. After `failure_threshold` consecutive failures the breaker
+    opens and `allow()` refuses calls for `reset_timeout` seconds; it then goes
+    half-open and lets a single probe through, whose outcome closes or re-opens
+    it. A probe that ends without an outcome (e.g. it was cancelled) must call
+    `release_probe()` so the next call can probe instead.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, name, failure_threshold, latency_threshold, reset_timeout):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.latency_threshold = latency_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def is_open(self):
+        """True while calls are being refused outright (open and not yet due for a probe)."""
+        return self.state == self.OPEN and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def allow(self):
+        if self.state == self.OPEN and not self.is_open():
+            self._transition(self.HALF_OPEN)
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def release_probe(self):
+        self._probing = False
+
+    def record_success(self, latency=0.0):
+        if self.latency_threshold and latency > self.latency_threshold:
+            logger.warning(f"{self.name} call took {latency:.2f}s (threshold {self.latency_threshold}s); counting as failure")
+            self.record_failure()
+            return
+        self.failures = 0
+        self._probing = False
+        if self.state != self.CLOSED:
+            self._transition(self.CLOSED)
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+            self._transition(self.OPEN)
+
+    def _transition(self, state):
+        logger.warning(f"{self.name} circuit breaker: {self.state} -> {state}")
+        self.state = state
+        if state == self.OPEN:
+            self.opened_at = time.monotonic()
+            METRICS[f"{self.name}_breaker_opened"] += 1
+        elif state == self.CLOSED:
+            self.opened_at = None
+
+    def snapshot(self):
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "open_for": round(time.monotonic() - self.opened_at, 1) if self.opened_at is not None else None,
+            "failure_threshold": self.failure_threshold,
+            "latency_threshold": self.latency_threshold,
+            "reset_timeout": self.reset_timeout,
+        }
+
+
+def _open_cache_db(path, ddl):
+    """Open the SQLite cache at `path` and run its `ddl`.
+
+    Creates the parent directory as needed. If the file cannot be opened the
+    cache falls back to an in-memory database rather than failing searches.
+    Writes are committed on the event loop, so the database uses WAL with
+    synchronous=NORMAL: a commit appends to the log without an fsync, and
+    only a checkpoint syncs. A power loss can drop the last few cache
+    writes, which are simply looked up again.
+    """
+    try:
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = sqlite3.connect(path, check_same_thread=False)
+    except (OSError, sqlite3.Error) as e:
+        logger.warning(f"Could not open cache database {path!r} ({e}); using an in-memory cache instead")
+        conn = sqlite3.connect(":memory:", check_same_thread=False)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+    except sqlite3.Error as e:
+        logger.warning(f"Could not enable WAL for cache database {path!r} ({e}); commits will fsync")
+    conn.execute(ddl)
+    conn.commit()
+    return conn
+
+
+class TorboxStatusCache:
+    """SQLite-backed infohash -> Torbox cached-status store.
+
+    Positive rows keep the value Torbox returned for the hash; negative rows
+    record that Torbox did not report the hash as cached. Positive and negative
+    rows use separate TTLs. The connection is opened lazily so importing the
+    module never touches the filesystem.
+    """
+
+    # SQLite builds commonly cap bound parameters at 999
+    _MAX_PARAMS = 500
+
+    def __init__(self, path, positive_ttl=TORBOX_CACHE_POSITIVE_TTL, negative_ttl=TORBOX_CACHE_NEGATIVE_TTL,
+                 stale_max_age=TORBOX_CACHE_STALE_MAX_AGE, track_access=TORBOX_REFRESH_ENABLED):
+        self.path = path
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.stale_max_age = stale_max_age
+        self._conn = None
+        self._last_prune = 0.0
+        # hash -> decaying lookup count, used to pick entries worth refreshing ahead of expiry.
+        # Only the refresh-ahead loop decays it, so without that loop nothing is counted.
+        self.track_access = track_access
+        self.access = Counter()
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = _open_cache_db(
+                self.path,
+                "CREATE TABLE IF NOT EXISTS torbox_status ("
+                "hash TEXT PRIMARY KEY, cached INTEGER NOT NULL, value TEXT, "
+                "updated REAL NOT NULL, expires REAL NOT NULL)",
+            )
+        return self._conn
+
+    def _select(self, hashes):
+        conn = self._connect()
+        rows = []
+        for i in range(0, len(hashes), self._MAX_PARAMS):
+            part = hashes[i:i+self._MAX_PARAMS]
+            marks = ",".join("?" * len(part))
+            rows.extend(conn.execute(
+                f"SELECT hash, cached, value, expires, updated FROM torbox_status WHERE hash IN ({marks})", part
+            ).fetchall())
+        return rows
+
+    def lookup(self, hashes, now=None):
+        """Split lowercased `hashes` into fresh cache answers and misses.
+
+        Returns (statuses, misses): `statuses` maps each fresh positive hash to
+        its stored value (fresh negative hashes are simply omitted, matching the
+        shape of a Torbox response), `misses` lists hashes that need a lookup,
+        in their original order.
+        """
+        now = time.time() if now is None else now
+        if self.track_access:
+            self.access.update(hashes)
+        fresh = {}
+        for h, cached, value, expires, _ in self._select(list(hashes)):
+            if expires > now:
+                fresh[h] = json.loads(value) if cached else None
+        statuses = {h: v for h, v in fresh.items() if v is not None}
+        misses = [h for h in hashes if h not in fresh]
+        return statuses, misses
+
+    def lookup_stale(self, hashes, now=None):
+        """Return the last known positive statuses for `hashes`, ignoring TTLs.
+
+        Used when Torbox can't be asked; rows older than `stale_max_age` are
+        not trusted even as a fallback.
+        """
+        now = time.time() if now is None else now
+        return {
+            h: json.loads(value)
+            for h, cached, value, _, updated in self._select(list(hashes))
+            if cached and now - updated <= self.stale_max_age
+        }
+
+    def store(self, hashes, results, now=None):
+        """Record the Torbox answer for `hashes`; hashes absent from `results` are negative."""
+        now = time.time() if now is None else now
+        rows = []
+        for h in hashes:
+            if h in results:
+                rows.append((h, 1, json.dumps(results[h], default=str), now, now + self.positive_ttl))
+            else:
+                rows.append((h, 0, None, now, now + self.negative_ttl))
+        if not rows:
+            return
+        conn = self._connect()
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO torbox_status VALUES (?, ?, ?, ?, ?)", rows)
+            # Drop rows too old to serve even as a stale fallback (at most hourly)
+            if now - self._last_prune > 3600:
+                conn.execute("DELETE FROM torbox_status WHERE updated < ?", (now - self.stale_max_age,))
+                self._last_prune = now
+
+    def refresh_candidates(self, before, min_hits):
+        """Return [(hash, expires)] for hot hashes whose entry expires before `before`.
+
+        Sorted soonest-expiring first; includes hot hashes that already expired.
+        """
+        hot = [h for h, n in self.access.items() if n >= min_hits]
+        due = [(h, expires) for h, _, _, expires, _ in self._select(hot) if expires <= before]
+        due.sort(key=lambda row: row[1])
+        return due
+
+    def decay_access(self):
+        """Halve every access count so popularity reflects recent searches."""
+        self.access = Counter({h: n // 2 for h, n in self.access.items() if n // 2})
+
+    def stats(self):
+        conn = self._connect()
+        total, positive = conn.execute("SELECT COUNT(*), COALESCE(SUM(cached), 0) FROM torbox_status").fetchone()
+        return {"path": self.path, "entries": total, "positive": positive, "negative": total - positive,
+                "tracked_hashes": len(self.access)}
+
+
+TORBOX_STATUS_CACHE = TorboxStatusCache(PACHELARR_CACHE_DB) if TORBOX_CACHE_ENABLED else None
+
+class TitleCache:
+    """SQLite-backed (source, id, search type) -> title store for TMDB lookups.
+
+    A NULL title is a negative entry: TMDB answered but knew no title for the
+    ID. Negative entries use a shorter TTL, and the table is trimmed to
+    `max_entries` rows, oldest first. Like TorboxStatusCache, the database is
+    opened lazily through _open_cache_db.
+    """
+
+    def __init__(self, path, ttl=TMDB_CACHE_TTL, negative_ttl=TMDB_CACHE_NEGATIVE_TTL,
+                 max_entries=TMDB_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = _open_cache_db(
+                self.path,
+                "CREATE TABLE IF NOT EXISTS tmdb_titles ("
+                "source TEXT NOT NULL, ident TEXT NOT NULL, search_type TEXT NOT NULL, title TEXT, "
+                "updated REAL NOT NULL, expires REAL NOT NULL, PRIMARY KEY (source, ident, search_type))",
+            )
+        return self._conn
+
+    def get(self, source, ident, search_type, now=None):
+        """Return (hit, title); `title` is None for a fresh negative entry."""
+        now = time.time() if now is None else now
+        row = self._connect().execute(
+            "SELECT title, expires FROM tmdb_titles WHERE source = ? AND ident = ? AND search_type = ?",
+            (source, str(ident), search_type),
+        ).fetchone()
+        if row is None or row[1] <= now:
+            return False, None
+        return True, row[0]
+
+    def store(self, source, ident, search_type, title, now=None):
+        now = time.time() if now is None else now
+        expires = now + (self.ttl if title else self.negative_ttl)
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO tmdb_titles VALUES (?, ?, ?, ?, ?, ?)",
+                (source, str(ident), search_type, title or None, now, expires),
+            )
+            excess = conn.execute("SELECT COUNT(*) FROM tmdb_titles").fetchone()[0] - self.max_entries
+            if excess > 0:
+                # Expired rows go first, then the least recently written
+                conn.execute(
+                    "DELETE FROM tmdb_titles WHERE rowid IN "
+                    "(SELECT rowid FROM tmdb_titles ORDER BY expires > ?, updated LIMIT ?)",
+                    (now, excess),
+                )
+
+    def stats(self):
+        total, positive = self._connect().execute(
+            "SELECT COUNT(*), COUNT(title) FROM tmdb_titles").fetchone()
+        return {"path": self.path, "entries": total, "positive": positive, "negative": total - positive,
+                "max_entries": self.max_entries}
+
+
+TMDB_TITLE_CACHE = TitleCache(PACHELARR_CACHE_DB) if TMDB_CACHE_ENABLED else None
+
+# Opened at startup by _load_tmdb_index when an index file exists
+TMDB_TITLE_INDEX = None
+
+
+def open_tmdb_index(path=TMDB_INDEX_PATH, export_dir=TMDB_EXPORT_DIR):
+    """Rebuild the offline title index if newer exports are available, then open it.
+
+    Returns a TitleIndex, or None when there is no usable index file.
+    """
+    exports = []
+    if export_dir:
+        try:
+            exports = [os.path.join(export_dir, name) for name in os.listdir(export_dir) if export_kind(name)]
+        except OSError as e:
+            logger.warning(f"Could not list TMDB exports in {export_dir!r}: {e}")
+    if exports:
+        try:
+            built = os.path.getmtime(path)
+        except OSError:
+            built = 0
+        # Daily exports pile up; only the newest file of each kind is indexed
+        latest = {}
+        for export in sorted(exports, key=os.path.getmtime):
+            latest[export_kind(export)] = export
+        if max(os.path.getmtime(export) for export in latest.values()) > built:
+            try:
+                if os.path.dirname(path):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                started = time.monotonic()
+                count = build_index(latest.values(), path)
+                logger.info(f"Built TMDB title index {path!r} with {count} titles in {time.monotonic() - started:.1f}s")
+            except (OSError, EOFError, zlib.error, ValueError) as e:
+                # ValueError covers a UnicodeDecodeError from a corrupt export; the old index is kept
+                logger.warning(f"Could not build TMDB title index from {export_dir!r}: {e}")
+    if not os.path.exists(path):
+        return None
+    try:
+        return TitleIndex(path)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not open TMDB title index {path!r}: {e}")
+        return None
+
+
+async def _load_tmdb_index():
+    global TMDB_TITLE_INDEX
+    index = await asyncio.to_thread(open_tmdb_index)
+    if index is not None:
+        TMDB_TITLE_INDEX = index
+        logger.info(f"Loaded TMDB title index with {len(index)} titles")
+
+
+TMDB_RATE_LIMITER = TokenBucket(TMDB_RATE_LIMIT, TMDB_RATE_BURST) if TMDB_RATE_LIMIT > 0 else None
+# Concurrent lookups of the same (source, id, search type) share one TMDB request
+TMDB_FLIGHTS = SingleFlight("tmdb_lookup", cancel_orphans=True)
+
+TMDB_API_URL = "https://api.themoviedb.org/3"
+# ID sources in the order lookup_title_from_id tries them, with their TMDB external_source name
+TMDB_ID_SOURCES = (('imdb', 'imdb_id'), ('tvdb', 'tvdb_id'), ('tvrage', 'tvrage_id'), ('tmdb', None))
+_TMDB_SOURCE_LABELS = {'imdb': 'IMDb', 'tvdb': 'TVDB', 'tvrage': 'TVRage', 'tmdb': 'TMDB ID'}
+
+
+def _tmdb_kind(search_type):
+    # Direct TMDB IDs are ambiguous, so the search type decides movie or TV
+    return 'movie' if search_type in ('movie', 'search') else 'tv'
+
+
+def _format_tmdb_title(result, source, kind):
+    """Return 'Title Year' (or just 'Title') for a TMDB movie or TV result."""
+    if kind == 'movie':
+        title, date = result.get('title', ''), result.get('release_date', '')
+    else:
+        title, date = result.get('name', ''), result.get('first_air_date', '')
+    if not title:
+        return None
+    year = date.split('-')[0] if date else ''
+    label = 'movie' if kind == 'movie' else 'TV show'
+    if year:
+        logger.info(f"Successfully looked up {label} via TMDB ({_TMDB_SOURCE_LABELS[source]}): {title} ({year})")
+        return f"{title} {year}"
+    logger.info(f"Successfully looked up {label} via TMDB ({_TMDB_SOURCE_LABELS[source]}): {title}")
+    return title
+
+
+async def fetch_tmdb_title(session, source, ident, search_type='movie'):
+    """Ask TMDB for the title of one external ID.
+
+    Returns the title, or None when TMDB answered without one (safe to cache).
+    Error statuses raise aiohttp.ClientResponseError and connection errors
+    propagate, so transient failures are never cached as negative.
+    """
+    external_source = dict(TMDB_ID_SOURCES)[source]
+    if source == 'imdb':
+        ident = f"tt{ident}"
+    if external_source:
+        url = f"{TMDB_API_URL}/find/{ident}?api_key={TMDB_API_KEY}&external_source={external_source}"
+        # IMDb IDs can name movies or shows; TVDB and TVRage IDs are TV only
+        kinds = ('movie', 'tv') if source == 'imdb' else ('tv',)
+    else:
+        kind = _tmdb_kind(search_type)
+        url = f"{TMDB_API_URL}/{kind}/{ident}?api_key={TMDB_API_KEY}"
+    try:
+        data = await _tmdb_get(session, url)
+    except Exception:
+        METRICS['tmdb_failures'] += 1
+        raise
+    METRICS['tmdb_successes'] += 1
+    if data is None:
+        return None
+    if not external_source:
+        return _format_tmdb_title(data, source, kind)
+    for kind in kinds:
+        results = data.get(f'{kind}_results')
+        if results:
+            return _format_tmdb_title(results[0], source, kind)
+    return None
+
+
+async def _tmdb_get(session, url):
+    """GET a TMDB API URL through TMDB_RATE_LIMITER, retrying 429 responses.
+
+    Returns the decoded JSON, or None for a 404. Other error statuses, and a
+    429 once retries or TMDB_RETRY_BUDGET run out, raise.
+    """
+    deadline = time.monotonic() + TMDB_RETRY_BUDGET
+    for attempt in range(1, max(1, TMDB_MAX_RETRIES) + 1):
+        if TMDB_RATE_LIMITER is not None and not await TMDB_RATE_LIMITER.acquire(deadline):
+            raise asyncio.TimeoutError("TMDB rate limit leaves no time for this lookup")
+        METRICS['tmdb_requests'] += 1
+        async with session.get(url) as response:
+            if response.status == 404:
+                return None
+            delay = None
+            if response.status == 429:
+                METRICS['tmdb_throttled'] += 1
+                retry_after = _parse_retry_after(getattr(response, 'headers', None))
+                if retry_after is not None and TMDB_RATE_LIMITER is not None:
+                    # Hold back every TMDB call, not just this one
+                    TMDB_RATE_LIMITER.pause_until(time.monotonic() + retry_after)
+                delay = retry_after if retry_after is not None else _retry_delay(TMDB_RETRY_BACKOFF, attempt)
+                if attempt >= TMDB_MAX_RETRIES or time.monotonic() + delay > deadline:
+                    delay = None
+            if delay is None:
+                response.raise_for_status()
+                return await response.json()
+        logger.warning(f"TMDB rate limited us; retrying in {delay:.2f}s (attempt {attempt}/{TMDB_MAX_RETRIES})")
+        await asyncio.sleep(delay)
+
 
 async def lookup_title_from_id(session, imdbid=None, tmdbid=None, tvdbid=None, rid=None, search_type='movie'):
     """Look up movie/TV title from external IDs using TMDB API.
@@ -47,122 +796,213 @@ async def lookup_title_from_id(session, imdbid=None, tmdbid=None, tvdbid=None, r
     - TVRage IDs (TV shows, deprecated)
     - Direct TMDB IDs (movies and TV shows)
     
+    Each (source, id, search type) answer, including "no title", is kept in
+    TMDB_TITLE_CACHE, so repeated searches for the same series skip TMDB.
+    Uncached IDs are looked up concurrently; the title from the highest
+    priority source wins and slower, lower priority lookups are cancelled.
+    When the TMDB ID lookup fails, or there is no API key, the offline
+    TMDB_TITLE_INDEX stands in for it in the same priority slot; its titles
+    are original-language titles without a year, so the API is preferred.
+
     Requires TMDB_API_KEY environment variable.
     Get a free API key at: https://www.themoviedb.org/settings/api
     """
     if not TMDB_API_KEY:
+        if tmdbid and TMDB_TITLE_INDEX is not None:
+            return _index_title(tmdbid, search_type)
         logger.debug("TMDB_API_KEY not configured, skipping title lookup. Set TMDB_API_KEY env var to enable ID-based search support.")
         return None
-    
+
+    ids = {'imdb': imdbid, 'tvdb': tvdbid, 'tvrage': rid, 'tmdb': tmdbid}
+    # Sources that need a TMDB call, in priority order, up to the first cached title
+    pending = []
+    fallback = None
+    for source, _ in TMDB_ID_SOURCES:
+        ident = ids[source]
+        if not ident:
+            continue
+        if TMDB_TITLE_CACHE is not None:
+            hit, title = TMDB_TITLE_CACHE.get(source, ident, search_type)
+            if hit:
+                METRICS['tmdb_cache_hits'] += 1
+                if title:
+                    fallback = title
+                    break
+                continue
+            METRICS['tmdb_cache_misses'] += 1
+        pending.append((source, ident))
+
+    # Race the remaining lookups; the first title in priority order wins
+    tasks = [asyncio.ensure_future(_resolve_tmdb_title(session, source, ident, search_type))
+             for source, ident in pending]
     try:
-        # Try IMDb ID lookup (works for both movies and TV)
-        if imdbid:
-            url = f"https://api.themoviedb.org/3/find/tt{imdbid}?api_key={TMDB_API_KEY}&external_source=imdb_id"
-            async with session.get(url, timeout=aiohttp.ClientTimeout(total=3)) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    # Check movie results first
-                    if data.get('movie_results') and len(data['movie_results']) > 0:
-                        movie = data['movie_results'][0]
-                        title = movie.get('title', '')
-                        release_date = movie.get('release_date', '')
-                        year = release_date.split('-')[0] if release_date else ''
-                        if title and year:
-                            logger.info(f"Successfully looked up movie via TMDB (IMDb): {title} ({year})")
-                            return f"{title} {year}"
-                        elif title:
-                            logger.info(f"Successfully looked up movie via TMDB (IMDb): {title}")
-                            return title
-                    # Check TV results
-                    if data.get('tv_results') and len(data['tv_results']) > 0:
-                        show = data['tv_results'][0]
-                        title = show.get('name', '')
-                        first_air = show.get('first_air_date', '')
-                        year = first_air.split('-')[0] if first_air else ''
-                        if title and year:
-                            logger.info(f"Successfully looked up TV show via TMDB (IMDb): {title} ({year})")
-                            return f"{title} {year}"
-                        elif title:
-                            logger.info(f"Successfully looked up TV show via TMDB (IMDb): {title}")
-                            return title
-        
-        # Try TVDB ID lookup (TV shows only)
-        if tvdbid:
-            url = f"https://api.themoviedb.org/3/find/{tvdbid}?api_key={TMDB_API_KEY}&external_source=tvdb_id"
-            async with session.get(url, timeout=aiohttp.ClientTimeout(total=3)) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    if data.get('tv_results') and len(data['tv_results']) > 0:
-                        show = data['tv_results'][0]
-                        title = show.get('name', '')
-                        first_air = show.get('first_air_date', '')
-                        year = first_air.split('-')[0] if first_air else ''
-                        if title and year:
-                            logger.info(f"Successfully looked up TV show via TMDB (TVDB): {title} ({year})")
-                            return f"{title} {year}"
-                        elif title:
-                            logger.info(f"Successfully looked up TV show via TMDB (TVDB): {title}")
-                            return title
-        
-        # Try TVRage ID lookup (deprecated but still supported by TMDB)
-        if rid:
-            url = f"https://api.themoviedb.org/3/find/{rid}?api_key={TMDB_API_KEY}&external_source=tvrage_id"
-            async with session.get(url, timeout=aiohttp.ClientTimeout(total=3)) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    if data.get('tv_results') and len(data['tv_results']) > 0:
-                        show = data['tv_results'][0]
-                        title = show.get('name', '')
-                        first_air = show.get('first_air_date', '')
-                        year = first_air.split('-')[0] if first_air else ''
-                        if title and year:
-                            logger.info(f"Successfully looked up TV show via TMDB (TVRage): {title} ({year})")
-                            return f"{title} {year}"
-                        elif title:
-                            logger.info(f"Successfully looked up TV show via TMDB (TVRage): {title}")
-                            return title
-        
-        # Direct TMDB ID lookup
-        if tmdbid:
-            # Determine if it's a movie or TV show based on search type
-            if search_type in ('movie', 'search'):
-                url = f"https://api.themoviedb.org/3/movie/{tmdbid}?api_key={TMDB_API_KEY}"
-                async with session.get(url, timeout=aiohttp.ClientTimeout(total=3)) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        title = data.get('title', '')
-                        release_date = data.get('release_date', '')
-                        year = release_date.split('-')[0] if release_date else ''
-                        if title and year:
-                            logger.info(f"Successfully looked up movie via TMDB (TMDB ID): {title} ({year})")
-                            return f"{title} {year}"
-                        elif title:
-                            logger.info(f"Successfully looked up movie via TMDB (TMDB ID): {title}")
-                            return title
-            else:
-                # Try as TV show
-                url = f"https://api.themoviedb.org/3/tv/{tmdbid}?api_key={TMDB_API_KEY}"
-                async with session.get(url, timeout=aiohttp.ClientTimeout(total=3)) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        title = data.get('name', '')
-                        first_air = data.get('first_air_date', '')
-                        year = first_air.split('-')[0] if first_air else ''
-                        if title and year:
-                            logger.info(f"Successfully looked up TV show via TMDB (TMDB ID): {title} ({year})")
-                            return f"{title} {year}"
-                        elif title:
-                            logger.info(f"Successfully looked up TV show via TMDB (TMDB ID): {title}")
-                            return title
-        
-        logger.debug(f"Could not lookup title for imdbid={imdbid} tmdbid={tmdbid} tvdbid={tvdbid} rid={rid}")
-        return None
+        for task in tasks:
+            title = await task
+            if title:
+                return title
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+                METRICS['tmdb_lookups_cancelled'] += 1
+    if fallback:
+        return fallback
+
+    logger.debug(f"Could not lookup title for imdbid={imdbid} tmdbid={tmdbid} tvdbid={tvdbid} rid={rid}")
+    return None
+
+
+async def _resolve_tmdb_title(session, source, ident, search_type):
+    """fetch_tmdb_title plus caching, shared by concurrent lookups of the same ID."""
+    return await TMDB_FLIGHTS.run(
+        (source, str(ident), search_type), lambda: _fetch_and_cache_title(session, source, ident, search_type))
+
+
+async def _fetch_and_cache_title(session, source, ident, search_type):
+    # Errors are logged and give None (never cached)
+    try:
+        title = await fetch_tmdb_title(session, source, ident, search_type)
     except Exception as e:
         logger.warning(f"Error looking up title from ID: {e}")
+        # Not cached either, so the API is asked again next time
+        return _index_title(ident, search_type) if source == 'tmdb' else None
+    if TMDB_TITLE_CACHE is not None:
+        TMDB_TITLE_CACHE.store(source, ident, search_type, title)
+    return title
+
+
+def _index_title(tmdbid, search_type):
+    """Title for a TMDB ID from the offline TMDB_TITLE_INDEX, or None."""
+    if TMDB_TITLE_INDEX is None:
         return None
+    title = TMDB_TITLE_INDEX.get(_tmdb_kind(search_type), tmdbid)
+    if title:
+        METRICS['tmdb_index_hits'] += 1
+        logger.info(f"Looked up title from the offline TMDB index: {title}")
+        return title
+    METRICS['tmdb_index_misses'] += 1
+    return None
+
+
+# Library export fields (lowercased) -> (lookup_title_from_id argument, title cache source)
+_LIBRARY_ID_FIELDS = (('imdbid', 'imdbid', 'imdb'), ('tvdbid', 'tvdbid', 'tvdb'),
+                      ('tvrageid', 'rid', 'tvrage'), ('tmdbid', 'tmdbid', 'tmdb'))
+
+
+def load_library_export(path):
+    """Reads a Sonarr/Radarr library export (JSON) from `path`."""
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def library_title_lookups(export):
+    """Turn a library export into lookup_title_from_id keyword sets, one per ID.
+
+    `export` is a list of Sonarr series / Radarr movies (as returned by their
+    /api/v3/series and /api/v3/movie endpoints), or an object whose list
+    values are such lists. Entries with a TVDB ID are series and looked up the
+    way Sonarr searches (t=tvsearch); the rest as movies. Every ID is resolved
+    on its own so a search carrying any one of them finds a cached title.
+    IDs already in the title cache are skipped.
+    """
+    if isinstance(export, dict):
+        export = [entry for value in export.values() if isinstance(value, list) for entry in value]
+    lookups, seen = [], set()
+    for entry in export if isinstance(export, list) else ():
+        if not isinstance(entry, dict):
+            continue
+        fields = {str(k).lower(): v for k, v in entry.items()}
+        search_type = 'tvsearch' if fields.get('tvdbid') else 'movie'
+        for field, argument, source in _LIBRARY_ID_FIELDS:
+            ident = str(fields.get(field) or '').strip()
+            if source == 'imdb' and ident.lower().startswith('tt'):
+                ident = ident[2:]
+            if not ident or ident == '0' or (source, ident, search_type) in seen:
+                continue
+            seen.add((source, ident, search_type))
+            if TMDB_TITLE_CACHE is not None and TMDB_TITLE_CACHE.get(source, ident, search_type)[0]:
+                continue
+            lookups.append({argument: ident, 'search_type': search_type})
+    return lookups
+
+
+class TitleWarmup:
+    """Pre-resolves library IDs through lookup_title_from_id so the title cache is hot.
+
+    Lookups run `batch_size` at a time with `interval` seconds between batches
+    to stay well inside TMDB's rate limit; one warm-up runs at a time.
+    """
+
+    def __init__(self, batch_size=TMDB_WARMUP_BATCH, interval=TMDB_WARMUP_INTERVAL):
+        self.batch_size = max(1, batch_size)
+        self.interval = interval
+        self.task = None
+        self.total = self.done = self.resolved = 0
+        self.started_at = self.finished_at = None
+
+    @property
+    def running(self):
+        return self.task is not None and not self.task.done()
+
+    def start(self, export, session=None):
+        """Queue the lookups for `export`; returns how many, or None if a warm-up is running."""
+        if self.running:
+            return None
+        lookups = library_title_lookups(export)
+        self.total, self.done, self.resolved = len(lookups), 0, 0
+        self.started_at, self.finished_at = time.time(), None
+        self.task = asyncio.ensure_future(self._run(lookups, session))
+        _background_tasks.append(self.task)
+        return len(lookups)
+
+    async def _run(self, lookups, session):
+        try:
+            for i in range(0, len(lookups), self.batch_size):
+                if i:
+                    await asyncio.sleep(self.interval)
+                batch = lookups[i:i+self.batch_size]
+                titles = await asyncio.gather(*(
+                    lookup_title_from_id(session or HTTP_CLIENTS.get('tmdb'), **kwargs) for kwargs in batch
+                ))
+                resolved = sum(1 for title in titles if title)
+                self.done += len(batch)
+                self.resolved += resolved
+                METRICS['tmdb_warmup_resolved'] += resolved
+                METRICS['tmdb_warmup_unresolved'] += len(batch) - resolved
+        finally:
+            self.finished_at = time.time()
+            if self.task in _background_tasks:
+                _background_tasks.remove(self.task)
+            logger.info(f"TMDB title warm-up: resolved {self.resolved}/{self.done} of {self.total} lookups")
+
+    def stats(self):
+        return {
+            "running": self.running,
+            "total": self.total,
+            "done": self.done,
+            "resolved": self.resolved,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+TMDB_WARMUP = TitleWarmup()
+
 
 async def get_all_prowlarr_indexers(session):
     """Fetches all enabled indexer IDs from Prowlarr."""
+    indexers = await fetch_prowlarr_indexers(session)
+    ids = [idx['id'] for idx in indexers or [] if idx['enabled']]
+    logger.info(f'Prowlarr: found {len(ids)} enabled indexers: {ids}')
+    return ids
+
+
+async def fetch_prowlarr_indexers(session):
+    """Fetches all indexers from Prowlarr.
+
+    Returns a list of {'id', 'name', 'enabled', 'protocol', 'capabilities'} dicts,
+    or None if Prowlarr could not be reached.
+    """
     try:
         url = urljoin(PROWLARR_URL, "/api/v1/indexer")
         headers = {"X-Api-Key": PROWLARR_API_KEY}
@@ -198,13 +1038,13 @@ async def get_all_prowlarr_indexers(session):
                         # If it's a single indexer returned as dict
                         indexers = [raw]
 
-        ids = []
+        records = []
         for idx in indexers:
             # ID field may be 'id' or 'indexerId'.
             idx_id = idx.get('id') or idx.get('indexerId') or idx.get('IndexerId')
-            # Check for enabled flags in possible names
+            # Check for enabled flags in possible names ('enable' is what Prowlarr v1 sends)
             enabled = True
-            for key in ('enabled', 'isEnabled', 'enabledByDefault', 'disabled'):
+            for key in ('enable', 'enabled', 'isEnabled', 'enabledByDefault', 'disabled'):
                 if key in idx:
                     val = idx.get(key)
                     # Disabled may be a boolean but reversed (disabled True means disabled)
@@ -213,13 +1053,206 @@ async def get_all_prowlarr_indexers(session):
                     else:
                         enabled = bool(val)
                     break
-            if idx_id and enabled:
-                ids.append(idx_id)
-        logger.info(f'Prowlarr: found {len(ids)} enabled indexers: {ids}')
-        return ids
+            if idx_id:
+                records.append({
+                    'id': idx_id,
+                    'name': idx.get('name'),
+                    'enabled': enabled,
+                    'protocol': (idx.get('protocol') or '').lower() or None,
+                    'capabilities': idx.get('capabilities') or {},
+                })
+        return records
     except aiohttp.ClientError as e:
         logger.exception("Error fetching Prowlarr indexers")
-        return []
+        return None
+
+
+class IndexerCatalogue:
+    """In-memory copy of Prowlarr's indexer list, so searches don't round-trip for it.
+
+    Loaded at startup and refreshed every PROWLARR_INDEXER_REFRESH seconds; a
+    failed refresh keeps the previous list.
+    """
+
+    def __init__(self):
+        self.indexers = {}
+        self.loaded_at = None
+        self._flight = SingleFlight("prowlarr_indexers")
+
+    @property
+    def loaded(self):
+        return self.loaded_at is not None
+
+    async def refresh(self, session):
+        """Reloads the catalogue; concurrent callers share one request. Returns True on success."""
+        return await self._flight.run('refresh', lambda: self._refresh(session))
+
+    async def _refresh(self, session):
+        records = await fetch_prowlarr_indexers(session)
+        if records is None:
+            METRICS['prowlarr_indexer_refresh_failures'] += 1
+            return False
+        self.indexers = {str(r['id']): r for r in records}
+        self.loaded_at = time.time()
+        logger.info(f"Prowlarr indexer catalogue: {len(self.enabled_ids())}/{len(records)} indexers enabled")
+        return True
+
+    async def ensure_loaded(self, session):
+        if not self.loaded:
+            await self.refresh(session)
+
+    def get(self, indexer_id):
+        return self.indexers.get(str(indexer_id))
+
+    def enabled_ids(self, protocol=None):
+        """IDs of enabled indexers, optionally only those using `protocol` (e.g. 'torrent')."""
+        return [
+            r['id'] for r in self.indexers.values()
+            if r['enabled'] and (protocol is None or r['protocol'] in (None, protocol))
+        ]
+
+    def stats(self):
+        return {
+            "indexers": len(self.indexers),
+            "enabled": len(self.enabled_ids()),
+            "loaded_at": self.loaded_at,
+        }
+
+
+PROWLARR_INDEXERS = IndexerCatalogue()
+
+
+class IndexerHealth:
+    """Per-indexer scoreboard of latency, error rate and yield, used to route searches.
+
+    Latency and errors can only be attributed to an indexer in fan-out mode; yield
+    (results per search, and Torbox-cached hits) is recorded in both modes. Averages
+    are exponentially weighted so an indexer recovers once it behaves again.
+    """
+
+    def __init__(self, min_samples, max_latency, max_error_rate, min_yield, probe_interval, alpha=0.3):
+        self.min_samples = min_samples
+        self.max_latency = max_latency
+        self.max_error_rate = max_error_rate
+        self.min_yield = min_yield
+        self.probe_interval = probe_interval
+        self.alpha = alpha
+        self.indexers = {}
+
+    def _entry(self, indexer_id):
+        key = str(indexer_id)
+        entry = self.indexers.get(key)
+        if entry is None:
+            entry = self.indexers[key] = {
+                'searches': 0, 'errors': 0, 'results': 0, 'cached': 0,
+                'latency': None, 'error_rate': 0.0, 'yield': None,
+                'probing': False, 'probed_at': None,
+            }
+        return entry
+
+    def record(self, indexer_id, results=0, latency=None, error=False):
+        """Records one search of `indexer_id`."""
+        entry = self._entry(indexer_id)
+        a = self.alpha
+        entry['searches'] += 1
+        entry['errors'] += bool(error)
+        entry['results'] += results
+        if entry['probing'] and not error:
+            # A successful probe wipes the history that got the indexer excluded
+            entry['error_rate'], entry['latency'], entry['yield'] = 0.0, latency, results
+        else:
+            entry['error_rate'] += a * (float(error) - entry['error_rate'])
+            if latency is not None:
+                entry['latency'] = latency if entry['latency'] is None else entry['latency'] + a * (latency - entry['latency'])
+            if not error:
+                entry['yield'] = results if entry['yield'] is None else entry['yield'] + a * (results - entry['yield'])
+        entry['probing'] = False
+
+    def record_results(self, indexer_ids, items):
+        """Records a search of `indexer_ids` that returned `items` (attributed by indexerId)."""
+        counts = Counter(str(item.get('indexerId')) for item in items)
+        for indexer_id in indexer_ids:
+            self.record(indexer_id, results=counts[str(indexer_id)])
+
+    def record_cached(self, items, statuses):
+        """Credits each item's indexer with the items Torbox reported as cached."""
+        for item in map(as_search_item, items):
+            if item.get('indexerId') is not None and item.hash and statuses.get(item.hash):
+                self._entry(item['indexerId'])['cached'] += 1
+
+    def unhealthy_reason(self, indexer_id):
+        entry = self.indexers.get(str(indexer_id))
+        if entry is None or entry['searches'] < self.min_samples:
+            return None
+        if entry['error_rate'] > self.max_error_rate:
+            return 'errors'
+        if self.max_latency > 0 and entry['latency'] is not None and entry['latency'] > self.max_latency:
+            return 'latency'
+        if entry['yield'] is not None and entry['yield'] < self.min_yield:
+            return 'yield'
+        return None
+
+    def has_unhealthy(self):
+        return any(self.unhealthy_reason(i) for i in self.indexers)
+
+    def route(self, indexer_ids, now=None):
+        """Returns `indexer_ids` minus unhealthy indexers that aren't due a probe.
+
+        Never returns an empty list: if every indexer is unhealthy, all are searched.
+        """
+        now = time.monotonic() if now is None else now
+        kept = []
+        for indexer_id in indexer_ids:
+            if self.unhealthy_reason(indexer_id) is None:
+                kept.append(indexer_id)
+                continue
+            entry = self._entry(indexer_id)
+            if entry['probed_at'] is None or now - entry['probed_at'] >= self.probe_interval:
+                entry['probing'], entry['probed_at'] = True, now
+                METRICS['prowlarr_indexer_probes'] += 1
+                kept.append(indexer_id)
+            else:
+                METRICS['prowlarr_indexers_skipped'] += 1
+        return kept or list(indexer_ids)
+
+    def snapshot(self):
+        return {
+            key: {
+                'searches': e['searches'],
+                'errors': e['errors'],
+                'results': e['results'],
+                'cached': e['cached'],
+                'latency': None if e['latency'] is None else round(e['latency'], 3),
+                'error_rate': round(e['error_rate'], 3),
+                'yield': None if e['yield'] is None else round(e['yield'], 2),
+                'unhealthy': self.unhealthy_reason(key),
+            }
+            for key, e in self.indexers.items()
+        }
+
+
+INDEXER_HEALTH = (
+    IndexerHealth(
+        PROWLARR_HEALTH_MIN_SAMPLES,
+        PROWLARR_HEALTH_MAX_LATENCY,
+        PROWLARR_HEALTH_MAX_ERROR_RATE,
+        PROWLARR_HEALTH_MIN_YIELD,
+        PROWLARR_HEALTH_PROBE_INTERVAL,
+    )
+    if PROWLARR_HEALTH_ENABLED
+    else None
+)
+
+
+async def _indexer_catalogue_loop():
+    while True:
+        try:
+            ok = await PROWLARR_INDEXERS.refresh(HTTP_CLIENTS.get('prowlarr'))
+        except Exception:
+            logger.exception("Prowlarr indexer catalogue refresh failed")
+            ok = False
+        # Retry a failed (or never successful) load sooner than the regular interval
+        await asyncio.sleep(PROWLARR_INDEXER_REFRESH if ok else min(PROWLARR_INDEXER_REFRESH, 60))
 
 
 def dedupe_hashes_preserve_order(hashes):
@@ -250,14 +1283,108 @@ async def torznab_proxy(request: Request):
 
     if params.get('t') in ['search', 'tvsearch', 'movie']:
         try:
-            return await handle_search(params)
+            return await handle_search(params, request.headers)
         except Exception:
             logger.exception("Unhandled error in search handler")
             return Response(status_code=500, content="Internal Server Error")
     
     return Response(status_code=400, content="Invalid request type")
 
-async def handle_search(params):
+
+@app.get("/status")
+async def status():
+    """Reports runtime counters and cache state for monitoring."""
+    return {
+        "metrics": dict(METRICS),
+        "torbox_cache": TORBOX_STATUS_CACHE.stats() if TORBOX_STATUS_CACHE is not None else None,
+        "tmdb_title_cache": TMDB_TITLE_CACHE.stats() if TMDB_TITLE_CACHE is not None else None,
+        "tmdb_warmup": TMDB_WARMUP.stats(),
+        "tmdb_lookups_in_flight": len(TMDB_FLIGHTS),
+        "tmdb_index": {"path": TMDB_TITLE_INDEX.path, "entries": len(TMDB_TITLE_INDEX)} if TMDB_TITLE_INDEX is not None else None,
+        "torbox_breaker": TORBOX_BREAKER.snapshot() if TORBOX_BREAKER is not None else None,
+        "http": HTTP_CLIENTS.stats(),
+        "prowlarr_search_cache": PROWLARR_SEARCH_CACHE.stats() if PROWLARR_SEARCH_CACHE is not None else None,
+        "searches_in_flight": len(SEARCH_FLIGHTS),
+        "prowlarr_indexers": PROWLARR_INDEXERS.stats(),
+        "indexer_health": INDEXER_HEALTH.snapshot() if INDEXER_HEALTH is not None else None,
+    }
+
+
+@app.post("/admin/tmdb-warmup")
+async def tmdb_warmup(request: Request):
+    """Starts a title warm-up from the posted library export, or else from TMDB_WARMUP_FILE.
+
+    Requires PACHELARR_API_KEY, and is disabled when it is not set. Bodies over
+    TMDB_WARMUP_MAX_BODY bytes are refused before any of them is parsed.
+    """
+    if not PACHELARR_API_KEY:
+        return JSONResponse(status_code=403, content={"error": "set PACHELARR_API_KEY to enable this endpoint"})
+    supplied = request.headers.get('x-api-key') or request.query_params.get('apikey') or ''
+    if not hmac.compare_digest(supplied.encode(), PACHELARR_API_KEY.encode()):
+        return JSONResponse(status_code=401, content={"error": "invalid API key"})
+    too_large = JSONResponse(status_code=413, content={"error": f"library export exceeds {TMDB_WARMUP_MAX_BODY} bytes"})
+    try:
+        if int(request.headers.get('content-length') or 0) > TMDB_WARMUP_MAX_BODY:
+            return too_large
+    except ValueError:
+        return JSONResponse(status_code=400, content={"error": "invalid Content-Length"})
+    # Content-Length can be absent (chunked uploads), so the cap is enforced while reading too
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > TMDB_WARMUP_MAX_BODY:
+            return too_large
+    try:
+        if body.strip():
+            export = json.loads(body)
+        elif TMDB_WARMUP_FILE:
+            export = load_library_export(TMDB_WARMUP_FILE)
+        else:
+            return JSONResponse(status_code=400, content={"error": "post a library export or set TMDB_WARMUP_FILE"})
+    except (OSError, ValueError) as e:
+        return JSONResponse(status_code=400, content={"error": f"could not read library export: {e}"})
+    queued = TMDB_WARMUP.start(export)
+    if queued is None:
+        return JSONResponse(status_code=409, content={"error": "a warm-up is already running", **TMDB_WARMUP.stats()})
+    return JSONResponse(status_code=202, content={"queued": queued})
+
+
+# Long-running maintenance tasks started with the app
+_background_tasks = []
+
+
+async def _prepare_title_lookups():
+    # Open the offline index first: it answers warm-up lookups whose TMDB call fails
+    await _load_tmdb_index()
+    if TMDB_WARMUP_FILE:
+        try:
+            export = await asyncio.to_thread(load_library_export, TMDB_WARMUP_FILE)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read library export {TMDB_WARMUP_FILE!r}: {e}")
+            return
+        queued = TMDB_WARMUP.start(export)
+        logger.info(f"TMDB title warm-up started with {queued} lookups from {TMDB_WARMUP_FILE!r}")
+
+
+@app.on_event("startup")
+async def _start_background_tasks():
+    HTTP_CLIENTS.start()
+    _background_tasks.append(asyncio.create_task(_prepare_title_lookups()))
+    if TORBOX_REFRESH_ENABLED and TORBOX_STATUS_CACHE is not None:
+        _background_tasks.append(asyncio.create_task(_torbox_refresh_loop()))
+    if PROWLARR_INDEXER_REFRESH > 0:
+        _background_tasks.append(asyncio.create_task(_indexer_catalogue_loop()))
+
+
+@app.on_event("shutdown")
+async def _stop_background_tasks():
+    for task in _background_tasks:
+        task.cancel()
+    await asyncio.gather(*_background_tasks, return_exceptions=True)
+    _background_tasks.clear()
+    await HTTP_CLIENTS.close()
+
+async def handle_search(params, request_headers=None):
     """Performs search, checks cache, and returns enriched results."""
     query = params.get('q', '')
     # Check if there are any valid identifier parameters (these are valid searches without q)
@@ -269,130 +1396,780 @@ async def handle_search(params):
         query = PACHELARR_TEST_FALLBACK_QUERY
     categories = [cat for cat in params.get('cat', '').split(',') if cat]
 
-    async with aiohttp.ClientSession() as session:
-        # We used to fetch all indexer ids and pass them to the search endpoint.
-        # Prowlarr searches all enabled indexers by default when `indexerIds` is omitted.
-        # To avoid unnecessarily large URLs and to comply with the Prowlarr API behavior,
-        # only pass indexer IDs if the caller explicitly requested them via query params
-        # (e.g., Sonarr/Radarr can send indexerIds to restrict the search).
-        indexer_ids = None
-
-        # Build search parameters for Prowlarr; include tvdbid, season, ep, rid, imdbid when present
-        search_kwargs = {
-            'query': query,
-            'categories': categories,
-            'type': params.get('t', 'search')
-        }
-        logger.info(f"Initial search_kwargs: {search_kwargs}")
-        # Pull in optional identifiers from parameters
-        for key in ('rid', 'tvdbid', 'season', 'ep', 'imdbid', 'tmdbid', 'tvmaze', 'traktid', 'doubanid'):
-            if params.get(key):
-                search_kwargs[key] = params.get(key)
-        
-        # If we have an ID but no query text, try to look up the title
-        # This helps Prowlarr work with indexers that don't support ID-based searches
-        if not query and has_identifier:
-            logger.info(f"Attempting title lookup for ID-based search: imdbid={params.get('imdbid')} tmdbid={params.get('tmdbid')} tvdbid={params.get('tvdbid')} rid={params.get('rid')}")
-            title = await lookup_title_from_id(
-                session,
-                imdbid=params.get('imdbid'),
-                tmdbid=params.get('tmdbid'),
-                tvdbid=params.get('tvdbid'),
-                rid=params.get('rid'),
-                search_type=params.get('t', 'search')
-            )
-            if title:
-                logger.info(f"Looked up title '{title}' from ID parameters")
-                query = title
-                search_kwargs['query'] = title
-            else:
-                logger.info("Title lookup failed or returned no results")
-        
-        # Include offset/limit to forward client paging requests to Prowlarr
-        if params.get('offset'):
-            search_kwargs['offset'] = params.get('offset')
-        if params.get('limit'):
-            search_kwargs['limit'] = params.get('limit')
-        # If caller included indexerIds (or indexerId), honor it and pass it through
-        if params.get('indexerIds'):
-            search_kwargs['indexerIds'] = params.get('indexerIds').split(',')
-        elif params.get('indexerId'):
-            search_kwargs['indexerIds'] = [params.get('indexerId')]
-
-        # If we don't have a query nor identifier, avoid calling Prowlarr which can return 400
-        # However, Sonarr often performs a 'test' search only with categories (no query string).
-        # Allow category-only or indexerIds-only searches to be forwarded to Prowlarr so tools like
-        # Sonarr can test the indexer and receive results (or an explicit empty result set from
-        # Prowlarr). Additionally, if an optional fallback query is configured via
-        # `PACHELARR_TEST_FALLBACK_QUERY`, use it for category-only requests so Sonarr's test
-        # returns sample results.
-        if not query and not (search_kwargs.get('categories') or search_kwargs.get('indexerIds')) and not has_identifier:
-            logger.info('No query nor identifier nor categories/indexerIds present for search; returning empty feed to avoid Prowlarr 400')
-            return Response(content=create_empty_rss(), media_type="application/xml")
-        # If we don't have a query but categories or indexerIds were provided,
-        # this is likely a category-only call (Sonarr test). If a fallback is
-        # configured, substitute it as the query and log the behavior.
-        # Don't apply fallback if we have identifiers (imdbid, tvdbid, etc.)
-        if not query and not has_identifier and ((params.get('cat') or search_kwargs.get('categories')) or (params.get('indexerIds') or search_kwargs.get('indexerId'))) and PACHELARR_TEST_FALLBACK_QUERY:
-            logger.info(f"Category-only search detected via raw params; substituting fallback query '{PACHELARR_TEST_FALLBACK_QUERY}' for test behavior")
-            # Replace the query on the parameters we will pass to Prowlarr
-            search_kwargs['query'] = PACHELARR_TEST_FALLBACK_QUERY
-            query = PACHELARR_TEST_FALLBACK_QUERY
-        # Debugging: log fallback / query state for incoming search verification
-        logger.info(f"Search debug: query={query!r} categories={search_kwargs.get('categories')!r} indexerIds={search_kwargs.get('indexerIds')!r} fallback={PACHELARR_TEST_FALLBACK_QUERY!r}")
-        logger.debug(f"search_kwargs full: {search_kwargs}")
-
-        prowlarr_results = await search_prowlarr(session, search_kwargs)
-        if not prowlarr_results:
-            return Response(content=create_empty_rss(), media_type="application/xml")
-        
-        info_hashes = extract_info_hashes(prowlarr_results)
-        if not info_hashes:
-             return Response(content=generate_torznab_xml(prowlarr_results, {}), media_type="application/xml")
+    # Application-lifetime sessions keep connections, TLS sessions and DNS results warm
+    prowlarr_session = HTTP_CLIENTS.get('prowlarr')
+    torbox_session = HTTP_CLIENTS.get('torbox')
+    # We used to fetch all indexer ids and pass them to the search endpoint.
+    # Prowlarr searches all enabled indexers by default when `indexerIds` is omitted.
+    # To avoid unnecessarily large URLs and to comply with the Prowlarr API behavior,
+    # only pass indexer IDs if the caller explicitly requested them via query params
+    # (e.g., Sonarr/Radarr can send indexerIds to restrict the search).
+    indexer_ids = None
+
+    # Build search parameters for Prowlarr; include tvdbid, season, ep, rid, imdbid when present
+    search_kwargs = {
+        'query': query,
+        'categories': categories,
+        'type': params.get('t', 'search')
+    }
+    logger.info(f"Initial search_kwargs: {search_kwargs}")
+    # Pull in optional identifiers from parameters
+    for key in ('rid', 'tvdbid', 'season', 'ep', 'imdbid', 'tmdbid', 'tvmaze', 'traktid', 'doubanid'):
+        if params.get(key):
+            search_kwargs[key] = params.get(key)
+    
+    # If we have an ID but no query text, try to look up the title
+    # This helps Prowlarr work with indexers that don't support ID-based searches
+    if not query and has_identifier:
+        logger.info(f"Attempting title lookup for ID-based search: imdbid={params.get('imdbid')} tmdbid={params.get('tmdbid')} tvdbid={params.get('tvdbid')} rid={params.get('rid')}")
+        title = await lookup_title_from_id(
+            HTTP_CLIENTS.get('tmdb'),
+            imdbid=params.get('imdbid'),
+            tmdbid=params.get('tmdbid'),
+            tvdbid=params.get('tvdbid'),
+            rid=params.get('rid'),
+            search_type=params.get('t', 'search')
+        )
+        if title:
+            logger.info(f"Looked up title '{title}' from ID parameters")
+            query = title
+            search_kwargs['query'] = title
+        else:
+            logger.info("Title lookup failed or returned no results")
+    
+    # Include offset/limit to forward client paging requests to Prowlarr
+    if params.get('offset'):
+        search_kwargs['offset'] = params.get('offset')
+    if params.get('limit'):
+        search_kwargs['limit'] = params.get('limit')
+    # If caller included indexerIds (or indexerId), honor it and pass it through
+    if params.get('indexerIds'):
+        search_kwargs['indexerIds'] = params.get('indexerIds').split(',')
+    elif params.get('indexerId'):
+        search_kwargs['indexerIds'] = [params.get('indexerId')]
+
+    # If we don't have a query nor identifier, avoid calling Prowlarr which can return 400
+    # However, Sonarr often performs a 'test' search only with categories (no query string).
+    # Allow category-only or indexerIds-only searches to be forwarded to Prowlarr so tools like
+    # Sonarr can test the indexer and receive results (or an explicit empty result set from
+    # Prowlarr). Additionally, if an optional fallback query is configured via
+    # `PACHELARR_TEST_FALLBACK_QUERY`, use it for category-only requests so Sonarr's test
+    # returns sample results.
+    if not query and not (search_kwargs.get('categories') or search_kwargs.get('indexerIds')) and not has_identifier:
+        logger.info('No query nor identifier nor categories/indexerIds present for search; returning empty feed to avoid Prowlarr 400')
+        return Response(content=create_empty_rss(), media_type="application/xml")
+    # If we don't have a query but categories or indexerIds were provided,
+    # this is likely a category-only call (Sonarr test). If a fallback is
+    # configured, substitute it as the query and log the behavior.
+    # Don't apply fallback if we have identifiers (imdbid, tvdbid, etc.)
+    if not query and not has_identifier and ((params.get('cat') or search_kwargs.get('categories')) or (params.get('indexerIds') or search_kwargs.get('indexerId'))) and PACHELARR_TEST_FALLBACK_QUERY:
+        logger.info(f"Category-only search detected via raw params; substituting fallback query '{PACHELARR_TEST_FALLBACK_QUERY}' for test behavior")
+        # Replace the query on the parameters we will pass to Prowlarr
+        search_kwargs['query'] = PACHELARR_TEST_FALLBACK_QUERY
+        query = PACHELARR_TEST_FALLBACK_QUERY
+    # Debugging: log fallback / query state for incoming search verification
+    logger.info(f"Search debug: query={query!r} categories={search_kwargs.get('categories')!r} indexerIds={search_kwargs.get('indexerIds')!r} fallback={PACHELARR_TEST_FALLBACK_QUERY!r}")
+    logger.debug(f"search_kwargs full: {search_kwargs}")
 
-        cached_status = await check_torbox_cache(session, info_hashes)
-        
-        # Consolidate duplicates for all items (cached & uncached) and optionally scrape trackers
-        consolidated_results = consolidate_all_items(prowlarr_results, cached_status)
-        # Log consolidation counts for debug/verification
+    # Identical concurrent searches (e.g. Sonarr's "search all missing") share one pipeline run
+    feed = await SEARCH_FLIGHTS.run(
+        canonical_search_key(search_kwargs),
+        lambda: _run_search_pipeline(prowlarr_session, torbox_session, search_kwargs),
+    )
+    return feed_response(feed, request_headers)
+
+
+class TorznabFeed:
+    """Search pipeline output, rendered to XML per response (see iter_torznab_xml).
+
+    Coalesced requests share one instance and each stream their own rendering;
+    `items` is None for an empty feed. Items without a publish date are dated
+    `created`, so every rendering, and the ETag, carries the same pubDate.
+    """
+
+    __slots__ = ('items', 'cached_status', 'uncached_seeders', 'headers', 'created', '_etag')
+
+    def __init__(self, items=None, cached_status=None, uncached_seeders=None, headers=None):
+        self.items = items
+        self.cached_status = cached_status or {}
+        self.uncached_seeders = uncached_seeders or {}
+        self.headers = headers
+        self.created = datetime.now(timezone.utc)
+        self._etag = None
+
+    def iter_xml(self):
+        if self.items is None:
+            return iter((create_empty_rss(),))
+        return iter_torznab_xml(self.items, self.cached_status, self.uncached_seeders, published=self.created)
+
+    def etag(self):
+        """Weak ETag over everything the rendered feed depends on, computed without rendering it."""
+        if self._etag is None:
+            digest = hashlib.blake2b(digest_size=16)
+            digest.update(b'pretty' if PACHELARR_XML_PRETTY else b'compact')
+            undated = False
+            for item in self.items or ():
+                key = getattr(item, 'hash', None)
+                undated = undated or getattr(item, 'published', None) is None
+                digest.update(repr((
+                    list(item.items()), self.cached_status.get(key), self.uncached_seeders.get(key),
+                )).encode())
+            if undated:
+                # Rendered as the pubDate of those items
+                digest.update(self.created.isoformat().encode())
+            if self.items is None:
+                digest.update(b'empty')
+            self._etag = f'W/"{digest.hexdigest()}"'
+        return self._etag
+
+
+def _negotiate_encoding(accept_encoding):
+    """Picks 'gzip' or 'deflate' from an Accept-Encoding header, or None for identity."""
+    if not accept_encoding or PACHELARR_COMPRESSION_LEVEL <= 0:
+        return None
+    weights = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.partition(';')
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[name.strip().lower()] = q
+    best, best_q = None, 0.0
+    for encoding in ('gzip', 'deflate'):
+        q = weights.get(encoding, weights.get('*', 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def _compress_chunks(chunks, encoding):
+    # gzip framing via wbits=16+MAX_WBITS; HTTP "deflate" is the zlib format
+    wbits = 16 + zlib.MAX_WBITS if encoding == 'gzip' else zlib.MAX_WBITS
+    compressor = zlib.compressobj(PACHELARR_COMPRESSION_LEVEL, zlib.DEFLATED, wbits)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    # Weak comparison, as required for If-None-Match
+    opaque = etag[2:] if etag.startswith('W/') else etag
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if (candidate[2:] if candidate.startswith('W/') else candidate) == opaque:
+            return True
+    return False
+
+
+def feed_response(feed, request_headers=None):
+    """Builds the HTTP response for a TorznabFeed.
+
+    Answers If-None-Match with 304 when the feed's ETag matches, and otherwise
+    streams the XML, compressed as negotiated through Accept-Encoding.
+    """
+    request_headers = request_headers or {}
+    etag = feed.etag()
+    headers = dict(feed.headers or {})
+    headers['ETag'] = etag
+    headers['Vary'] = 'Accept-Encoding'
+    if _etag_matches(request_headers.get('if-none-match'), etag):
+        METRICS['feed_not_modified'] += 1
+        return Response(status_code=304, headers=headers)
+    body = feed.iter_xml()
+    encoding = _negotiate_encoding(request_headers.get('accept-encoding'))
+    if encoding:
+        METRICS[f'feed_{encoding}'] += 1
+        headers['Content-Encoding'] = encoding
+        body = _compress_chunks(body, encoding)
+    return StreamingResponse(body, media_type="application/xml", headers=headers)
+
+
+async def _run_search_pipeline(prowlarr_session, torbox_session, search_kwargs):
+    """Search Prowlarr, check Torbox and consolidate the results into a TorznabFeed."""
+    prowlarr_results = await cached_search_prowlarr(prowlarr_session, search_kwargs)
+    if not prowlarr_results:
+        return TorznabFeed()
+    
+    info_hashes = extract_info_hashes(prowlarr_results)
+    if not info_hashes:
+         return TorznabFeed(prowlarr_results)
+
+    cached_status = await check_torbox_cache(torbox_session, info_hashes)
+    if INDEXER_HEALTH is not None:
+        INDEXER_HEALTH.record_cached(prowlarr_results, cached_status)
+    
+    # Consolidate duplicates for all items (cached & uncached) and optionally scrape trackers
+    consolidated_results = consolidate_all_items(prowlarr_results, cached_status)
+    # Log consolidation counts for debug/verification
+    try:
+        total_items = len(prowlarr_results)
+        consolidated_count = len(consolidated_results)
+        dup_removed = total_items - consolidated_count
+        if dup_removed:
+            logger.debug(f"Consolidated results: total_items={total_items} consolidated_count={consolidated_count} dedupe_removed={dup_removed}")
+    except Exception:
+        pass
+    uncached_seeders = {}
+    if TRACKER_SCRAPE_ENABLED:
+        # Build tracker->hash list mapping
+        tracker_map = {}
+        for item in consolidated_results:
+            # only uncached
+            if not item.hash or cached_status.get(item.hash):
+                continue
+            for tr in item.trackers:
+                tracker_map.setdefault(tr, []).append(item.hash)
+        if tracker_map:
+            uncached_seeders = await scrape_trackers_inverted(tracker_map)
+    headers = None
+    stale = getattr(cached_status, 'stale', None)
+    if stale:
+        # Cached flags partly come from expired entries because Torbox was unavailable
+        headers = {"X-Pachelarr-Stale": str(len(stale))}
+    return TorznabFeed(consolidated_results, cached_status, uncached_seeders, headers)
+
+def canonical_search_key(search_kwargs):
+    """Return a hashable canonical form of `search_kwargs`.
+
+    Query text is lowercased with whitespace collapsed, list values (categories,
+    indexerIds) are sorted, and empty values are dropped, so equivalent searches
+    from Sonarr/Radarr map to the same key.
+    """
+    parts = []
+    for k in sorted(search_kwargs):
+        v = search_kwargs[k]
+        if v is None or v == '' or v == []:
+            continue
+        if k == 'query':
+            v = ' '.join(str(v).lower().split())
+        elif isinstance(v, (list, tuple, set)):
+            v = tuple(sorted(str(x).strip() for x in v))
+        else:
+            v = str(v).strip().lower()
+        parts.append((k, v))
+    return tuple(parts)
+
+
+class SearchResultCache:
+    """Bounded LRU cache of Prowlarr search results with stale-while-revalidate.
+
+    Entries younger than `ttl` are fresh. Until `ttl + stale_ttl` they are
+    still served, but the caller should trigger a background refresh.
+    """
+
+    def __init__(self, ttl, stale_ttl, max_entries):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max(1, max_entries)
+        self._entries = OrderedDict()
+        self.refreshing = set()
+
+    def get(self, key, now=None):
+        """Return (results, is_fresh), or (None, False) if missing or too old."""
+        now = time.monotonic() if now is None else now
+        entry = self._entries.get(key)
+        if entry is None:
+            return None, False
+        results, stored = entry
+        age = now - stored
+        if age > self.ttl + self.stale_ttl:
+            del self._entries[key]
+            return None, False
+        self._entries.move_to_end(key)
+        return results, age <= self.ttl
+
+    def put(self, key, results, now=None):
+        self._entries[key] = (results, time.monotonic() if now is None else now)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        return {"entries": len(self._entries), "refreshing": len(self.refreshing)}
+
+
+# canonical search key -> shared pipeline run for identical concurrent searches
+SEARCH_FLIGHTS = SingleFlight("search")
+
+PROWLARR_SEARCH_CACHE = (
+    SearchResultCache(PROWLARR_CACHE_TTL, PROWLARR_CACHE_STALE_TTL, PROWLARR_CACHE_MAX_ENTRIES)
+    if PROWLARR_CACHE_TTL > 0 else None
+)
+# Strong references to in-flight background refreshes so they aren't garbage collected
+_search_refresh_tasks = set()
+
+
+async def cached_search_prowlarr(session, search_kwargs):
+    """`search_prowlarr` behind PROWLARR_SEARCH_CACHE (stale-while-revalidate).
+
+    Returns a new list each time; callers must treat the items as read-only
+    since they are shared with the cache.
+    """
+    cache = PROWLARR_SEARCH_CACHE
+    if cache is None:
+        return await search_prowlarr(session, search_kwargs)
+    key = canonical_search_key(search_kwargs)
+    results, fresh = cache.get(key)
+    if results is not None:
+        if fresh:
+            METRICS['prowlarr_cache_hits'] += 1
+        else:
+            METRICS['prowlarr_cache_stale_hits'] += 1
+            if key not in cache.refreshing:
+                cache.refreshing.add(key)
+                task = asyncio.create_task(_refresh_search_cache(session, key, dict(search_kwargs)))
+                _search_refresh_tasks.add(task)
+                task.add_done_callback(_search_refresh_tasks.discard)
+        logger.debug(f"Prowlarr search cache {'hit' if fresh else 'stale hit'}: {key}")
+        return list(results)
+    METRICS['prowlarr_cache_misses'] += 1
+    results = await query_prowlarr(session, search_kwargs)
+    # Empty results are also what errors look like, and a fan-out with late indexers
+    # is incomplete; don't pin either in the cache
+    if results and not getattr(results, 'late', None):
+        cache.put(key, results)
+    return list(results) if results else results
+
+
+async def _refresh_search_cache(session, key, search_kwargs):
+    try:
+        results = await query_prowlarr(session, search_kwargs)
+        if results and not getattr(results, 'late', None):
+            PROWLARR_SEARCH_CACHE.put(key, results)
+            METRICS['prowlarr_cache_refreshes'] += 1
+    except Exception:
+        logger.exception("Background Prowlarr search refresh failed")
+    finally:
+        PROWLARR_SEARCH_CACHE.refreshing.discard(key)
+
+
+class ProwlarrResults(list):
+    """Prowlarr search results with delivery details.
+
+    `.late` holds fan-out indexer IDs that missed the deadline; `.failed` is set
+    when the search request itself failed.
+    """
+
+    def __init__(self, items=(), late=(), failed=False):
+        super().__init__(items)
+        self.late = set(late)
+        self.failed = failed
+
+
+async def query_prowlarr(session, search_kwargs):
+    """Searches Prowlarr, per indexer when PROWLARR_FANOUT_ENABLED is set.
+
+    Unhealthy indexers are left out of the search (see IndexerHealth).
+    """
+    health = INDEXER_HEALTH
+    if health is not None:
+        search_kwargs = await _route_healthy_indexers(session, health, search_kwargs)
+    if PROWLARR_FANOUT_ENABLED:
+        return await fanout_search_prowlarr(session, search_kwargs)
+    results = await search_prowlarr(session, search_kwargs)
+    if health is not None and not getattr(results, 'failed', False):
+        searched = search_kwargs.get('indexerIds') or PROWLARR_INDEXERS.enabled_ids(protocol='torrent')
+        health.record_results(searched, results)
+    return results
+
+
+async def _route_healthy_indexers(session, health, search_kwargs):
+    """Returns search_kwargs with unhealthy indexers removed from indexerIds.
+
+    Searches without indexerIds are narrowed to the catalogue's healthy torrent
+    indexers. Prowlarr only accepts up to 20 indexerIds (see search_prowlarr), so
+    larger lists still search every indexer outside fan-out mode.
+    """
+    if not health.has_unhealthy():
+        return search_kwargs
+    indexer_ids = list(search_kwargs.get('indexerIds') or [])
+    if not indexer_ids:
+        await PROWLARR_INDEXERS.ensure_loaded(session)
+        indexer_ids = PROWLARR_INDEXERS.enabled_ids(protocol='torrent')
+    kept = health.route(indexer_ids)
+    if len(kept) == len(indexer_ids):
+        return search_kwargs
+    logger.info(f"Skipping unhealthy indexers {[i for i in indexer_ids if i not in kept]}")
+    return dict(search_kwargs, indexerIds=kept)
+
+
+async def _timed(coro):
+    started = time.monotonic()
+    result = await coro
+    return result, time.monotonic() - started
+
+
+async def fanout_search_prowlarr(session, search_kwargs, deadline=None):
+    """Searches each indexer concurrently and merges what arrived within `deadline` seconds.
+
+    Without explicit indexerIds, all enabled torrent indexers from the catalogue
+    are searched. Indexers still running at the deadline are cancelled, counted
+    in METRICS and reported in the result's `.late` set.
+    """
+    if deadline is None:
+        deadline = PROWLARR_FANOUT_DEADLINE
+    indexer_ids = list(search_kwargs.get('indexerIds') or [])
+    if not indexer_ids:
+        await PROWLARR_INDEXERS.ensure_loaded(session)
+        # Usenet indexers have no info hashes for Torbox to check
+        indexer_ids = PROWLARR_INDEXERS.enabled_ids(protocol='torrent')
+    if not indexer_ids:
+        return await search_prowlarr(session, search_kwargs)
+
+    tasks = {}
+    for idx_id in indexer_ids:
+        kwargs = dict(search_kwargs, indexerIds=[idx_id])
+        tasks[asyncio.create_task(_timed(search_prowlarr(session, kwargs)))] = idx_id
+    try:
+        done, pending = await asyncio.wait(tasks, timeout=deadline)
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+    health = INDEXER_HEALTH
+    merged = []
+    # Merge in indexer order so the feed doesn't depend on who answered first
+    for task, idx_id in tasks.items():
+        if task not in done:
+            if health is not None:
+                health.record(idx_id, latency=deadline, error=True)
+            continue
+        if task.exception() is not None:
+            METRICS['prowlarr_fanout_errors'] += 1
+            logger.warning(f"Prowlarr fan-out search failed for indexer {idx_id}: {task.exception()!r}")
+            if health is not None:
+                health.record(idx_id, error=True)
+            continue
+        items, latency = task.result()
+        if health is not None:
+            health.record(idx_id, len(items or []), latency, error=getattr(items, 'failed', False))
+        merged.extend(items or [])
+    late = [tasks[task] for task in pending]
+    METRICS['prowlarr_fanout_searches'] += 1
+    if late:
+        METRICS['prowlarr_fanout_late'] += len(late)
+        for idx_id in late:
+            METRICS[f'prowlarr_indexer_late:{idx_id}'] += 1
+        logger.info(f"Prowlarr fan-out: {len(late)}/{len(tasks)} indexers missed the {deadline}s deadline: {late}")
+    return ProwlarrResults(merged, late)
+
+
+# The only Prowlarr item fields read downstream (feed rendering, consolidation,
+# tracker scraping and indexer health); everything else is dropped at ingest
+PROWLARR_ITEM_FIELDS = (
+    'title', 'infoHash', 'guid', 'magnetUri', 'magnetUrl', 'enclosure', 'link',
+    'size', 'seeders', 'leechers', 'publishDate', 'pubDate', 'date', 'indexerId',
+)
+
+
+_MISSING = object()
+
+
+def _parse_publish_date(raw):
+    """Parses a Prowlarr publish date (ISO 8601) to an aware datetime, or None."""
+    if not raw:
+        return None
+    try:
+        # Prowlarr typically uses ISO8601 like: 2025-05-10T16:57:09Z
+        # Parse naive Z-terminated UTC timestamps
+        dt = datetime.strptime(raw, "%Y-%m-%dT%H:%M:%SZ")
+        return dt.replace(tzinfo=timezone.utc)
+    except Exception:
         try:
-            total_items = len(prowlarr_results)
-            consolidated_count = len(consolidated_results)
-            dup_removed = total_items - consolidated_count
-            if dup_removed:
-                logger.debug(f"Consolidated results: total_items={total_items} consolidated_count={consolidated_count} dedupe_removed={dup_removed}")
+            # Fall back to fromisoformat for other ISO variants
+            dt = datetime.fromisoformat(raw)
+            if dt.tzinfo is None:
+                dt = dt.replace(tzinfo=timezone.utc)
+            return dt
         except Exception:
-            pass
-        uncached_seeders = {}
-        if TRACKER_SCRAPE_ENABLED:
-            # Build tracker->hash list mapping
-            tracker_map = {}
-            for item in consolidated_results:
-                # only uncached
-                info_hash = item.get('infoHash')
-                ih = info_hash.lower() if info_hash else None
-                if not info_hash:
-                    # attempt magnet parse from magnetUri, guid or enclosure
-                    try:
-                        mag = _get_magnet_uri_for_item(item)
-                        if not mag:
-                            continue
-                        parsed_magnet = parse_qs(unquote(mag.split('?')[1]))
-                        if 'xt' in parsed_magnet:
-                            info_hash = parsed_magnet['xt'][0].split(':')[-1]
-                            ih = info_hash.lower() if info_hash else None
-                    except Exception:
-                        continue
-                if not info_hash or cached_status.get(info_hash.lower()):
+            return None
+
+
+def _parse_seeders(raw):
+    try:
+        return int(raw or 0)
+    except Exception:
+        return 0
+
+
+class _ItemMapping:
+    """Read-only dict protocol shared by SearchItem and ConsolidatedItem, built on get()."""
+
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def keys(self):
+        return list(self)
+
+    def items(self):
+        return [(k, self.get(k)) for k in self]
+
+    def as_dict(self):
+        return dict(self.items())
+
+    def __eq__(self, other):
+        if isinstance(other, (_ItemMapping, dict)):
+            return self.as_dict() == dict(other.items())
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.as_dict()!r})"
+
+
+class SearchItem(_ItemMapping):
+    """A Prowlarr search result, normalised once when it is received.
+
+    Holds the PROWLARR_ITEM_FIELDS as slots plus values derived from them in a
+    single pass: `hash` (lowercased info hash, from infoHash or the magnet's xt),
+    `magnet` (the magnet URI from magnetUri, guid or enclosure), `xt`, `trackers`
+    (tuple, in magnet order), `seed_count` (int) and `published` (datetime or None).
+
+    Reads and writes also work dict-style (`item['title']`, `item.get('guid')`),
+    so code written against raw Prowlarr dicts keeps working; writing a source
+    field re-derives the values that depend on it.
+    """
+
+    __slots__ = PROWLARR_ITEM_FIELDS + ('hash', 'magnet', 'xt', 'trackers', 'seed_count', 'published')
+    _MAGNET_FIELDS = frozenset(('infoHash', 'magnetUri', 'guid', 'enclosure'))
+
+    def __init__(self, fields=None):
+        fields = fields or {}
+        for k in PROWLARR_ITEM_FIELDS:
+            setattr(self, k, fields.get(k, _MISSING))
+        self._derive_magnet()
+        self.seed_count = _parse_seeders(self.get('seeders'))
+        self.published = _parse_publish_date(self.get('publishDate') or self.get('pubDate') or self.get('date'))
+
+    def _derive_magnet(self):
+        self.magnet = _get_magnet_uri_for_item(self)
+        parsed = parse_magnet(self.magnet)
+        self.xt, self.trackers = parsed.xt, parsed.trackers
+        # Non-btih/btmh xt values fall back to their last segment, as before
+        info = self.get('infoHash') or parsed.info_hash or (self.xt.split(':')[-1] if self.xt else None)
+        self.hash = info.strip().lower() if isinstance(info, str) and info.strip() else None
+
+    def raw_hash(self):
+        """The info hash as Prowlarr sent it (original case), or None."""
+        return self.get('infoHash') or (self.xt.split(':')[-1] if self.xt else None)
+
+    # dict-style access to the Prowlarr fields
+    def get(self, key, default=None):
+        value = getattr(self, key, _MISSING) if key in PROWLARR_ITEM_FIELDS else _MISSING
+        return default if value is _MISSING else value
+
+    def __setitem__(self, key, value):
+        if key not in PROWLARR_ITEM_FIELDS:
+            raise KeyError(key)
+        setattr(self, key, value)
+        if key == 'seeders':
+            self.seed_count = _parse_seeders(value)
+        elif key in self._MAGNET_FIELDS:
+            self._derive_magnet()
+        elif key in ('publishDate', 'pubDate', 'date'):
+            self.published = _parse_publish_date(self.get('publishDate') or self.get('pubDate') or self.get('date'))
+
+    def __iter__(self):
+        return (k for k in PROWLARR_ITEM_FIELDS if getattr(self, k) is not _MISSING)
+
+
+class ConsolidatedItem(_ItemMapping):
+    """The canonical result for one info hash: a SearchItem seen through overrides.
+
+    Consolidation's changes (merged magnetUri/guid, adjusted seeders) live in a
+    small overlay dict, so the base item, which may be shared with the search
+    cache, is never copied or modified. Everything else reads through to it.
+    """
+
+    __slots__ = ('base', 'overrides', 'hash', 'magnet', 'trackers', 'seed_count')
+
+    def __init__(self, base, magnet, trackers, seeders=None):
+        self.base = base
+        self.overrides = {'magnetUri': magnet, 'guid': magnet}
+        self.hash = base.hash
+        self.magnet = magnet
+        self.trackers = tuple(trackers)
+        self.seed_count = base.seed_count
+        if seeders is not None:
+            self['seeders'] = seeders
+
+    def __getattr__(self, name):
+        # xt, published, raw_hash() and the raw field slots come from the base item
+        return getattr(self.base, name)
+
+    def get(self, key, default=None):
+        if key in self.overrides:
+            return self.overrides[key]
+        return self.base.get(key, default)
+
+    def __setitem__(self, key, value):
+        if key not in PROWLARR_ITEM_FIELDS:
+            raise KeyError(key)
+        self.overrides[key] = value
+        if key == 'seeders':
+            self.seed_count = _parse_seeders(value)
+        elif key in SearchItem._MAGNET_FIELDS:
+            self.magnet = _get_magnet_uri_for_item(self)
+            self.trackers = parse_magnet(self.magnet).trackers
+
+    def __iter__(self):
+        return (k for k in PROWLARR_ITEM_FIELDS if k in self.overrides or k in self.base)
+
+
+class ConsolidatedResults(list):
+    """Output of consolidate_all_items: one item per info hash, plus hashless items."""
+
+
+def as_search_item(item):
+    """Returns `item` as a SearchItem, converting plain Prowlarr dicts."""
+    return item if isinstance(item, _ItemMapping) else SearchItem(item)
+
+
+def project_prowlarr_item(item):
+    """Converts a Prowlarr search item to a SearchItem holding only PROWLARR_ITEM_FIELDS.
+
+    Nested payload such as `categories`, `indexerFlags` or `infoUrl` is never
+    kept, so per-item memory and copy cost don't grow with Prowlarr's schema.
+    """
+    if not isinstance(item, dict):
+        return item
+    return SearchItem(item)
+
+
+_JSON_WS = re.compile(r'[ \t\n\r]*')
+# Bytes read from the response stream at a time when decoding JSON incrementally
+_JSON_CHUNK_SIZE = 64 * 1024
+
+
+class JSONArrayStream:
+    """Async iterator over the elements of a top-level JSON array read from `chunks`.
+
+    `chunks` is an async iterable of UTF-8 bytes; elements are yielded as soon as
+    they are decoded and only the not-yet-decoded tail of the body is buffered.
+    If the body isn't an array, nothing is yielded and the decoded document is
+    left in `.document` instead.
+    """
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.document = None
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        decoder = json.JSONDecoder()
+        utf8 = codecs.getincrementaldecoder('utf-8')()
+        iterator = self.chunks.__aiter__()
+        buf, pos, eof = '', 0, False
+
+        async def more():
+            nonlocal buf, pos, eof
+            try:
+                chunk = await iterator.__anext__()
+            except StopAsyncIteration:
+                eof = True
+                chunk = b''
+            # Drop what has been decoded already before appending the new data
+            buf = buf[pos:] + utf8.decode(chunk, final=eof)
+            pos = 0
+
+        while True:
+            pos = _JSON_WS.match(buf, pos).end()
+            if pos < len(buf) or eof:
+                break
+            await more()
+        if pos >= len(buf):
+            return
+        if buf[pos] != '[':
+            while not eof:
+                await more()
+            self.document = decoder.decode(buf[pos:])
+            return
+
+        pos += 1
+        while True:
+            pos = _JSON_WS.match(buf, pos).end()
+            if pos >= len(buf):
+                if eof:
+                    raise ValueError("Truncated JSON array")
+                await more()
+                continue
+            if buf[pos] == ']':
+                return
+            if buf[pos] == ',':
+                pos += 1
+                continue
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # Item incomplete: wait until the pending text has doubled before
+                # re-parsing, so small chunks don't make large items quadratic
+                want = 2 * (len(buf) - pos)
+                while not eof and len(buf) - pos < want:
+                    await more()
+                continue
+            if buf[pos] not in '{["':
+                # A bare number or literal is only complete once a delimiter follows it:
+                # "[1." or "[1e" decodes as 1, but may be "1.5" or "1e5" split across chunks
+                after = _JSON_WS.match(buf, end).end()
+                if (after == len(buf) and not eof) or (after < len(buf) and buf[after] not in ',]'):
+                    if eof:
+                        raise json.JSONDecodeError("Expecting ',' delimiter", buf, after)
+                    await more()
                     continue
-                # parse trackers
-                mag = _get_magnet_uri_for_item(item)
-                for tr in parse_trackers_from_magnet(mag):
-                    tracker_map.setdefault(tr, []).append(info_hash.lower())
-            if tracker_map:
-                uncached_seeders = await scrape_trackers_inverted(tracker_map)
-        xml_response = generate_torznab_xml(consolidated_results, cached_status, uncached_seeders)
-        return Response(content=xml_response, media_type="application/xml")
+            pos = end
+            yield value
+
+
+async def read_json_response(response, item_hook=None):
+    """Decodes a JSON response, streaming a top-level array item by item.
+
+    `item_hook`, if given, is applied to each array element as soon as it is
+    decoded and its return value is kept instead (None drops the item), so peak
+    memory is the hook's output plus one read chunk rather than the whole body.
+    Non-array documents, and responses without a readable stream, are decoded in
+    one go and returned unchanged.
+    """
+    content = getattr(response, 'content', None)
+    if content is None or not hasattr(content, 'iter_chunked'):
+        data = await response.json()
+        if isinstance(data, list) and item_hook is not None:
+            data = [r for r in map(item_hook, data) if r is not None]
+        return data
+    stream = JSONArrayStream(content.iter_chunked(_JSON_CHUNK_SIZE))
+    items = []
+    async for value in stream:
+        if item_hook is not None:
+            value = item_hook(value)
+            if value is None:
+                continue
+        items.append(value)
+    return items if stream.document is None else stream.document
+
 
 async def search_prowlarr(session, search_kwargs):
     """Searches Prowlarr for the given query."""
@@ -453,7 +2230,7 @@ async def search_prowlarr(session, search_kwargs):
         )
         async with session.get(url, headers=headers, params=params) as response:
             response.raise_for_status()
-            data = await response.json()
+            data = await read_json_response(response, project_prowlarr_item)
             # Normalize returned search results to a list of items
             if isinstance(data, list):
                 logger.debug(f"Prowlarr returned {len(data)} items (list)")
@@ -462,67 +2239,27 @@ async def search_prowlarr(session, search_kwargs):
                 for key in ('records', 'results', 'items', 'data'):
                     if key in data and isinstance(data[key], list):
                         logger.debug(f"Prowlarr returned {len(data[key])} items (key={key})")
-                        return data[key]
+                        return [project_prowlarr_item(item) for item in data[key]]
                 # If results are under 'result' and it's an object with items
                 if 'result' in data and isinstance(data['result'], list):
                     logger.debug(f"Prowlarr returned {len(data['result'])} items (result)")
-                    return data['result']
+                    return [project_prowlarr_item(item) for item in data['result']]
             # If unknown structure, return empty list and log
             print('Unknown Prowlarr search response structure:', type(data), data)
             return []
     except aiohttp.ClientError as e:
         logger.exception(f"Error searching Prowlarr: {e}")
-        return []
+        return ProwlarrResults(failed=True)
 
 def extract_info_hashes(prowlarr_results):
     """Extracts info hashes from Prowlarr search results."""
-    hashes = []
-    raw_hashes = []
-    for item in prowlarr_results:
-        # Normalize infohashes to lowercase for consistent mapping
-        if item.get('infoHash'):
-            raw_hashes.append(item['infoHash'])
-        else:
-            mag = _get_magnet_uri_for_item(item)
-            if mag:
-                try:
-                    # Attempt to parse from magnet link
-                    parsed_magnet = parse_qs(unquote(mag.split('?')[1]))
-                    if 'xt' in parsed_magnet:
-                        hash_val = parsed_magnet['xt'][0].split(':')[-1]
-                        raw_hashes.append(hash_val)
-                except (IndexError, KeyError) as e:
-                    print(f"Could not parse infohash from magnet link: {mag}, error: {e}")
-
     # Preserve ordering but dedupe and normalize when returning
-    return dedupe_hashes_preserve_order(raw_hashes)
+    return dedupe_hashes_preserve_order(as_search_item(item).hash for item in prowlarr_results)
 
 
 def parse_trackers_from_magnet(magnet_uri):
     """Extract tracker URLs from a magnet URI (tr= parameters)."""
-    if not magnet_uri:
-        return []
-    try:
-        query = magnet_uri.split('?')[1]
-    except Exception:
-        return []
-    # split by & and look for tr= entries
-    trackers = []
-    for part in query.split('&'):
-        if part.startswith('tr='):
-            val = part.split('=', 1)[1]
-            trackers.append(unquote(val))
-    # normalize and dedupe while preserving order
-    out = []
-    seen = set()
-    for t in trackers:
-        t_str = t.strip()
-        if not t_str:
-            continue
-        if t_str not in seen:
-            out.append(t_str)
-            seen.add(t_str)
-    return out
+    return list(parse_magnet(magnet_uri).trackers)
 
 
 def _get_magnet_uri_for_item(item):
@@ -546,6 +2283,31 @@ def _get_magnet_uri_for_item(item):
     return None
 
 
+def _canonical_magnet(item, trackers, key):
+    """Magnet URI for `key` keeping the item's xt and listing `trackers`."""
+    base = None
+    # Ensure base retains xt=urn:btih:<hash> so trackers can be appended properly.
+    if item.magnet and 'magnet:?' in item.magnet and item.xt:
+        base = f"magnet:?xt={item.xt}"
+    if not base:
+        # create a base magnet if none present (ensures canonical magnetUri includes xt)
+        base = f"magnet:?xt=urn:btih:{key}"
+    if trackers:
+        return base + '&' + '&'.join('tr=' + t for t in trackers)
+    return base
+
+
+def _union_trackers(items):
+    trackers = []
+    seen = set()
+    for it in items:
+        for tr in it.trackers:
+            if tr not in seen:
+                seen.add(tr)
+                trackers.append(tr)
+    return trackers
+
+
 def consolidate_uncached_items(prowlarr_results, cached_status):
     """Consolidate duplicate uncached items per infohash, merge trackers.
 
@@ -553,31 +2315,10 @@ def consolidate_uncached_items(prowlarr_results, cached_status):
     items have merged 'magnetUri' containing combined trackers and other metadata
     taken from the first item.
     """
-    # Group items by infohash (lowercased)
+    # Group items by infohash (lowercased); items without one share the None bucket
     groups = {}
-    for item in prowlarr_results:
-        info = item.get('infoHash')
-        if not info:
-            mag = _get_magnet_uri_for_item(item)
-            if mag:
-                try:
-                    parsed_magnet = parse_qs(unquote(mag.split('?')[1]))
-                    if 'xt' in parsed_magnet:
-                        info = parsed_magnet['xt'][0].split(':')[-1]
-                except Exception:
-                    info = None
-        if info:
-            try:
-                info = info.strip()
-            except Exception:
-                pass
-
-        if not info:
-            # keep them in a bucket keyed by None to preserve them
-            key = None
-        else:
-            key = info.lower()
-        groups.setdefault(key, []).append(item)
+    for item in map(as_search_item, prowlarr_results):
+        groups.setdefault(item.hash, []).append(item)
 
     consolidated = []
     for key, items in groups.items():
@@ -588,38 +2329,8 @@ def consolidate_uncached_items(prowlarr_results, cached_status):
         # For uncached or None (non-hash) group, consolidate
         first = items[0]
         if key:
-            # merge trackers from magnetUri across all items
-            trackers = []
-            tracker_seen = set()
-            for it in items:
-                mag = _get_magnet_uri_for_item(it)
-                for t in parse_trackers_from_magnet(mag):
-                    if t not in tracker_seen:
-                        trackers.append(t)
-                        tracker_seen.add(t)
-            # Rebuild magnetUri with the combined trackers
-            magnet_base = None
-            # Try to use canonical magnet from 'magnetUri' or 'guid'
-            base_mag = _get_magnet_uri_for_item(first)
-            if base_mag and 'magnet:?' in base_mag:
-                try:
-                    parsed = parse_qs(unquote(base_mag.split('?', 1)[1]))
-                    if 'xt' in parsed:
-                        magnet_base = f"magnet:?xt={parsed['xt'][0]}"
-                except Exception:
-                    magnet_base = None
-            # Ensure magnetUri is set even if the first item had no existing magnet
-            if not magnet_base:
-                magnet_base = f"magnet:?xt=urn:btih:{key}"
-            tr_parts = '&'.join('tr=' + t for t in trackers)
-            # If the base already contains a query ('?'), append trackers with '&', otherwise use '?'
-            if tr_parts:
-                connector = '&' if '?' in magnet_base else '?'
-                first['magnetUri'] = f"{magnet_base}{connector}{tr_parts}"
-            else:
-                first['magnetUri'] = magnet_base
-            # Ensure GUID always reflects the constructed magnetUri
-            first['guid'] = first.get('magnetUri')
+            trackers = _union_trackers(items)
+            first = ConsolidatedItem(first, _canonical_magnet(first, trackers, key), trackers)
         consolidated.append(first)
     return consolidated
 
@@ -630,82 +2341,42 @@ def consolidate_all_items(prowlarr_results, cached_status, uncached_seeders=None
     - Merge trackers for the hash from all magnet URIs
     - Choose a canonical item (highest original seeders) for metadata
     - For cached items apply PACHELARR_SEEDERS_BOOST; for uncached use uncached_seeders mapping
-    - Returns a list of consolidated items
+    - Returns a ConsolidatedResults list; canonical items are ConsolidatedItem
+      overlays, and the inputs are neither copied nor modified
     """
-    from copy import deepcopy
+    # Single pass: info hash -> [canonical item, merged trackers, seen trackers]
     groups = {}
     non_hash_items = []
-    for item in prowlarr_results:
-        info = item.get('infoHash')
-        if not info:
-            mag = _get_magnet_uri_for_item(item)
-            if mag:
-                try:
-                    parsed_magnet = parse_qs(unquote(mag.split('?')[1]))
-                    if 'xt' in parsed_magnet:
-                        info = parsed_magnet['xt'][0].split(':')[-1]
-                except Exception:
-                    info = None
-        if not info:
+    for item in map(as_search_item, prowlarr_results):
+        key = item.hash
+        if not key:
             non_hash_items.append(item)
             continue
-        key = info.lower() if info else None
-        groups.setdefault(key, []).append(item)
-
-    consolidated = []
-    for key, items in groups.items():
-        # choose the item with highest original seeders as canonical
-        def parse_seeders(it):
-            try:
-                return int(it.get('seeders', 0) or 0)
-            except Exception:
-                return 0
-        items_sorted = sorted(items, key=parse_seeders, reverse=True)
-        canonical = deepcopy(items_sorted[0])
-        # merge trackers from all items
-        trackers = []
-        seen = set()
-        for it in items:
-            for tr in parse_trackers_from_magnet(_get_magnet_uri_for_item(it)):
-                if tr not in seen:
-                    seen.add(tr)
-                    trackers.append(tr)
-        # compute base magnet from canonical's 'magnetUri' or 'guid'
-        base_mag = _get_magnet_uri_for_item(canonical)
-        # Ensure base retains xt=urn:btih:<hash> so trackers can be appended properly.
-        base = None
-        if base_mag and 'magnet:?' in base_mag:
-            try:
-                parsed = parse_qs(unquote(base_mag.split('?', 1)[1]))
-                if 'xt' in parsed:
-                    base = f"magnet:?xt={parsed['xt'][0]}"
-            except Exception:
-                base = None
-        if not base:
-            # create a base magnet if none present (ensures canonical magnetUri includes xt)
-            base = f"magnet:?xt=urn:btih:{key}"
-        tr_parts = '&'.join('tr=' + t for t in trackers)
-        if tr_parts:
-            connector = '&' if '?' in base else '?'
-            canonical['magnetUri'] = f"{base}{connector}{tr_parts}"
-        else:
-            canonical['magnetUri'] = base
-        # Ensure canonical GUID always reflects the constructed canonical magnet URI
-        canonical['guid'] = canonical.get('magnetUri')
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = [item, [], set()]
+        elif item.seed_count > group[0].seed_count:
+            # highest original seeders wins; the first one on ties
+            group[0] = item
+        trackers, seen = group[1], group[2]
+        for tr in item.trackers:
+            if tr not in seen:
+                seen.add(tr)
+                trackers.append(tr)
+
+    consolidated = ConsolidatedResults()
+    for key, (canonical, trackers, _) in groups.items():
         # set seeders based on cached_status or uncached_seeders
+        seeders = None
         if key in (cached_status or {}):
             # cached -> apply boost
-            try:
-                s = int(canonical.get('seeders', 0) or 0)
-            except Exception:
-                s = 0
-            canonical['seeders'] = max(s, PACHELARR_SEEDERS_BOOST)
-        else:
+            seeders = max(canonical.seed_count, PACHELARR_SEEDERS_BOOST)
+        elif uncached_seeders and key in uncached_seeders:
             # uncached -> use uncached_seeders if present
-            if uncached_seeders and key in uncached_seeders:
-                canonical['seeders'] = max(int(canonical.get('seeders', 0) or 0), int(uncached_seeders.get(key) or 0))
-        logger.debug(f'Consolidated canonical infohash={key} trackers={len(trackers)} magnet={canonical.get("magnetUri")}')
-        consolidated.append(canonical)
+            seeders = max(canonical.seed_count, int(uncached_seeders.get(key) or 0))
+        merged = ConsolidatedItem(canonical, _canonical_magnet(canonical, trackers, key), trackers, seeders)
+        logger.debug(f'Consolidated canonical infohash={key} trackers={len(trackers)} magnet={merged.magnet}')
+        consolidated.append(merged)
 
     # include non-hash items unchanged
     consolidated.extend(non_hash_items)
@@ -860,14 +2531,35 @@ async def scrape_trackers_inverted(tracker_to_hashes):
     return results_per_hash
 
 
-async def check_torbox_cache(session, hashes):
-    """Checks Torbox cache for a list of info hashes."""
+# Returned by a chunk call whose retries were exhausted (status unknown, not "uncached")
+_TORBOX_CHUNK_FAILED = object()
+# Settles an in-flight hash whose leading lookup got no answer, so joiners treat it as unknown
+_TORBOX_UNKNOWN = object()
+# hash -> future resolving to its Torbox status while some search is looking it up
+_TORBOX_INFLIGHT = {}
+
+
+class TorboxStatusMap(dict):
+    """{hash: status} mapping with bookkeeping about how it was answered.
+
+    `unknown` holds hashes whose status Torbox could not tell us (failed
+    chunk, circuit breaker open); `stale` holds hashes answered from expired
+    cache entries instead.
+    """
+
+    def __init__(self, *args, unknown=(), stale=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.unknown = set(unknown)
+        self.stale = set(stale)
+
+
+async def check_torbox_cache(session, hashes, deadline=None):
+    """Checks Torbox cache for a list of info hashes.
+
+    `deadline` (a `time.monotonic()` value) bounds the time spent on rate-limit
+    waits and retries; it defaults to TORBOX_RETRY_BUDGET seconds from now.
+    """
     try:
-        headers = {
-            "Content-Type": "application/json",
-            # Torbox expects Bearer token authentication
-            "Authorization": f"Bearer {TORBOX_API_KEY}"
-        }
         # Mask Torbox API key for debug logging
         def _mask_key(k):
             if not k:
@@ -882,145 +2574,459 @@ async def check_torbox_cache(session, hashes):
         total_hashes = len(hashes)
         # dedupe hashes (case-insensitively) while preserving ordering
         unique_hashes = dedupe_hashes_preserve_order(hashes)
-        dedupe_removed_count = total_hashes - len(unique_hashes)
+        total_unique = len(unique_hashes)
+        dedupe_removed_count = total_hashes - total_unique
         if dedupe_removed_count:
             logger.debug(f"Torbox cache check: dedupe_removed={dedupe_removed_count}")
         logger.debug(
             f"Torbox cache check: POST {TORBOX_CHECK_URL} total.hashes={total_hashes} unique.hashes={len(unique_hashes)} dedupe_removed={dedupe_removed_count} Authorization=Bearer {_mask_key(TORBOX_API_KEY)}"
         )
 
-        # Helper to combine and normalize results to lowercase keys
-        combined = {}
-        total_hits = 0
-
-        async def _call_chunk(chunk):
-            """Call Torbox for given chunk, return mapping or raise.
-            Handles 401 specially by returning None to indicate bail-out.
-            """
-            attempt = 1
-            backoff = TORBOX_RETRY_BACKOFF
-            while attempt <= TORBOX_MAX_RETRIES:
-                try:
-                    async with session.post(TORBOX_CHECK_URL, json={'hashes': chunk}, headers=headers) as response:
-                        if response.status == 401:
-                            logger.warning("Torbox returned 401 Unauthorized. Check TORBOX_API_KEY. Aborting cache checks.")
-                            return None
-                        if response.status >= 500:
-                            logger.warning(f"Torbox server error (status {response.status}); attempt {attempt}/{TORBOX_MAX_RETRIES}")
-                            # fall through to retry logic
-                        else:
-                            response.raise_for_status()
-                            data = await response.json()
-                            return data
-                except aiohttp.ClientError as e:
-                    logger.warning(f"Torbox request error: {e}; attempt {attempt}/{TORBOX_MAX_RETRIES}")
-                # If not returned, sleep then retry
-                await asyncio.sleep(backoff)
-                backoff *= 2
-                attempt += 1
-            # After retries exhausted
-            logger.warning("Torbox cache check failed after retries for chunk")
+        # Answer what we can from the local status cache; only misses go to Torbox
+        combined = TorboxStatusMap()
+        if TORBOX_STATUS_CACHE is not None:
+            fresh, unique_hashes = TORBOX_STATUS_CACHE.lookup(unique_hashes)
+            combined.update(fresh)
+            cache_hits = total_unique - len(unique_hashes)
+            METRICS['torbox_cache_hits'] += cache_hits
+            METRICS['torbox_cache_misses'] += len(unique_hashes)
+            logger.info(f"Torbox status cache: hits={cache_hits} misses={len(unique_hashes)}")
+            if not unique_hashes:
+                return combined
+
+        # Hashes another search is already looking up are awaited rather than re-sent
+        joined = {h: _TORBOX_INFLIGHT[h] for h in unique_hashes if h in _TORBOX_INFLIGHT}
+        own = [h for h in unique_hashes if h not in joined]
+        if joined:
+            METRICS['torbox_coalesced'] += len(joined)
+            logger.debug(f"Torbox cache check: coalesced={len(joined)} own={len(own)}")
+        loop = asyncio.get_running_loop()
+        leading = {h: loop.create_future() for h in own}
+        _TORBOX_INFLIGHT.update(leading)
+        if deadline is None:
+            deadline = time.monotonic() + TORBOX_RETRY_BUDGET
+        fetched = {}
+        answered = False
+        try:
+            if own and TORBOX_BREAKER is not None and TORBOX_BREAKER.is_open():
+                # Don't queue behind a dead upstream; fall back to stale entries below
+                fetched = TorboxStatusMap(unknown=own)
+            elif own:
+                if TORBOX_BATCHER is not None:
+                    fetched = await TORBOX_BATCHER.submit(session, own, deadline)
+                else:
+                    fetched = await _query_torbox(session, own, deadline)
+            answered = fetched is not None
+        finally:
+            # Always settle our futures so joined callers never hang; hashes we got
+            # no answer for (failure, 401, cancellation) settle as _TORBOX_UNKNOWN
+            failed = getattr(fetched, 'unknown', ()) if answered else set(own)
+            for h, fut in leading.items():
+                if not fut.done():
+                    fut.set_result(_TORBOX_UNKNOWN if h in failed else fetched.get(h))
+                if _TORBOX_INFLIGHT.get(h) is fut:
+                    del _TORBOX_INFLIGHT[h]
+        if fetched is None:
+            # 401; abort and return empty map
             return {}
+        combined.update(fetched)
+        unknown = set(getattr(fetched, 'unknown', ()))
+        if joined:
+            # shield: one caller giving up must not cancel the future for the others
+            values = await asyncio.gather(*(asyncio.shield(f) for f in joined.values()))
+            for h, v in zip(joined, values):
+                if v is _TORBOX_UNKNOWN:
+                    unknown.add(h)
+                elif v is not None:
+                    combined[h] = v
+        combined.unknown.update(unknown)
+        if unknown and TORBOX_STATUS_CACHE is not None:
+            # Torbox couldn't answer; serve the last known statuses, flagged as stale
+            stale = TORBOX_STATUS_CACHE.lookup_stale(unknown)
+            combined.update(stale)
+            combined.stale.update(stale)
+            METRICS['torbox_stale_answers'] += len(stale)
+            logger.warning(f"Torbox unavailable for {len(unknown)} hashes; answered {len(stale)} from stale cache entries")
+        logger.info(f"Torbox cache check: total cached hits={len(fetched)}")
+        return combined
+    except aiohttp.ClientError as e:
+        logger.exception(f"Error checking Torbox cache: {e}")
+        return {}
+
+
+async def _query_torbox(session, unique_hashes, deadline=None):
+    """POST already-normalized hashes to Torbox in chunks and merge the answers.
 
-        # Batch hashes and query Torbox for each chunk
-        # use unique_hashes for chunking
-        for i in range(0, len(unique_hashes), TORBOX_CHUNK_SIZE):
-            chunk = unique_hashes[i:i+TORBOX_CHUNK_SIZE]
+    Returns a TorboxStatusMap of the hashes Torbox reports as cached (hashes
+    from failed chunks are listed in `.unknown`), or None when Torbox rejected
+    our credentials (401). Successful chunks are recorded in the status cache.
+    Rate-limit waits and retries stop at `deadline` (monotonic).
+    """
+    if deadline is None:
+        deadline = time.monotonic() + TORBOX_RETRY_BUDGET
+    headers = {
+        "Content-Type": "application/json",
+        # Torbox expects Bearer token authentication
+        "Authorization": f"Bearer {TORBOX_API_KEY}"
+    }
+    # Mask Torbox API key for debug logging
+    def _mask_key(k):
+        if not k:
+            return None
+        if len(k) <= 8:
+            return "****"
+        return k[:4] + "*" * (len(k) - 8) + k[-4:]
+
+    combined = TorboxStatusMap()
+    # Set on 401 so chunks still waiting for a slot don't hit Torbox
+    aborted = asyncio.Event()
+
+    async def _call_chunk(chunk):
+        """Call Torbox for given chunk, return mapping or raise.
+        Handles 401 specially by returning None to indicate bail-out.
+        """
+        attempt = 1
+        while attempt <= TORBOX_MAX_RETRIES:
+            if TORBOX_RATE_LIMITER is not None and not await TORBOX_RATE_LIMITER.acquire(deadline):
+                logger.warning("Torbox rate limit leaves no time before the search deadline; skipping chunk")
+                METRICS['torbox_budget_exhausted'] += 1
+                return _TORBOX_CHUNK_FAILED
+            if TORBOX_BREAKER is not None and not TORBOX_BREAKER.allow():
+                logger.debug("Torbox circuit breaker is open; skipping chunk")
+                return _TORBOX_CHUNK_FAILED
+            # This call is the breaker's half-open probe; every exit must settle it
+            probe = TORBOX_BREAKER is not None and TORBOX_BREAKER.state == TORBOX_BREAKER.HALF_OPEN
+            retry_after = None
+            started = time.monotonic()
+            try:
+                METRICS['torbox_requests'] += 1
+                async with session.post(TORBOX_CHECK_URL, json={'hashes': chunk}, headers=headers) as response:
+                    if response.status == 401:
+                        logger.warning("Torbox returned 401 Unauthorized. Check TORBOX_API_KEY. Aborting cache checks.")
+                        if TORBOX_BREAKER is not None:
+                            TORBOX_BREAKER.record_success()
+                        aborted.set()
+                        return None
+                    if response.status == 429 or response.status >= 500:
+                        retry_after = _parse_retry_after(getattr(response, 'headers', None))
+                        if TORBOX_BREAKER is not None:
+                            # Throttling means Torbox is up; only server errors count against it
+                            if response.status == 429:
+                                TORBOX_BREAKER.record_success()
+                            else:
+                                TORBOX_BREAKER.record_failure()
+                        if response.status == 429:
+                            METRICS['torbox_throttled'] += 1
+                            logger.warning(f"Torbox rate limited us (retry-after={retry_after}); attempt {attempt}/{TORBOX_MAX_RETRIES}")
+                        else:
+                            logger.warning(f"Torbox server error (status {response.status}); attempt {attempt}/{TORBOX_MAX_RETRIES}")
+                        if retry_after is not None and TORBOX_RATE_LIMITER is not None:
+                            # Hold back every Torbox call, not just this chunk
+                            TORBOX_RATE_LIMITER.pause_until(time.monotonic() + retry_after)
+                        # fall through to retry logic
+                    else:
+                        response.raise_for_status()
+                        data = await response.json()
+                        if TORBOX_BREAKER is not None:
+                            TORBOX_BREAKER.record_success(time.monotonic() - started)
+                        return data
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if TORBOX_BREAKER is not None:
+                    TORBOX_BREAKER.record_failure()
+                logger.warning(f"Torbox request error: {e!r}; attempt {attempt}/{TORBOX_MAX_RETRIES}")
+            except Exception as e:
+                # e.g. a 200 whose body isn't JSON: not worth retrying
+                if TORBOX_BREAKER is not None:
+                    TORBOX_BREAKER.record_failure()
+                logger.warning(f"Unexpected Torbox response: {e!r}")
+                return _TORBOX_CHUNK_FAILED
+            except BaseException:
+                # Cancelled (401 on another chunk, client gone): no outcome, so free the probe
+                if probe:
+                    TORBOX_BREAKER.release_probe()
+                raise
+            if attempt >= TORBOX_MAX_RETRIES:
+                break
+            # If not returned, sleep then retry, unless that would overrun the search deadline
+            delay = retry_after if retry_after is not None else _retry_delay(TORBOX_RETRY_BACKOFF, attempt)
+            if time.monotonic() + delay > deadline:
+                logger.warning(f"Torbox retry budget exhausted for chunk (next retry in {delay:.2f}s)")
+                METRICS['torbox_budget_exhausted'] += 1
+                return _TORBOX_CHUNK_FAILED
+            await asyncio.sleep(delay)
+            attempt += 1
+        # After retries exhausted
+        logger.warning("Torbox cache check failed after retries for chunk")
+        return _TORBOX_CHUNK_FAILED
+
+    # Dispatch all chunks concurrently (bounded by TORBOX_CONCURRENCY) so a search
+    # costs roughly one Torbox round-trip instead of one per chunk
+    sem = asyncio.Semaphore(max(1, TORBOX_CONCURRENCY))
+
+    async def _run_chunk(chunk):
+        async with sem:
+            if aborted.is_set():
+                return chunk, None
             logger.debug(f"Torbox cache chunk: POST {TORBOX_CHECK_URL} chunk.len={len(chunk)} Authorization=Bearer {_mask_key(TORBOX_API_KEY)}")
+            return chunk, await _call_chunk(chunk)
+
+    tasks = [
+        asyncio.create_task(_run_chunk(unique_hashes[i:i+TORBOX_CHUNK_SIZE]))
+        for i in range(0, len(unique_hashes), TORBOX_CHUNK_SIZE)
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
             try:
-                result = await _call_chunk(chunk)
+                chunk, result = await next_done
                 if result is None:
-                    # 401 or non-retriable error; abort and return empty map
-                    return {}
-                if isinstance(result, dict):
-                    # First, try the common {'data': {...}} mapping
-                    if 'data' in result:
-                        data_map = result['data']
-                        if isinstance(data_map, dict):
-                            hits = len(data_map)
-                            logger.debug(f"Torbox chunk response: hits={hits}")
-                            total_hits += hits
-                            for k, v in data_map.items():
-                                combined[k.lower()] = v
-                        elif isinstance(data_map, list):
-                            hits = len(data_map)
-                            logger.debug(f"Torbox chunk response list: hits={hits}")
-                            total_hits += hits
-                            for obj in data_map:
-                                if isinstance(obj, dict) and obj.get('hash'):
-                                    combined[obj['hash'].lower()] = obj
-                    else:
-                        # result may be directly a mapping
-                        hits = len(result)
-                        logger.debug(f"Torbox chunk response (mapping): hits={hits}")
-                        total_hits += hits
-                        for k, v in result.items():
-                            combined[k.lower()] = v
-                elif isinstance(result, list):
-                    # Torbox may return a list of objects [{hash:..., ...}, ...]
-                    hits = len(result)
-                    logger.debug(f"Torbox chunk response list (top-level): hits={hits}")
-                    total_hits += hits
-                    for obj in result:
-                        if isinstance(obj, dict) and obj.get('hash'):
-                            combined[obj['hash'].lower()] = obj
-                else:
-                    logger.debug(f"Unexpected Torbox chunk response data type: {type(result)}")
+                    # 401 or non-retriable error; abort (pending chunks are cancelled below)
+                    return None
+                if result is _TORBOX_CHUNK_FAILED:
+                    # Unknown status; don't cache anything for this chunk
+                    combined.unknown.update(chunk)
+                    continue
+                chunk_map = _normalize_torbox_response(result)
+                combined.update(chunk_map)
+                if TORBOX_STATUS_CACHE is not None:
+                    TORBOX_STATUS_CACHE.store(chunk, chunk_map)
             except Exception as e:
                 logger.exception(f"Error processing Torbox chunk: {e}")
                 # continue to next chunk
                 continue
-        logger.info(f"Torbox cache check: total cached hits={total_hits}")
-        return combined
-    except aiohttp.ClientError as e:
-        logger.exception(f"Error checking Torbox cache: {e}")
-        return {}
+    finally:
+        pending = [t for t in tasks if not t.done()]
+        for t in pending:
+            t.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+    return combined
+
+
+class TorboxBatcher:
+    """Micro-batches Torbox lookups across concurrent searches.
+
+    When no batch is in flight, submitted hashes go out on the next loop
+    iteration, so a lone search doesn't wait. While a batch is in flight,
+    hashes from every search are collected for up to `window` seconds, or
+    until a full `chunk_size` request is queued, then merged into one
+    deduplicated list and sent through `_query_torbox`. Bursts of
+    Sonarr/Radarr searches thus share full 100-hash requests instead of each
+    sending its own partly filled chunk. Each caller gets back only the
+    statuses for the hashes it asked about, and hashes nobody is still
+    waiting for are not sent.
+    """
 
+    def __init__(self, window, chunk_size=TORBOX_CHUNK_SIZE):
+        self.window = window
+        self.chunk_size = chunk_size
+        self._pending = {}
+        self._waiters = []
+        self._flush_task = None
+        self._in_flight = 0
+
+    async def submit(self, session, hashes, deadline=None):
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append((session, hashes, deadline, fut))
+        for h in hashes:
+            self._pending[h] = None
+        if len(self._pending) >= self.chunk_size:
+            # A full request is ready; don't hold it back for the window
+            if self._flush_task is not None:
+                self._flush_task.cancel()
+                self._flush_task = None
+            asyncio.ensure_future(self._flush())
+        elif self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+        return await fut
+
+    async def _flush_later(self):
+        # Yield once even when idle so searches arriving in the same tick share a request
+        await asyncio.sleep(self.window if self._in_flight else 0)
+        self._flush_task = None
+        await self._flush()
+
+    async def _flush(self):
+        waiters, self._waiters = self._waiters, []
+        self._pending = {}
+        # Use a session belonging to a caller that is still waiting, and only its hashes
+        live = [w for w in waiters if not w[-1].done()]
+        if not live:
+            return
+        hashes = list(dict.fromkeys(h for w in live for h in w[1]))
+        METRICS['torbox_batches'] += 1
+        METRICS['torbox_batched_callers'] += len(live)
+        logger.debug(f"Torbox batch flush: callers={len(live)} hashes={len(hashes)}")
+        # The shared request may run as long as the most patient caller allows
+        deadlines = [w[2] for w in live if w[2] is not None]
+        self._in_flight += 1
+        try:
+            result = await _query_torbox(live[0][0], hashes, max(deadlines) if deadlines else None)
+        except Exception as e:
+            for *_, fut in live:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        finally:
+            self._in_flight -= 1
+        for _, wanted, _, fut in live:
+            if fut.done():
+                continue
+            if result is None:
+                fut.set_result(None)
+            else:
+                fut.set_result(TorboxStatusMap(
+                    {h: result[h] for h in wanted if h in result},
+                    unknown=result.unknown.intersection(wanted),
+                ))
 
-def generate_torznab_xml(prowlarr_results, cached_status, uncached_seeders=None):
-    """Generates Torznab XML response from enriched data."""
-    rss = ET.Element("rss", version="2.0", nsmap={'torznab': "http://torznab.com/schemas/2015/feed"})
+
+TORBOX_BATCHER = TorboxBatcher(TORBOX_BATCH_WINDOW) if TORBOX_BATCH_WINDOW > 0 else None
+TORBOX_RATE_LIMITER = TokenBucket(TORBOX_RATE_LIMIT, TORBOX_RATE_BURST) if TORBOX_RATE_LIMIT > 0 else None
+TORBOX_BREAKER = (
+    CircuitBreaker("torbox", TORBOX_BREAKER_FAILURES, TORBOX_BREAKER_LATENCY, TORBOX_BREAKER_RESET)
+    if TORBOX_BREAKER_FAILURES > 0 else None
+)
+
+
+async def refresh_hot_torbox_statuses(session, now=None):
+    """Re-check popular cache entries shortly before they expire.
+
+    Hashes are sent in full TORBOX_CHUNK_SIZE requests; a trailing partial
+    chunk is deferred to the next pass unless one of its entries would expire
+    before then. Returns the number of hashes re-checked.
+    """
+    if TORBOX_STATUS_CACHE is None or (TORBOX_BREAKER is not None and TORBOX_BREAKER.is_open()):
+        return 0
+    now = time.time() if now is None else now
+    due = TORBOX_STATUS_CACHE.refresh_candidates(now + TORBOX_REFRESH_AHEAD, TORBOX_REFRESH_MIN_HITS)
+    due = due[:TORBOX_REFRESH_MAX_HASHES]
+    full = len(due) - len(due) % TORBOX_CHUNK_SIZE
+    if full < len(due) and due[full][1] <= now + TORBOX_REFRESH_INTERVAL:
+        full = len(due)
+    hashes = [h for h, _ in due[:full]]
+    if not hashes:
+        return 0
+    logger.debug(f"Torbox refresh-ahead: re-checking {len(hashes)} hot hashes")
+    result = await _query_torbox(session, hashes)
+    if result is None:
+        return 0
+    METRICS['torbox_refreshed'] += len(hashes) - len(result.unknown)
+    return len(hashes)
+
+
+async def _torbox_refresh_loop():
+    while True:
+        await asyncio.sleep(TORBOX_REFRESH_INTERVAL)
+        try:
+            await refresh_hot_torbox_statuses(HTTP_CLIENTS.get('torbox'))
+        except Exception:
+            logger.exception("Torbox refresh-ahead pass failed")
+        TORBOX_STATUS_CACHE.decay_access()
+
+
+def _normalize_torbox_response(result):
+    """Normalize a Torbox checkcached response body to {lowercased hash: value}."""
+    out = {}
+    if isinstance(result, dict):
+        # First, try the common {'data': {...}} mapping
+        if 'data' in result:
+            data_map = result['data']
+            if isinstance(data_map, dict):
+                logger.debug(f"Torbox chunk response: hits={len(data_map)}")
+                for k, v in data_map.items():
+                    out[k.lower()] = v
+            elif isinstance(data_map, list):
+                logger.debug(f"Torbox chunk response list: hits={len(data_map)}")
+                for obj in data_map:
+                    if isinstance(obj, dict) and obj.get('hash'):
+                        out[obj['hash'].lower()] = obj
+        else:
+            # result may be directly a mapping
+            logger.debug(f"Torbox chunk response (mapping): hits={len(result)}")
+            for k, v in result.items():
+                out[k.lower()] = v
+    elif isinstance(result, list):
+        # Torbox may return a list of objects [{hash:..., ...}, ...]
+        logger.debug(f"Torbox chunk response list (top-level): hits={len(result)}")
+        for obj in result:
+            if isinstance(obj, dict) and obj.get('hash'):
+                out[obj['hash'].lower()] = obj
+    else:
+        logger.debug(f"Unexpected Torbox chunk response data type: {type(result)}")
+    return out
+
+
+TORZNAB_NS = "http://torznab.com/schemas/2015/feed"
+_TORZNAB_NSMAP = {'torznab': TORZNAB_NS}
+# Items are serialized one at a time; standalone, each would re-declare the namespace
+# that the enclosing <rss> element already declares
+_ITEM_NS_OPEN = b'<item xmlns:torznab="' + TORZNAB_NS.encode() + b'">'
+# Rendered feed bytes are handed to the response in chunks of about this size
+_XML_CHUNK_SIZE = 16 * 1024
+
+
+def _torznab_envelope(pretty):
+    """(head, tail) bytes around the feed's items, exactly as ET.tostring writes them."""
+    rss = ET.Element("rss", version="2.0", nsmap=_TORZNAB_NSMAP)
     channel = ET.SubElement(rss, "channel")
     ET.SubElement(channel, "title").text = "Torbox Cached Indexer"
+    doc = ET.tostring(rss, pretty_print=pretty, xml_declaration=True, encoding='UTF-8')
+    split = doc.index(b'</title>') + len(b'</title>')
+    return doc[:split], doc[split:]
+
+
+_TORZNAB_ENVELOPES = {True: _torznab_envelope(True), False: _torznab_envelope(False)}
+
+
+def generate_torznab_xml(prowlarr_results, cached_status, uncached_seeders=None, pretty=None, published=None):
+    """Generates Torznab XML response from enriched data."""
+    return b''.join(iter_torznab_xml(prowlarr_results, cached_status, uncached_seeders, pretty, published))
+
+
+def iter_torznab_xml(prowlarr_results, cached_status, uncached_seeders=None, pretty=None, published=None):
+    """Renders the Torznab feed incrementally, yielding bytes chunks.
+
+    Each <item> is serialized as soon as it is built instead of holding the whole
+    tree; the concatenated output is identical to serializing the full document
+    with ET.tostring. `pretty` defaults to PACHELARR_XML_PRETTY; `published`
+    is the pubDate of items without one and defaults to the current time.
+    """
+    if pretty is None:
+        pretty = PACHELARR_XML_PRETTY
+    if published is None:
+        published = datetime.now(timezone.utc)
+    head, tail = _TORZNAB_ENVELOPES[bool(pretty)]
+    buf = bytearray(head)
 
     # Cache normalized statuses to lowercase keys to match extract_info_hashes
     cached_status = {k.lower(): v for k, v in (cached_status or {}).items()}
 
     # Consolidate uncached duplicates into single items with merged trackers
-    # Full consolidation should already be performed in handle_search, but fallback here
-    prowlarr_results = consolidate_all_items(prowlarr_results, cached_status, uncached_seeders)
+    # Full consolidation should already be performed in handle_search, but fallback here.
+    # Seeder adjustments are re-applied below, so consolidated input needs no second pass.
+    if not isinstance(prowlarr_results, ConsolidatedResults):
+        prowlarr_results = consolidate_all_items(prowlarr_results, cached_status, uncached_seeders)
     # Map canonical magnetUri per infoHash for diagnostic logging
     canonical_map = {}
     for it in prowlarr_results:
-        info = it.get('infoHash')
-        if info:
-            canonical_map[info.lower()] = it.get('magnetUri') or it.get('guid') or ''
+        if it.get('infoHash'):
+            canonical_map[it.hash] = it.get('magnetUri') or it.get('guid') or ''
     logger.debug(f"Canonical map size: {len(canonical_map)}")
     # Track infohashes we've emitted to avoid duplicate items in the final feed
     emitted = set()
 
     for item in prowlarr_results:
-        info_hash = item.get('infoHash')
-        if not info_hash:
-            mag = _get_magnet_uri_for_item(item)
-            if mag:
-                try:
-                    parsed_magnet = parse_qs(unquote(mag.split('?')[1]))
-                    if 'xt' in parsed_magnet:
-                        info_hash = parsed_magnet['xt'][0].split(':')[-1]
-                except (IndexError, KeyError):
-                    info_hash = None
-
+        info_hash = item.raw_hash()
 
-        is_cached = cached_status.get(info_hash.lower() if info_hash else None, False)
+        is_cached = cached_status.get(item.hash, False)
 
         title = item.get('title', 'Unknown')
         if info_hash:
-            if info_hash.lower() in emitted:
+            if item.hash in emitted:
                 # Skip duplicate item for the same infohash (full dedupe)
                 continue
-            emitted.add(info_hash.lower())
-        xml_item = ET.SubElement(channel, "item")
+            emitted.add(item.hash)
+        xml_item = ET.Element("item", nsmap=_TORZNAB_NSMAP)
 
         if is_cached:
             title = f"[CACHED] {title}"
@@ -1030,25 +3036,16 @@ def generate_torznab_xml(prowlarr_results, cached_status, uncached_seeders=None)
         # Prefer canonical magnetUri when available so emitted GUIDs contain
         # the union of trackers for the infohash.
         guid_text = item.get('magnetUri') or item.get('guid', '')
-        if info_hash:
-            can = canonical_map.get(info_hash.lower())
-            if can:
-                guid_text = can
-                # Ensure we update the item.guid so any later code sees the
-                # canonical magnet as the truth
-                item['guid'] = can
+        can_mag = canonical_map.get(item.hash) if info_hash else None
+        if can_mag:
+            # Rendering is read-only: items may be shared through the search cache
+            # with concurrent requests, so the canonical GUID stays local
+            guid_text = can_mag
         # Debug log the GUID and magnetUri we are about to emit
-        try:
-            parsed_tr = parse_trackers_from_magnet(guid_text)
-            can_mag = canonical_map.get(info_hash.lower()) if info_hash else None
-            logger.debug(f"Emitting item: infohash={info_hash} is_cached={is_cached} guid_len={len(guid_text or '')} trackers_count={len(parsed_tr)} canonical_len={len(can_mag or '')} same_as_canonical={guid_text==can_mag}")
-        except Exception:
-            can_mag = canonical_map.get(info_hash.lower()) if info_hash else None
-            logger.debug(f"Emitting item: infohash={info_hash} is_cached={is_cached} guid_len={len(guid_text or '')} trackers_count=0 canonical_len={len(can_mag or '')} same_as_canonical={guid_text==can_mag}")
+        if logger.isEnabledFor(logging.DEBUG):
+            trackers_count = len(item.trackers) if guid_text == item.magnet else len(parse_trackers_from_magnet(guid_text))
+            logger.debug(f"Emitting item: infohash={info_hash} is_cached={is_cached} guid_len={len(guid_text or '')} trackers_count={trackers_count} canonical_len={len(can_mag or '')} same_as_canonical={guid_text==can_mag}")
         ET.SubElement(xml_item, "guid").text = guid_text
-        # also ensure item.guid reflects magnetUri we used
-        if item.get('magnetUri') and not item.get('guid'):
-            item['guid'] = item.get('magnetUri')
         # Ensure <link> is populated with a sensible URL; prefer an http download link,
         # otherwise fall back to the GUID we will emit (canonical magnet/guid).
         link_text = item.get('link') or item.get('magnetUrl') or item.get('magnetUri') or guid_text
@@ -1056,23 +3053,7 @@ def generate_torznab_xml(prowlarr_results, cached_status, uncached_seeders=None)
         ET.SubElement(xml_item, "link").text = link_text
 
         # pubDate: Sonarr requires a valid publish date for Torznab feeds
-        raw_pub_date = item.get('publishDate') or item.get('pubDate') or item.get('date')
-        if raw_pub_date:
-            try:
-                # Prowlarr typically uses ISO8601 like: 2025-05-10T16:57:09Z
-                # Parse naive Z-terminated UTC timestamps
-                dt = datetime.strptime(raw_pub_date, "%Y-%m-%dT%H:%M:%SZ")
-                dt = dt.replace(tzinfo=timezone.utc)
-            except Exception:
-                try:
-                    # Fall back to fromisoformat for other ISO variants
-                    dt = datetime.fromisoformat(raw_pub_date)
-                    if dt.tzinfo is None:
-                        dt = dt.replace(tzinfo=timezone.utc)
-                except Exception:
-                    dt = datetime.now(timezone.utc)
-        else:
-            dt = datetime.now(timezone.utc)
+        dt = item.published or published
         # RFC 1123 format (Sonarr expects a valid pubDate)
         ET.SubElement(xml_item, "pubDate").text = dt.strftime('%a, %d %b %Y %H:%M:%S GMT')
         # For enclosure use the same link preference as above. Use magnet or download URL
@@ -1081,19 +3062,15 @@ def generate_torznab_xml(prowlarr_results, cached_status, uncached_seeders=None)
         logger.debug(f"Emitting enclosure: infohash={info_hash} enclosure_len={len(enclosure_url or '')} enclosure_sample={enclosure_url[:60] if enclosure_url else None}")
         ET.SubElement(xml_item, "enclosure", url=enclosure_url, type="application/x-bittorrent")
 
-        _seeders = item.get('seeders', 0)
-        try:
-            seeders = int(_seeders)
-        except Exception:
-            seeders = 0
+        seeders = item.seed_count
         if is_cached:
             # Apply configured boost but don't reduce seeders if original is higher
             seeders = max(seeders, PACHELARR_SEEDERS_BOOST)
             logger.debug(f"Boosting seeders for cached item {info_hash}: {seeders}")
         else:
             # If we have a computed uncached seed count, apply max
-            if uncached_seeders and info_hash and info_hash.lower() in uncached_seeders:
-                seed_from_trackers = int(uncached_seeders.get(info_hash.lower(), 0) or 0)
+            if uncached_seeders and info_hash and item.hash in uncached_seeders:
+                seed_from_trackers = int(uncached_seeders.get(item.hash, 0) or 0)
                 seeders = max(seeders, seed_from_trackers)
                 logger.debug(f"Setting seeders for uncached item {info_hash} to {seeders} from trackers")
         
@@ -1103,8 +3080,18 @@ def generate_torznab_xml(prowlarr_results, cached_status, uncached_seeders=None)
             ET.SubElement(xml_item, "{http://torznab.com/schemas/2015/feed}attr", name="infohash", value=info_hash)
         ET.SubElement(xml_item, "{http://torznab.com/schemas/2015/feed}attr", name="size", value=str(item.get('size', 0)))
 
-
-    return ET.tostring(rss, pretty_print=True, xml_declaration=True, encoding='UTF-8')
+        if pretty:
+            ET.indent(xml_item, space="  ", level=2)
+            buf += b"\n    "
+        data = ET.tostring(xml_item, encoding='UTF-8')
+        buf += b'<item>'
+        buf += memoryview(data)[len(_ITEM_NS_OPEN):]
+        if len(buf) >= _XML_CHUNK_SIZE:
+            yield bytes(buf)
+            buf.clear()
+
+    buf += tail
+    yield bytes(buf)
 
 
 def get_caps_xml():
@@ -0,0 +1,35 @@
+import pytest
+import pytest_asyncio
+
+import main
+
+
+@pytest.fixture(autouse=True)
+def _isolated_state(monkeypatch):
+    # Each test gets an empty in-memory status cache and fresh counters so
+    # results cached by one test never short-circuit Torbox calls in another.
+    monkeypatch.setattr(main, "TORBOX_STATUS_CACHE", main.TorboxStatusCache(":memory:"))
+    monkeypatch.setattr(main, "TMDB_TITLE_CACHE", main.TitleCache(":memory:"))
+    monkeypatch.setattr(main, "TMDB_RATE_LIMITER", main.TokenBucket(main.TMDB_RATE_LIMIT, main.TMDB_RATE_BURST))
+    monkeypatch.setattr(main, "TMDB_FLIGHTS", main.SingleFlight("tmdb_lookup", cancel_orphans=True))
+    monkeypatch.setattr(main, "TORBOX_BATCHER", main.TorboxBatcher(main.TORBOX_BATCH_WINDOW))
+    monkeypatch.setattr(main, "TORBOX_RATE_LIMITER", main.TokenBucket(main.TORBOX_RATE_LIMIT, main.TORBOX_RATE_BURST))
+    monkeypatch.setattr(main, "TORBOX_BREAKER", main.CircuitBreaker(
+        "torbox", main.TORBOX_BREAKER_FAILURES, main.TORBOX_BREAKER_LATENCY, main.TORBOX_BREAKER_RESET))
+    monkeypatch.setattr(main, "PROWLARR_SEARCH_CACHE", main.SearchResultCache(
+        main.PROWLARR_CACHE_TTL, main.PROWLARR_CACHE_STALE_TTL, main.PROWLARR_CACHE_MAX_ENTRIES))
+    monkeypatch.setattr(main, "PROWLARR_INDEXERS", main.IndexerCatalogue())
+    monkeypatch.setattr(main, "INDEXER_HEALTH", main.IndexerHealth(
+        main.PROWLARR_HEALTH_MIN_SAMPLES, main.PROWLARR_HEALTH_MAX_LATENCY, main.PROWLARR_HEALTH_MAX_ERROR_RATE,
+        main.PROWLARR_HEALTH_MIN_YIELD, main.PROWLARR_HEALTH_PROBE_INTERVAL))
+    main.METRICS.clear()
+    yield
+
+
+@pytest_asyncio.fixture(autouse=True)
+async def _http_clients(monkeypatch):
+    # Sessions are bound to one event loop, and every test gets its own loop
+    clients = main.UpstreamClients(main.HTTP_CLIENTS.settings)
+    monkeypatch.setattr(main, "HTTP_CLIENTS", clients)
+    yield clients
+    await clients.close()
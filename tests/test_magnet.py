@@ -0,0 +1,71 @@
+import json
+import os
+from urllib.parse import parse_qs, unquote
+
+from magnet import EMPTY_MAGNET, parse_magnet
+import main
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'prowlarr_rm_s01e02.json')
+
+
+def legacy_trackers(magnet_uri):
+    # parse_trackers_from_magnet before the magnet module
+    if not magnet_uri:
+        return []
+    try:
+        query = magnet_uri.split('?')[1]
+    except Exception:
+        return []
+    out = []
+    for part in query.split('&'):
+        if part.startswith('tr='):
+            t = unquote(part.split('=', 1)[1]).strip()
+            if t and t not in out:
+                out.append(t)
+    return out
+
+
+def legacy_hash(magnet_uri):
+    parsed = parse_qs(unquote(magnet_uri.split('?')[1]))
+    return parsed['xt'][0].split(':')[-1].lower() if 'xt' in parsed else None
+
+
+def fixture_magnets():
+    with open(FIXTURE) as f:
+        items = json.load(f)
+    mags = [main._get_magnet_uri_for_item(item) for item in items]
+    return [m for m in mags if m]
+
+
+def test_matches_legacy_parsing_on_fixture():
+    mags = fixture_magnets()
+    assert mags
+    for mag in mags:
+        parsed = parse_magnet(mag)
+        assert list(parsed.trackers) == legacy_trackers(mag)
+        assert parsed.info_hash == legacy_hash(mag)
+        assert main.parse_trackers_from_magnet(mag) == legacy_trackers(mag)
+
+
+def test_base32_btih_btmh_and_name():
+    hex_hash = 'c12fe1c06bba254a9dc9f519b335aa7c1367a88a'
+    b32 = 'YEX6DQDLXISUVHOJ6UM3GNNKPQJWPKEK'
+    parsed = parse_magnet(f'magnet:?xt=urn:btih:{b32}&dn=Big+Buck%20Bunny&tr=udp%3A%2F%2Fa%3A1&tr=udp://a:1')
+    assert parsed.info_hash == hex_hash
+    assert parsed.xt == f'urn:btih:{b32}'
+    assert parsed.name == 'Big Buck Bunny'
+    assert parsed.trackers == ('udp://a:1',)
+
+    digest = 'ab' * 32
+    v2 = parse_magnet(f'magnet:?xt=urn:btmh:1220{digest}')
+    assert v2.info_hash == digest
+    hybrid = parse_magnet(f'magnet:?xt=urn:btmh:1220{digest}&xt=urn:btih:{hex_hash.upper()}')
+    assert hybrid.info_hash == hex_hash
+    assert hybrid.xt == f'urn:btmh:1220{digest}'
+
+
+def test_non_magnets_and_cache():
+    assert parse_magnet(None) is EMPTY_MAGNET
+    assert parse_magnet('http://example/file.torrent') is EMPTY_MAGNET
+    uri = 'magnet:?xt=urn:btih:abc&tr=http://t/announce'
+    assert parse_magnet(uri) is parse_magnet(uri)
@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+import main
+from main import fanout_search_prowlarr, cached_search_prowlarr
+
+
+def torrent(idx_id):
+    return {'id': idx_id, 'name': f'idx{idx_id}', 'enabled': True, 'protocol': 'torrent', 'capabilities': {}}
+
+
+def fake_indexers(*records):
+    calls = []
+
+    async def fetch(session):
+        calls.append(session)
+        return list(records)
+    fetch.calls = calls
+    return fetch
+
+
+def per_indexer_search(delays):
+    async def fake(session, kwargs):
+        (idx_id,) = kwargs['indexerIds']
+        await asyncio.sleep(delays[idx_id])
+        return [{'title': f'from {idx_id}', 'indexerId': idx_id}]
+    return fake
+
+
+@pytest.mark.asyncio
+async def test_fanout_merges_indexers_that_beat_the_deadline(monkeypatch):
+    monkeypatch.setattr(main, 'fetch_prowlarr_indexers', fake_indexers(
+        torrent(1), torrent(2), torrent(3), dict(torrent(4), protocol='usenet'), dict(torrent(5), enabled=False)))
+    monkeypatch.setattr(main, 'search_prowlarr', per_indexer_search({1: 0, 2: 5, 3: 0.01}))
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    results = await fanout_search_prowlarr(None, {'query': 'Elf'}, deadline=0.1)
+    assert loop.time() - started < 1
+    assert [r['title'] for r in results] == ['from 1', 'from 3']
+    assert results.late == {2}
+    assert main.METRICS['prowlarr_fanout_late'] == 1
+    assert main.METRICS['prowlarr_indexer_late:2'] == 1
+
+
+@pytest.mark.asyncio
+async def test_fanout_honours_requested_indexers(monkeypatch):
+    async def indexers(session):
+        raise AssertionError('catalogue should not be consulted')
+
+    monkeypatch.setattr(main, 'fetch_prowlarr_indexers', indexers)
+    monkeypatch.setattr(main, 'search_prowlarr', per_indexer_search({'7': 0, '9': 0}))
+    results = await fanout_search_prowlarr(None, {'query': 'Elf', 'indexerIds': ['7', '9']}, deadline=1)
+    assert [r['indexerId'] for r in results] == ['7', '9']
+    assert not results.late
+
+
+@pytest.mark.asyncio
+async def test_partial_fanout_results_are_not_cached(monkeypatch):
+    monkeypatch.setattr(main, 'PROWLARR_FANOUT_ENABLED', True)
+    monkeypatch.setattr(main, 'PROWLARR_FANOUT_DEADLINE', 0.05)
+    monkeypatch.setattr(main, 'fetch_prowlarr_indexers', fake_indexers(torrent(1), torrent(2)))
+    monkeypatch.setattr(main, 'search_prowlarr', per_indexer_search({1: 0, 2: 5}))
+    await cached_search_prowlarr(None, {'query': 'Elf'})
+    await cached_search_prowlarr(None, {'query': 'Elf'})
+    assert main.METRICS['prowlarr_cache_misses'] == 2
+    assert main.METRICS['prowlarr_cache_hits'] == 0
+
+
+@pytest.mark.asyncio
+async def test_indexer_catalogue_loads_once_and_keeps_list_on_failure(monkeypatch):
+    fetch = fake_indexers(torrent(1), dict(torrent(2), protocol='usenet'))
+    monkeypatch.setattr(main, 'fetch_prowlarr_indexers', fetch)
+    catalogue = main.IndexerCatalogue()
+    await asyncio.gather(*(catalogue.ensure_loaded(None) for _ in range(5)))
+    await catalogue.ensure_loaded(None)
+    assert len(fetch.calls) == 1
+    assert catalogue.enabled_ids() == [1, 2]
+    assert catalogue.enabled_ids(protocol='torrent') == [1]
+    assert catalogue.get('2')['protocol'] == 'usenet'
+
+    async def unreachable(session):
+        return None
+
+    monkeypatch.setattr(main, 'fetch_prowlarr_indexers', unreachable)
+    assert await catalogue.refresh(None) is False
+    assert catalogue.enabled_ids() == [1, 2]
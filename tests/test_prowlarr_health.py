@@ -0,0 +1,88 @@
+import pytest
+
+import main
+from main import IndexerHealth, ProwlarrResults, query_prowlarr
+
+
+def make_health(**overrides):
+    kwargs = dict(min_samples=3, max_latency=5, max_error_rate=0.5, min_yield=0, probe_interval=60)
+    kwargs.update(overrides)
+    return IndexerHealth(**kwargs)
+
+
+def test_failing_indexer_is_skipped_then_probed_and_restored():
+    health = make_health()
+    for _ in range(3):
+        health.record(1, results=4, latency=0.5)
+        health.record(2, error=True)
+    assert health.unhealthy_reason(1) is None
+    assert health.unhealthy_reason(2) == 'errors'
+
+    # First route after going unhealthy sends a probe; later ones skip it until the interval passes
+    assert health.route([1, 2], now=100) == [1, 2]
+    health.record(2, error=True)
+    assert health.route([1, 2], now=130) == [1]
+    assert main.METRICS['prowlarr_indexers_skipped'] == 1
+    assert health.route([1, 2], now=161) == [1, 2]
+    health.record(2, results=3, latency=0.4)
+    assert health.unhealthy_reason(2) is None
+    assert health.route([1, 2], now=162) == [1, 2]
+
+
+def test_slow_and_empty_indexers_cross_thresholds():
+    health = make_health(min_yield=1)
+    for _ in range(3):
+        health.record('slow', results=5, latency=12)
+        health.record('empty', results=0, latency=0.2)
+    assert health.unhealthy_reason('slow') == 'latency'
+    assert health.unhealthy_reason('empty') == 'yield'
+    # All unhealthy and already probed: still search everything rather than nothing
+    health.route(['slow', 'empty'], now=0)
+    assert health.route(['slow', 'empty'], now=1) == ['slow', 'empty']
+
+
+def test_record_cached_credits_item_indexer():
+    health = make_health()
+    items = [{'infoHash': 'AA', 'indexerId': 3}, {'infoHash': 'bb', 'indexerId': 3}, {'infoHash': 'cc'}]
+    health.record_cached(items, {'aa': True, 'bb': False, 'cc': True})
+    assert health.snapshot()['3']['cached'] == 1
+
+
+@pytest.mark.asyncio
+async def test_query_prowlarr_drops_unhealthy_indexer_ids(monkeypatch):
+    health = make_health()
+    monkeypatch.setattr(main, 'INDEXER_HEALTH', health)
+    for _ in range(3):
+        health.record('9', error=True)
+    health.route(['9'])  # use up the probe
+    sent = []
+
+    async def fake_search(session, kwargs):
+        sent.append(kwargs.get('indexerIds'))
+        return [{'title': 'x', 'indexerId': 7}]
+
+    monkeypatch.setattr(main, 'search_prowlarr', fake_search)
+    await query_prowlarr(None, {'query': 'Elf', 'indexerIds': ['7', '9']})
+    assert sent == [['7']]
+    assert health.snapshot()['7']['results'] == 1
+
+
+@pytest.mark.asyncio
+async def test_fanout_records_latency_errors_and_late_indexers(monkeypatch):
+    import asyncio
+
+    async def fake_search(session, kwargs):
+        (idx_id,) = kwargs['indexerIds']
+        if idx_id == 'slow':
+            await asyncio.sleep(5)
+        if idx_id == 'broken':
+            return ProwlarrResults(failed=True)
+        return [{'title': 'x', 'indexerId': idx_id}]
+
+    monkeypatch.setattr(main, 'search_prowlarr', fake_search)
+    await main.fanout_search_prowlarr(None, {'query': 'Elf', 'indexerIds': ['ok', 'slow', 'broken']}, deadline=0.05)
+    snapshot = main.INDEXER_HEALTH.snapshot()
+    assert snapshot['ok']['results'] == 1 and snapshot['ok']['errors'] == 0
+    assert snapshot['ok']['latency'] is not None
+    assert snapshot['slow']['errors'] == 1
+    assert snapshot['broken']['errors'] == 1
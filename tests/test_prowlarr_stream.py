@@ -0,0 +1,140 @@
+import json
+import os
+
+import pytest
+
+import main
+from main import JSONArrayStream, read_json_response
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'prowlarr_rm_s01e02.json')
+
+
+async def chunked(data, size):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+class FakeContent:
+    def __init__(self, body, size):
+        self.body = body
+        self.size = size
+        self.requested = None
+
+    def iter_chunked(self, n):
+        self.requested = n
+        return chunked(self.body, self.size)
+
+
+class FakeResponse:
+    def __init__(self, body, size=13):
+        self.content = FakeContent(body, size)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('size', [7, 4096, 1 << 20])
+async def test_stream_decodes_fixture_like_json_loads(size):
+    with open(FIXTURE, 'rb') as f:
+        body = f.read()
+    items = [item async for item in JSONArrayStream(chunked(body, size))]
+    assert items == json.loads(body)
+
+
+@pytest.mark.asyncio
+async def test_stream_handles_split_multibyte_characters_and_scalars():
+    body = ' [ {"title": "Amélie 2001 – 東京"}, 12345, true, null, "x" ] '.encode('utf-8')
+    items = [item async for item in JSONArrayStream(chunked(body, 1))]
+    assert items == [{'title': 'Amélie 2001 – 東京'}, 12345, True, None, 'x']
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('chunks', [
+    [b'[1.', b'5]'], [b'[1e', b'5]'], [b'[-', b'7.5e3]'], [b'[1', b'2 ', b', 3]'], [b'[tr', b'ue]'],
+])
+async def test_stream_waits_for_numbers_split_inside_their_fraction_or_exponent(chunks):
+    async def feed():
+        for chunk in chunks:
+            yield chunk
+
+    assert [item async for item in JSONArrayStream(feed())] == json.loads(b''.join(chunks))
+
+
+@pytest.mark.asyncio
+async def test_stream_matches_json_loads_for_any_chunking_of_scalars():
+    body = json.dumps([0, -7.5e3, 1.25, 12e-3, 'x', True, None, {'n': 3.5}, [1e5]]).encode()
+    for size in range(1, len(body) + 1):
+        assert [item async for item in JSONArrayStream(chunked(body, size))] == json.loads(body)
+
+
+@pytest.mark.asyncio
+async def test_stream_rejects_malformed_scalars():
+    with pytest.raises(ValueError):
+        [item async for item in JSONArrayStream(chunked(b'[1x, 2]', 3))]
+
+
+@pytest.mark.asyncio
+async def test_stream_leaves_non_array_document_whole():
+    stream = JSONArrayStream(chunked(b'{"records": [{"a": 1}]}', 5))
+    assert [item async for item in stream] == []
+    assert stream.document == {'records': [{'a': 1}]}
+    assert await read_json_response(FakeResponse(b'{"records": []}')) == {'records': []}
+
+
+@pytest.mark.asyncio
+async def test_stream_rejects_truncated_body():
+    with pytest.raises(ValueError):
+        [item async for item in JSONArrayStream(chunked(b'[{"a": 1}, {"b":', 4))]
+
+
+@pytest.mark.asyncio
+async def test_read_json_response_applies_item_hook_as_items_arrive():
+    body = json.dumps([{'n': i} for i in range(5)]).encode()
+    seen = []
+
+    def hook(item):
+        seen.append(item['n'])
+        return item['n'] if item['n'] % 2 == 0 else None
+
+    assert await read_json_response(FakeResponse(body), hook) == [0, 2, 4]
+    assert seen == [0, 1, 2, 3, 4]
+
+
+@pytest.mark.asyncio
+async def test_search_prowlarr_streams_response_body():
+    with open(FIXTURE, 'rb') as f:
+        body = f.read()
+    response = FakeResponse(body, size=1000)
+
+    class Ctx:
+        async def __aenter__(self):
+            return response
+
+        async def __aexit__(self, *exc):
+            return False
+
+    response.raise_for_status = lambda: None
+
+    class Session:
+        def get(self, url, headers=None, params=None):
+            return Ctx()
+
+    results = await main.search_prowlarr(Session(), {'query': 'Rick and Morty'})
+    assert results == [main.project_prowlarr_item(item) for item in json.loads(body)]
+    assert response.content.requested == main._JSON_CHUNK_SIZE
+
+
+def test_project_prowlarr_item_keeps_only_used_fields():
+    with open(FIXTURE, 'rb') as f:
+        raw = json.load(f)[0]
+    projected = main.project_prowlarr_item(raw)
+    assert set(projected) <= set(main.PROWLARR_ITEM_FIELDS)
+    assert 'categories' not in projected and 'indexerFlags' not in projected
+    for key, value in projected.items():
+        assert raw[key] == value
+
+
+def test_projection_does_not_change_rendered_feed():
+    with open(FIXTURE, 'rb') as f:
+        raw = json.load(f)
+    projected = [main.project_prowlarr_item(item) for item in raw]
+    status = {main.extract_info_hashes(raw)[0]: True}
+    assert main.generate_torznab_xml(projected, status) == main.generate_torznab_xml(raw, status)
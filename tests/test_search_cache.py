@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+import main
+from main import canonical_search_key, cached_search_prowlarr
+
+
+def test_canonical_search_key_normalizes_equivalent_searches():
+    a = {'query': '  Rick and   Morty ', 'categories': ['5040', '5030'], 'type': 'tvsearch', 'season': '1'}
+    b = {'query': 'rick and morty', 'categories': ['5030', '5040'], 'type': 'tvsearch', 'season': '1', 'ep': ''}
+    assert canonical_search_key(a) == canonical_search_key(b)
+    c = dict(b, tvdbid='275274')
+    assert canonical_search_key(c) != canonical_search_key(b)
+
+
+class CountingSearch:
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self, session, kwargs):
+        self.calls += 1
+        return [{'infoHash': f'hash{self.calls}', 'title': kwargs.get('query')}]
+
+
+@pytest.mark.asyncio
+async def test_cached_search_prowlarr_serves_fresh_entries(monkeypatch):
+    fake = CountingSearch()
+    monkeypatch.setattr(main, 'search_prowlarr', fake)
+    first = await cached_search_prowlarr(None, {'query': 'Elf', 'categories': ['2000']})
+    second = await cached_search_prowlarr(None, {'query': 'elf ', 'categories': ['2000']})
+    assert fake.calls == 1
+    assert first == second
+    assert main.METRICS['prowlarr_cache_hits'] == 1
+
+
+@pytest.mark.asyncio
+async def test_cached_search_prowlarr_stale_while_revalidate(monkeypatch):
+    fake = CountingSearch()
+    monkeypatch.setattr(main, 'search_prowlarr', fake)
+    cache = main.SearchResultCache(ttl=0.05, stale_ttl=10, max_entries=8)
+    monkeypatch.setattr(main, 'PROWLARR_SEARCH_CACHE', cache)
+    kwargs = {'query': 'Elf'}
+    await cached_search_prowlarr(None, kwargs)
+    await asyncio.sleep(0.06)
+    # Stale: the old results come back immediately and a refresh runs in the background
+    stale = await cached_search_prowlarr(None, kwargs)
+    assert stale[0]['infoHash'] == 'hash1'
+    await asyncio.sleep(0)
+    await asyncio.gather(*main._search_refresh_tasks)
+    assert fake.calls == 2
+    fresh = await cached_search_prowlarr(None, kwargs)
+    assert fresh[0]['infoHash'] == 'hash2'
+    assert fake.calls == 2
+
+
+def test_search_result_cache_expires_and_evicts():
+    cache = main.SearchResultCache(ttl=10, stale_ttl=5, max_entries=2)
+    cache.put('a', [1], now=0)
+    cache.put('b', [2], now=0)
+    cache.put('c', [3], now=0)
+    assert cache.get('a', now=1) == (None, False)
+    assert cache.get('b', now=12) == ([2], False)
+    assert cache.get('c', now=16) == (None, False)
+
+
+@pytest.mark.asyncio
+async def test_handle_search_shares_identical_in_flight_searches(monkeypatch):
+    from starlette.datastructures import QueryParams
+    monkeypatch.setattr(main, 'PROWLARR_SEARCH_CACHE', None)
+    calls = []
+
+    async def slow_search(session, kwargs):
+        calls.append(kwargs)
+        await asyncio.sleep(0.05)
+        return [{'title': 'Elf 2003', 'link': 'http://example/elf.torrent', 'seeders': 3}]
+
+    monkeypatch.setattr(main, 'search_prowlarr', slow_search)
+    responses = await asyncio.gather(
+        main.handle_search(QueryParams({'t': 'movie', 'q': 'Elf', 'cat': '2000,2040'})),
+        main.handle_search(QueryParams({'t': 'movie', 'q': 'elf', 'cat': '2040,2000'})),
+        main.handle_search(QueryParams({'t': 'movie', 'q': 'Elf', 'cat': '2000,2040'})),
+    )
+    assert len(calls) == 1
+    bodies = []
+    for response in responses:
+        bodies.append(b''.join([chunk async for chunk in response.body_iterator]))
+    assert len(set(bodies)) == 1
+    assert b'Elf 2003' in bodies[0]
+    assert main.METRICS['search_coalesced'] == 2
+    assert len(main.SEARCH_FLIGHTS) == 0
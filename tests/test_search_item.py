@@ -0,0 +1,73 @@
+from datetime import datetime, timezone
+
+import main
+from main import SearchItem, consolidate_all_items, generate_torznab_xml
+
+
+def test_search_item_derives_fields_once():
+    item = SearchItem({
+        'title': 'Elf',
+        'guid': 'magnet:?xt=urn:btih:ABCDEF&dn=Elf&tr=udp%3A%2F%2Ft1%3A80&tr=udp://t2:80&tr=udp://t1:80',
+        'seeders': '12',
+        'publishDate': '2024-05-10T16:57:09Z',
+        'categories': [{'id': 2000}],
+    })
+    assert item.hash == 'abcdef'
+    assert item.raw_hash() == 'ABCDEF'
+    assert item.trackers == ('udp://t1:80', 'udp://t2:80')
+    assert item.seed_count == 12
+    assert item.published == datetime(2024, 5, 10, 16, 57, 9, tzinfo=timezone.utc)
+    assert 'categories' not in item
+    assert item['title'] == 'Elf' and item.get('size', 0) == 0
+
+
+def test_search_item_writes_rederive_dependent_fields():
+    item = SearchItem({'infoHash': 'AA', 'seeders': 'n/a'})
+    assert item.seed_count == 0
+    item['seeders'] = 7
+    item['magnetUri'] = 'magnet:?xt=urn:btih:AA&tr=http://t/announce'
+    assert item.seed_count == 7
+    assert item.trackers == ('http://t/announce',)
+
+
+def test_pipeline_parses_each_magnet_once(monkeypatch):
+    items = [
+        SearchItem({'infoHash': 'AB', 'title': 'x', 'seeders': 1, 'magnetUri': 'magnet:?xt=urn:btih:AB&tr=http://t1/a'}),
+        SearchItem({'infoHash': 'ab', 'title': 'y', 'seeders': 5, 'magnetUri': 'magnet:?xt=urn:btih:AB&tr=http://t2/a'}),
+    ]
+    calls = []
+    real = main.parse_magnet
+    monkeypatch.setattr(main, 'parse_magnet', lambda uri: calls.append(uri) or real(uri))
+    consolidated = consolidate_all_items(items, {'ab': True})
+    xml = generate_torznab_xml(consolidated, {'ab': True})
+    assert calls == []
+    assert xml.count(b'<item>') == 1
+    assert consolidated[0]['title'] == 'y'
+    assert consolidated[0].trackers == ('http://t1/a', 'http://t2/a')
+    # Inputs may be shared with the search cache and must not be modified
+    assert items[1]['magnetUri'] == 'magnet:?xt=urn:btih:AB&tr=http://t2/a'
+    assert items[1].seed_count == 5
+
+
+def test_consolidation_overlays_shared_items_and_is_not_repeated(monkeypatch):
+    items = [
+        SearchItem({'infoHash': 'AB', 'title': 'x', 'seeders': 5, 'magnetUri': 'magnet:?xt=urn:btih:AB&tr=http://t1/a'}),
+        SearchItem({'infoHash': 'ab', 'title': 'y', 'seeders': 5, 'magnetUri': 'magnet:?xt=urn:btih:AB&tr=http://t2/a'}),
+        SearchItem({'title': 'no hash', 'link': 'http://x/file.torrent'}),
+    ]
+    consolidated = consolidate_all_items(items, {'ab': True})
+    assert isinstance(consolidated, main.ConsolidatedResults)
+    canonical = consolidated[0]
+    # First item wins the seeders tie and is referenced, not copied
+    assert canonical.base is items[0]
+    assert canonical['seeders'] == main.PACHELARR_SEEDERS_BOOST
+    assert items[0]['seeders'] == 5
+    assert canonical['guid'] == canonical['magnetUri'] == 'magnet:?xt=urn:btih:AB&tr=http://t1/a&tr=http://t2/a'
+    assert consolidated[1] is items[2]
+
+    def fail(*args, **kwargs):
+        raise AssertionError('already consolidated')
+
+    monkeypatch.setattr(main, 'consolidate_all_items', fail)
+    xml = generate_torznab_xml(consolidated, {'ab': True})
+    assert xml.count(b'<item>') == 2
@@ -0,0 +1,165 @@
+import gzip
+import json
+import os
+
+import aiohttp
+import pytest
+
+import main
+from tmdb_index import TitleIndex, build_index
+
+
+def write_export(path, rows):
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        for row in rows:
+            f.write(row if isinstance(row, str) else json.dumps(row))
+            f.write('\n')
+    return str(path)
+
+
+@pytest.fixture
+def exports(tmp_path):
+    movies = write_export(tmp_path / 'movie_ids_05_15_2024.json.gz', [
+        {'adult': False, 'id': 603, 'original_title': 'The Matrix', 'popularity': 80.1, 'video': False},
+        {'adult': False, 'id': 129, 'original_title': '千と千尋の神隠し', 'popularity': 60.0, 'video': False},
+        'not json',
+        {'adult': False, 'id': 7, 'original_title': '', 'popularity': 0, 'video': False},
+    ] + [{'id': i, 'original_title': f'Movie {i}'} for i in range(1000, 1500)])
+    shows = write_export(tmp_path / 'tv_series_ids_05_15_2024.json.gz', [
+        {'id': 603, 'original_name': 'A Show', 'popularity': 1.0},
+    ])
+    return [movies, shows]
+
+
+def test_index_resolves_ids_per_kind(tmp_path, exports):
+    path = str(tmp_path / 'titles.idx')
+    assert build_index(exports + [str(tmp_path / 'collection_ids_05_15_2024.json.gz')], path) == 503
+    index = TitleIndex(path)
+    try:
+        assert len(index) == 503
+        assert index.get('movie', 603) == 'The Matrix'
+        assert index.get('tv', '603') == 'A Show'
+        assert index.get('movie', '129') == '千と千尋の神隠し'
+        assert all(index.get('movie', i) == f'Movie {i}' for i in range(1000, 1500))
+        for kind, tmdb_id in (('movie', 7), ('movie', 1500), ('tv', 604), ('movie', 'abc'), ('movie', -1), ('person', 603)):
+            assert index.get(kind, tmdb_id) is None
+    finally:
+        index.close()
+
+
+def test_index_is_rebuilt_only_for_newer_exports(tmp_path, exports):
+    path = str(tmp_path / 'data' / 'titles.idx')
+    index = main.open_tmdb_index(path, str(tmp_path))
+    assert index.get('movie', 603) == 'The Matrix'
+    index.close()
+    built = os.path.getmtime(path)
+    os.utime(path, (built + 100, built + 100))
+    index = main.open_tmdb_index(path, str(tmp_path))
+    assert os.path.getmtime(path) == built + 100
+    index.close()
+    assert main.open_tmdb_index(str(tmp_path / 'missing.idx'), '') is None
+
+
+class FakeResponse:
+    def __init__(self, status, data):
+        self.status = status
+        self._data = data
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+    async def json(self):
+        return self._data
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise aiohttp.ClientError(f"status {self.status}")
+
+
+class FakeTMDB:
+    """Answers GETs from a {url fragment: (status, data)} map and records the URLs."""
+
+    def __init__(self, routes):
+        self.routes = routes
+        self.urls = []
+
+    def get(self, url):
+        self.urls.append(url)
+        for fragment, route in self.routes.items():
+            if fragment in url:
+                return FakeResponse(*route)
+        return FakeResponse(404, {})
+
+
+@pytest.fixture
+def index(tmp_path, exports, monkeypatch):
+    path = str(tmp_path / 'titles.idx')
+    build_index(exports, path)
+    index = TitleIndex(path)
+    monkeypatch.setattr(main, 'TMDB_TITLE_INDEX', index)
+    yield index
+    index.close()
+
+
+@pytest.mark.asyncio
+async def test_index_answers_only_when_the_tmdb_lookup_fails(index, monkeypatch):
+    monkeypatch.setattr(main, 'TMDB_API_KEY', 'k')
+    tmdb = FakeTMDB({
+        '/movie/129': (200, {'title': 'Spirited Away', 'release_date': '2001-07-20'}),
+        '/movie/603': (503, {}),
+        'tt0000001': (200, {'movie_results': [{'title': 'From IMDb'}]}),
+    })
+    # The API's localized title with a year beats the index's original title
+    assert await main.lookup_title_from_id(tmdb, tmdbid='129', search_type='movie') == 'Spirited Away 2001'
+    # ...and so does a higher priority source
+    assert await main.lookup_title_from_id(tmdb, imdbid='0000001', tmdbid='129', search_type='movie') == 'From IMDb'
+    assert main.METRICS['tmdb_index_hits'] == 0
+    # A failed TMDB ID lookup falls back to the index, without caching its answer
+    assert await main.lookup_title_from_id(tmdb, tmdbid='603', search_type='movie') == 'The Matrix'
+    assert main.TMDB_TITLE_CACHE.get('tmdb', '603', 'movie') == (False, None)
+    assert main.METRICS['tmdb_index_hits'] == 1
+
+
+@pytest.mark.asyncio
+async def test_index_answers_tmdb_ids_without_an_api_key(index, monkeypatch):
+    monkeypatch.setattr(main, 'TMDB_API_KEY', '')
+    tmdb = FakeTMDB({})
+    assert await main.lookup_title_from_id(tmdb, tmdbid='603', search_type='movie') == 'The Matrix'
+    assert await main.lookup_title_from_id(tmdb, tmdbid='603', search_type='tvsearch') == 'A Show'
+    assert await main.lookup_title_from_id(tmdb, tmdbid='999999', search_type='movie') is None
+    assert await main.lookup_title_from_id(tmdb, imdbid='0133093', search_type='movie') is None
+    assert tmdb.urls == []
+    assert main.METRICS['tmdb_index_hits'] == 2 and main.METRICS['tmdb_index_misses'] == 1
+
+
+def test_later_rows_win_and_no_scratch_files_are_left(tmp_path):
+    movies = write_export(tmp_path / 'movie_ids_05_16_2024.json.gz', [
+        {'id': 5, 'original_title': 'Old'}, {'id': 3, 'original_title': 'Three'}, {'id': 5, 'original_title': 'New'},
+    ])
+    path = str(tmp_path / 'titles.idx')
+    assert build_index([movies], path) == 2
+    index = TitleIndex(path)
+    try:
+        assert index.get('movie', 5) == 'New' and index.get('movie', 3) == 'Three'
+    finally:
+        index.close()
+    assert sorted(os.listdir(tmp_path)) == ['movie_ids_05_16_2024.json.gz', 'titles.idx']
+
+
+def test_corrupt_export_keeps_the_previous_index(tmp_path, exports):
+    path = str(tmp_path / 'titles.idx')
+    build_index(exports, path)
+    built = os.path.getmtime(path)
+    corrupt = tmp_path / 'movie_ids_05_16_2024.json.gz'
+    with gzip.open(corrupt, 'wb') as f:
+        f.write(b'{"id": 1, "original_title": "\xff\xfe"}\n')
+    os.utime(corrupt, (built + 100, built + 100))
+    index = main.open_tmdb_index(path, str(tmp_path))
+    try:
+        assert index.get('movie', 603) == 'The Matrix'
+    finally:
+        index.close()
+    assert not any(name.endswith('.tmp') for name in os.listdir(tmp_path))
@@ -0,0 +1,242 @@
+import asyncio
+import time
+
+import aiohttp
+import pytest
+
+import main
+from main import TitleCache, lookup_title_from_id
+
+
+class FakeResponse:
+    def __init__(self, status, data, delay=0, headers=None):
+        self.status = status
+        self._data = data
+        self._delay = delay
+        self.headers = headers or {}
+
+    async def __aenter__(self):
+        await asyncio.sleep(self._delay)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+    async def json(self):
+        return self._data
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise aiohttp.ClientError(f"status {self.status}")
+
+
+class FakeTMDB:
+    """Answers GETs from a {url fragment: (status, data[, delay[, headers]])} map and records the URLs.
+
+    A list of such tuples is answered in order, repeating the last one.
+    """
+
+    def __init__(self, routes):
+        self.routes = routes
+        self.urls = []
+
+    def get(self, url):
+        self.urls.append(url)
+        for fragment, route in self.routes.items():
+            if fragment in url:
+                if isinstance(route, list):
+                    route = route.pop(0) if len(route) > 1 else route[0]
+                return FakeResponse(*route)
+        return FakeResponse(404, {})
+
+
+@pytest.fixture(autouse=True)
+def _api_key(monkeypatch):
+    monkeypatch.setattr(main, 'TMDB_API_KEY', 'k')
+
+
+@pytest.mark.asyncio
+async def test_repeat_lookup_is_served_from_the_cache():
+    tmdb = FakeTMDB({'/find/81189': (200, {'tv_results': [{'name': 'Breaking Bad', 'first_air_date': '2008-01-20'}]})})
+    for _ in range(3):
+        assert await lookup_title_from_id(tmdb, tvdbid='81189', search_type='tvsearch') == 'Breaking Bad 2008'
+    assert len(tmdb.urls) == 1
+    assert main.METRICS['tmdb_cache_hits'] == 2 and main.METRICS['tmdb_cache_misses'] == 1
+    # The search type is part of the key
+    await lookup_title_from_id(tmdb, tvdbid='81189', search_type='search')
+    assert len(tmdb.urls) == 2
+
+
+@pytest.mark.asyncio
+async def test_negative_answers_are_cached_but_errors_are_not():
+    tmdb = FakeTMDB({
+        'tt0000001': (200, {'movie_results': [], 'tv_results': []}),
+        '/find/555': (503, {}),
+        '/movie/603': (200, {'title': 'The Matrix', 'release_date': '1999-03-30'}),
+    })
+    assert await lookup_title_from_id(tmdb, imdbid='0000001', tvdbid='555', tmdbid='603') == 'The Matrix 1999'
+    assert len(tmdb.urls) == 3
+    assert await lookup_title_from_id(tmdb, imdbid='0000001', tvdbid='555', tmdbid='603') == 'The Matrix 1999'
+    # Only the TVDB lookup, which failed, is retried
+    assert tmdb.urls[3:] == [tmdb.urls[1]]
+
+
+def test_title_cache_expiry_and_size_bound():
+    cache = TitleCache(':memory:', ttl=100, negative_ttl=10, max_entries=3)
+    cache.store('tmdb', 1, 'movie', 'One', now=0)
+    cache.store('tmdb', 2, 'movie', None, now=1)
+    assert cache.get('tmdb', '1', 'movie', now=50) == (True, 'One')
+    assert cache.get('tmdb', 2, 'movie', now=5) == (True, None)
+    assert cache.get('tmdb', 2, 'movie', now=20) == (False, None)
+    cache.store('tmdb', 3, 'movie', 'Three', now=30)
+    cache.store('tmdb', 4, 'movie', 'Four', now=31)
+    # The expired negative entry is evicted first, then the oldest write
+    assert cache.stats()['entries'] == 3 and cache.get('tmdb', 1, 'movie', now=32)[0]
+    cache.store('tmdb', 5, 'movie', 'Five', now=33)
+    assert not cache.get('tmdb', 1, 'movie', now=34)[0]
+    assert cache.stats() == {'path': ':memory:', 'entries': 3, 'positive': 3, 'negative': 0, 'max_entries': 3}
+
+
+def test_title_cache_persists_across_instances(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    TitleCache(path).store('imdb', '0133093', 'movie', 'The Matrix 1999')
+    assert TitleCache(path).get('imdb', '0133093', 'movie') == (True, 'The Matrix 1999')
+
+
+def test_cache_databases_commit_without_an_fsync_per_write(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    for cache in (TitleCache(path), main.TorboxStatusCache(path)):
+        conn = cache._connect()
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        # 1 = NORMAL
+        assert conn.execute('PRAGMA synchronous').fetchone()[0] == 1
+
+
+def test_caches_fall_back_to_memory_when_the_database_cannot_be_opened(tmp_path):
+    blocker = tmp_path / 'file'
+    blocker.write_text('')
+    path = str(blocker / 'cache.sqlite3')
+    for cache in (TitleCache(path), main.TorboxStatusCache(path)):
+        assert cache._connect().execute('PRAGMA database_list').fetchone()[2] == ''
+    cache = TitleCache(path)
+    cache.store('tmdb', '1', 'movie', 'One')
+    assert cache.get('tmdb', '1', 'movie') == (True, 'One')
+
+
+SHOW = {'tv_results': [{'name': 'Show', 'first_air_date': '2010-01-01'}]}
+
+
+@pytest.mark.asyncio
+async def test_lookups_race_and_the_highest_priority_title_wins():
+    tmdb = FakeTMDB({
+        'tt0000002': (200, {'tv_results': [{'name': 'From IMDb'}]}, 0.1),
+        '/find/10': (200, SHOW, 0.1),
+        '/find/20': (200, SHOW, 0.1),
+    })
+    started = time.monotonic()
+    title = await lookup_title_from_id(tmdb, imdbid='0000002', tvdbid='10', rid='20', search_type='tvsearch')
+    assert title == 'From IMDb'
+    # All three ran at once: one round-trip, not three
+    assert time.monotonic() - started < 0.25
+    assert len(tmdb.urls) == 3
+
+
+@pytest.mark.asyncio
+async def test_slower_lower_priority_lookups_are_cancelled():
+    tmdb = FakeTMDB({
+        'tt0000003': (200, {'movie_results': [{'title': 'Fast'}]}),
+        '/find/30': (200, SHOW, 5),
+    })
+    assert await lookup_title_from_id(tmdb, imdbid='0000003', tvdbid='30') == 'Fast'
+    assert main.METRICS['tmdb_lookups_cancelled'] == 1
+    # The cancelled lookup left nothing in the cache
+    assert main.TMDB_TITLE_CACHE.get('tvdb', '30', 'movie') == (False, None)
+
+
+@pytest.mark.asyncio
+async def test_lower_priority_title_is_used_when_higher_ones_have_none():
+    tmdb = FakeTMDB({
+        'tt0000004': (200, {'movie_results': []}, 0.05),
+        '/find/40': (200, SHOW),
+    })
+    assert await lookup_title_from_id(tmdb, imdbid='0000004', tvdbid='40') == 'Show 2010'
+    # A cached lower-priority title still waits for an uncached higher-priority lookup
+    tmdb.routes['tt0000005'] = (200, {'movie_results': [{'title': 'Better'}]})
+    assert await lookup_title_from_id(tmdb, imdbid='0000005', tvdbid='40') == 'Better'
+
+
+@pytest.mark.asyncio
+async def test_throttled_lookups_wait_for_retry_after(monkeypatch):
+    sleeps = []
+    real_sleep = asyncio.sleep
+
+    async def fake_sleep(delay):
+        sleeps.append(delay)
+        await real_sleep(0)
+
+    monkeypatch.setattr(main.asyncio, 'sleep', fake_sleep)
+    # The limiter's Retry-After pause would otherwise spin on the patched sleep
+    monkeypatch.setattr(main, 'TMDB_RATE_LIMITER', None)
+    tmdb = FakeTMDB({'/find/50': [(429, {}, 0, {'Retry-After': '2'}), (200, SHOW)]})
+    assert await lookup_title_from_id(tmdb, tvdbid='50', search_type='tvsearch') == 'Show 2010'
+    assert 2.0 in sleeps and len(tmdb.urls) == 2
+    assert main.METRICS['tmdb_throttled'] == 1
+    assert main.METRICS['tmdb_successes'] == 1 and main.METRICS['tmdb_failures'] == 0
+
+    # Still throttled after the last attempt: a failure, and nothing is cached
+    tmdb = FakeTMDB({'/find/51': (429, {}, 0, {'Retry-After': '1'})})
+    assert await lookup_title_from_id(tmdb, tvdbid='51', search_type='tvsearch') is None
+    assert len(tmdb.urls) == main.TMDB_MAX_RETRIES
+    assert main.METRICS['tmdb_failures'] == 1
+    assert main.TMDB_TITLE_CACHE.get('tvdb', '51', 'tvsearch') == (False, None)
+
+
+@pytest.mark.asyncio
+async def test_retry_after_beyond_the_budget_fails_at_once(monkeypatch):
+    monkeypatch.setattr(main, 'TMDB_RETRY_BUDGET', 1)
+    tmdb = FakeTMDB({'/find/52': (429, {}, 0, {'Retry-After': '30'})})
+    assert await lookup_title_from_id(tmdb, tvdbid='52', search_type='tvsearch') is None
+    assert len(tmdb.urls) == 1
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_spaces_out_lookups(monkeypatch):
+    monkeypatch.setattr(main, 'TMDB_RATE_LIMITER', main.TokenBucket(50, 2))
+    tmdb = FakeTMDB({'/find/': (200, SHOW)})
+    started = time.monotonic()
+    await asyncio.gather(*(lookup_title_from_id(tmdb, tvdbid=str(i), search_type='tvsearch') for i in range(6)))
+    # Two requests from the burst, then four more at 50/s
+    assert time.monotonic() - started >= 0.07
+    assert main.METRICS['tmdb_requests'] == 6
+
+
+@pytest.mark.asyncio
+async def test_identical_concurrent_lookups_share_one_request():
+    tmdb = FakeTMDB({'/find/60': (200, SHOW, 0.05)})
+    titles = await asyncio.gather(*(lookup_title_from_id(tmdb, tvdbid='60', search_type='tvsearch') for _ in range(5)))
+    assert titles == ['Show 2010'] * 5
+    assert len(tmdb.urls) == 1
+    assert main.METRICS['tmdb_lookup_coalesced'] == 4
+    assert len(main.TMDB_FLIGHTS) == 0
+
+
+@pytest.mark.asyncio
+async def test_shared_lookup_is_cancelled_only_when_every_caller_is():
+    flights = main.SingleFlight('test', cancel_orphans=True)
+    started = asyncio.Event()
+
+    async def slow():
+        started.set()
+        await asyncio.sleep(5)
+
+    first = asyncio.ensure_future(flights.run('k', slow))
+    second = asyncio.ensure_future(flights.run('k', slow))
+    await started.wait()
+    shared = flights._inflight['k']
+    first.cancel()
+    await asyncio.sleep(0)
+    assert not shared.cancelled()
+    second.cancel()
+    await asyncio.gather(first, second, return_exceptions=True)
+    await asyncio.sleep(0)
+    assert shared.cancelled() and len(flights) == 0
@@ -0,0 +1,151 @@
+import asyncio
+import json
+
+import pytest
+from starlette.requests import Request
+
+import main
+from main import TitleWarmup, library_title_lookups
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.status = 200
+        self._data = data
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+    async def json(self):
+        return self._data
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeTMDB:
+    """Names every show/movie after its URL and tracks how many calls overlap."""
+
+    def __init__(self):
+        self.urls = []
+        self.active = self.peak = 0
+
+    def get(self, url):
+        self.urls.append(url)
+        return self._answer(url)
+
+    def _answer(self, url):
+        tmdb = self
+
+        class Ctx(FakeResponse):
+            async def __aenter__(self):
+                tmdb.active += 1
+                tmdb.peak = max(tmdb.peak, tmdb.active)
+                await asyncio.sleep(0.01)
+                tmdb.active -= 1
+                return self
+
+        name = url.split('/3/', 1)[1].split('?', 1)[0]
+        return Ctx({'tv_results': [{'name': name}], 'movie_results': [], 'title': name, 'name': name})
+
+
+SERIES = [
+    {'title': 'Breaking Bad', 'tvdbId': 81189, 'imdbId': 'tt0903747', 'tvRageId': 0, 'tmdbId': 1396},
+    {'title': 'No IDs'},
+]
+MOVIES = [
+    {'title': 'The Matrix', 'tmdbId': 603, 'imdbId': 'tt0133093'},
+    {'title': 'The Matrix (dupe)', 'tmdbId': 603},
+]
+
+
+@pytest.fixture(autouse=True)
+def _api_key(monkeypatch):
+    monkeypatch.setattr(main, 'TMDB_API_KEY', 'k')
+
+
+def test_library_export_becomes_one_lookup_per_id():
+    lookups = library_title_lookups({'series': SERIES, 'movies': MOVIES, 'version': 3})
+    assert lookups == [
+        {'imdbid': '0903747', 'search_type': 'tvsearch'},
+        {'tvdbid': '81189', 'search_type': 'tvsearch'},
+        {'tmdbid': '1396', 'search_type': 'tvsearch'},
+        {'imdbid': '0133093', 'search_type': 'movie'},
+        {'tmdbid': '603', 'search_type': 'movie'},
+    ]
+    main.TMDB_TITLE_CACHE.store('tvdb', '81189', 'tvsearch', 'Breaking Bad 2008')
+    assert {'tvdbid': '81189', 'search_type': 'tvsearch'} not in library_title_lookups(SERIES)
+    assert library_title_lookups('nonsense') == []
+
+
+@pytest.mark.asyncio
+async def test_warmup_fills_the_title_cache_in_rate_limited_batches():
+    tmdb = FakeTMDB()
+    warmup = TitleWarmup(batch_size=2, interval=0.01)
+    assert warmup.start(SERIES + MOVIES, session=tmdb) == 5
+    assert warmup.start(SERIES, session=tmdb) is None
+    await warmup.task
+    assert tmdb.peak == 2 and len(tmdb.urls) == 5
+    assert warmup.stats()['done'] == 5 and warmup.stats()['resolved'] == 5
+    assert main.METRICS['tmdb_warmup_resolved'] == 5
+    assert main._background_tasks == []
+    # Searches for the warmed IDs are now answered without TMDB
+    assert await main.lookup_title_from_id(tmdb, tvdbid='81189', search_type='tvsearch') == 'find/81189'
+    assert len(tmdb.urls) == 5
+
+
+def make_request(body, headers=(('x-api-key', 'secret'),), query=b''):
+    chunks = [body[i:i + 4] for i in range(0, len(body), 4)] or [b'']
+
+    async def receive():
+        return {'type': 'http.request', 'body': chunks.pop(0), 'more_body': bool(chunks)}
+    return Request({'type': 'http', 'method': 'POST', 'path': '/admin/tmdb-warmup',
+                    'headers': [(k.encode(), v.encode()) for k, v in headers], 'query_string': query}, receive)
+
+
+@pytest.mark.asyncio
+async def test_admin_endpoint_starts_a_warmup(monkeypatch, tmp_path):
+    monkeypatch.setattr(main, 'PACHELARR_API_KEY', 'secret')
+    started = []
+    monkeypatch.setattr(main, 'TMDB_WARMUP', TitleWarmup())
+    monkeypatch.setattr(main.TMDB_WARMUP, 'start', lambda export: started.append(export) or 2)
+    response = await main.tmdb_warmup(make_request(json.dumps(MOVIES).encode()))
+    assert response.status_code == 202 and json.loads(response.body) == {'queued': 2}
+    assert started == [MOVIES]
+
+    assert (await main.tmdb_warmup(make_request(b''))).status_code == 400
+    assert (await main.tmdb_warmup(make_request(b'{not json'))).status_code == 400
+    export = tmp_path / 'library.json'
+    export.write_text(json.dumps(SERIES))
+    monkeypatch.setattr(main, 'TMDB_WARMUP_FILE', str(export))
+    assert (await main.tmdb_warmup(make_request(b'', headers=(), query=b'apikey=secret'))).status_code == 202
+    assert started[-1] == SERIES
+
+    monkeypatch.setattr(main.TMDB_WARMUP, 'start', lambda export: None)
+    assert (await main.tmdb_warmup(make_request(b''))).status_code == 409
+
+
+@pytest.mark.asyncio
+async def test_admin_endpoint_requires_the_api_key_and_caps_the_body(monkeypatch):
+    started = []
+    monkeypatch.setattr(main, 'TMDB_WARMUP', TitleWarmup())
+    monkeypatch.setattr(main.TMDB_WARMUP, 'start', lambda export: started.append(export) or 1)
+    body = json.dumps(MOVIES).encode()
+    # Disabled until a key is configured
+    monkeypatch.setattr(main, 'PACHELARR_API_KEY', None)
+    assert (await main.tmdb_warmup(make_request(body))).status_code == 403
+    monkeypatch.setattr(main, 'PACHELARR_API_KEY', 'secret')
+    assert (await main.tmdb_warmup(make_request(body, headers=()))).status_code == 401
+    assert (await main.tmdb_warmup(make_request(body, headers=(('x-api-key', 'wrong'),)))).status_code == 401
+
+    monkeypatch.setattr(main, 'TMDB_WARMUP_MAX_BODY', len(body) - 1)
+    declared = (('x-api-key', 'secret'), ('content-length', str(len(body))))
+    assert (await main.tmdb_warmup(make_request(body, headers=declared))).status_code == 413
+    # Without a Content-Length the cap applies while the body streams in
+    assert (await main.tmdb_warmup(make_request(body))).status_code == 413
+    assert started == []
+    monkeypatch.setattr(main, 'TMDB_WARMUP_MAX_BODY', len(body))
+    assert (await main.tmdb_warmup(make_request(body))).status_code == 202
@@ -6,9 +6,10 @@ from main import check_torbox_cache, TORBOX_CHUNK_SIZE
 
 
 class FakeCtx:
-    def __init__(self, status, data):
+    def __init__(self, status, data, headers=None):
         self.status = status
         self._data = data
+        self.headers = headers or {}
 
     async def __aenter__(self):
         return self
@@ -41,7 +42,7 @@ class FakeSession:
         self.last_headers = headers
         resp = self._responses[self._idx]
         self._idx = min(self._idx + 1, len(self._responses) - 1)
-        return FakeCtx(resp[0], resp[1] if len(resp) > 1 else {})
+        return FakeCtx(resp[0], resp[1] if len(resp) > 1 else {}, resp[2] if len(resp) > 2 else None)
 
 
 @pytest.mark.asyncio
@@ -117,6 +118,369 @@ async def test_check_torbox_cache_deduplication_order():
     assert out == {"abc123": True}
 
 
+@pytest.mark.asyncio
+async def test_check_torbox_cache_only_sends_cache_misses():
+    import main
+    main.TORBOX_STATUS_CACHE.store(["aaa111", "bbb222"], {"aaa111": True})
+    session = FakeSession([(200, {"data": {"ccc333": True}})])
+    out = await check_torbox_cache(session, ["AAA111", "BBB222", "CCC333"])
+    # aaa111 (positive) and bbb222 (negative) are answered locally
+    assert session.last_payload == {"hashes": ["ccc333"]}
+    assert out == {"aaa111": True, "ccc333": True}
+    assert main.METRICS["torbox_cache_hits"] == 2
+    assert main.METRICS["torbox_cache_misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_check_torbox_cache_full_hit_skips_torbox():
+    session = FakeSession([(200, {"abc123": True})])
+    await check_torbox_cache(session, ["ABC123", "DEF456"])
+    session.last_payload = None
+    out = await check_torbox_cache(session, ["abc123", "def456"])
+    assert session.last_payload is None
+    assert out == {"abc123": True}
+
+
+@pytest.mark.asyncio
+async def test_check_torbox_cache_does_not_cache_failed_chunks(monkeypatch):
+    import main
+    monkeypatch.setattr(main, "TORBOX_RETRY_BACKOFF", 0)
+    session = FakeSession([(500, {})])
+    assert await check_torbox_cache(session, ["ABC123"]) == {}
+    _, misses = main.TORBOX_STATUS_CACHE.lookup(["abc123"])
+    assert misses == ["abc123"]
+
+
+class SlowSession:
+    """Torbox fake that answers every hash as cached after a delay, tracking concurrency."""
+
+    def __init__(self, delay=0.05, status_for=None):
+        self.delay = delay
+        self.status_for = status_for or (lambda chunk: 200)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.completed = 0
+        self.payloads = []
+
+    def post(self, url, json, headers):
+        session = self
+        chunk = list(json['hashes'])
+        session.payloads.append(chunk)
+
+        class _Ctx:
+            status = session.status_for(chunk)
+
+            async def __aenter__(self):
+                session.in_flight += 1
+                session.max_in_flight = max(session.max_in_flight, session.in_flight)
+                try:
+                    await asyncio.sleep(session.delay if self.status != 401 else 0)
+                finally:
+                    session.in_flight -= 1
+                return self
+
+            async def __aexit__(self, exc_type, exc, tb):
+                return False
+
+            async def json(self):
+                session.completed += 1
+                return {h: True for h in chunk}
+
+            def raise_for_status(self):
+                if self.status >= 400:
+                    raise aiohttp.ClientError(f"status {self.status}")
+
+        return _Ctx()
+
+
+@pytest.mark.asyncio
+async def test_check_torbox_cache_dispatches_chunks_concurrently(monkeypatch):
+    import main
+    monkeypatch.setattr(main, "TORBOX_CONCURRENCY", 3)
+    hashes = [f"hash{i:03d}" for i in range(5 * TORBOX_CHUNK_SIZE)]
+    session = SlowSession()
+    out = await check_torbox_cache(session, hashes)
+    assert len(out) == len(hashes)
+    assert len(session.payloads) == 5
+    assert session.max_in_flight == 3
+
+
+@pytest.mark.asyncio
+async def test_check_torbox_cache_401_cancels_pending_chunks(monkeypatch):
+    import main
+    monkeypatch.setattr(main, "TORBOX_CONCURRENCY", 2)
+    hashes = [f"hash{i:03d}" for i in range(4 * TORBOX_CHUNK_SIZE)]
+    session = SlowSession(status_for=lambda chunk: 401 if chunk[0] == "hash000" else 200)
+    out = await check_torbox_cache(session, hashes)
+    assert out == {}
+    # The 401 aborts before the slow chunks finish or later chunks are sent
+    assert session.completed == 0
+    assert len(session.payloads) == 2
+
+
+@pytest.mark.asyncio
+async def test_check_torbox_cache_batches_concurrent_callers():
+    import main
+    session = SlowSession(delay=0)
+    first = [f"a{i:03d}" for i in range(30)]
+    second = [f"b{i:03d}" for i in range(30)] + ["a000"]
+    out_a, out_b = await asyncio.gather(
+        check_torbox_cache(session, first),
+        check_torbox_cache(session, second),
+    )
+    # Both searches share a single deduplicated Torbox request
+    assert len(session.payloads) == 1
+    assert len(session.payloads[0]) == 60
+    # ...but each only gets the statuses it asked for
+    assert set(out_a) == set(first)
+    assert set(out_b) == set(second)
+    assert main.METRICS["torbox_batches"] == 1
+    assert main.METRICS["torbox_batched_callers"] == 2
+
+
+@pytest.mark.asyncio
+async def test_batcher_sends_a_lone_search_without_waiting_for_the_window(monkeypatch):
+    import main
+    monkeypatch.setattr(main, "TORBOX_BATCHER", main.TorboxBatcher(window=1.0))
+    started = asyncio.get_running_loop().time()
+    out = await check_torbox_cache(SlowSession(delay=0), ["abc123"])
+    assert out == {"abc123": True}
+    assert asyncio.get_running_loop().time() - started < 0.2
+
+
+@pytest.mark.asyncio
+async def test_batcher_flushes_full_chunks_and_skips_abandoned_hashes(monkeypatch):
+    import main
+    monkeypatch.setattr(main, "TORBOX_BATCHER", main.TorboxBatcher(window=1.0))
+    session = SlowSession(delay=0.1)
+    loop = asyncio.get_running_loop()
+    first = asyncio.create_task(check_torbox_cache(session, ["first"]))
+    await asyncio.sleep(0.01)
+    # A batch is in flight, so these wait for the window...
+    abandoned = asyncio.create_task(check_torbox_cache(session, ["abandoned"]))
+    await asyncio.sleep(0.01)
+    abandoned.cancel()
+    # ...until a full chunk is queued
+    started = loop.time()
+    full = [f"full{i:03d}" for i in range(TORBOX_CHUNK_SIZE)]
+    out = await check_torbox_cache(session, full)
+    assert loop.time() - started < 0.5
+    assert set(out) == set(full)
+    await first
+    assert session.payloads == [["first"], full]
+
+
+@pytest.mark.asyncio
+async def test_check_torbox_cache_coalesces_in_flight_hashes(monkeypatch):
+    import main
+    monkeypatch.setattr(main, "TORBOX_BATCHER", None)
+    session = SlowSession(delay=0.05)
+    first = asyncio.create_task(check_torbox_cache(session, ["shared", "only_a"]))
+    await asyncio.sleep(0.01)
+    out_b = await check_torbox_cache(session, ["SHARED", "only_b"])
+    out_a = await first
+    # The second search only sends the hash nobody else is looking up
+    assert session.payloads == [["shared", "only_a"], ["only_b"]]
+    assert out_a == {"shared": True, "only_a": True}
+    assert out_b == {"shared": True, "only_b": True}
+    assert main.METRICS["torbox_coalesced"] == 1
+    assert main._TORBOX_INFLIGHT == {}
+
+
+@pytest.mark.asyncio
+async def test_joiners_treat_hashes_of_a_failed_leader_as_unknown(monkeypatch):
+    import main
+    monkeypatch.setattr(main, "TORBOX_BATCHER", None)
+    monkeypatch.setattr(main, "TORBOX_RETRY_BACKOFF", 0)
+    main.TORBOX_STATUS_CACHE.store(["shared"], {"shared": True}, now=main.time.time() - 2 * main.TORBOX_CACHE_POSITIVE_TTL)
+    session = SlowSession(delay=0.02, status_for=lambda chunk: 503 if "only_a" in chunk else 200)
+    first = asyncio.create_task(check_torbox_cache(session, ["shared", "only_a"]))
+    await asyncio.sleep(0.01)
+    out_b = await check_torbox_cache(session, ["shared", "only_b"])
+    out_a = await first
+    assert main.METRICS["torbox_coalesced"] == 1
+    # Neither search reports "shared" as uncached: both fall back to its stale entry
+    assert out_a == {"shared": True} and out_a.stale == {"shared"}
+    assert out_b == {"shared": True, "only_b": True} and out_b.stale == {"shared"}
+    assert out_b.unknown == {"shared"}
+
+
+@pytest.mark.asyncio
+async def test_check_torbox_cache_retries_429_after_retry_after(monkeypatch):
+    import main
+    session = FakeSession([(429, {}, {"Retry-After": "0.05"}), (200, {"abc123": True})])
+    out = await check_torbox_cache(session, ["ABC123"])
+    assert out == {"abc123": True}
+    assert main.METRICS["torbox_throttled"] == 1
+    assert main.METRICS["torbox_requests"] == 2
+
+
+@pytest.mark.asyncio
+async def test_check_torbox_cache_gives_up_when_retry_after_exceeds_budget(monkeypatch):
+    import main
+    monkeypatch.setattr(main, "TORBOX_RETRY_BUDGET", 0.5)
+    session = FakeSession([(429, {}, {"Retry-After": "30"}), (200, {"abc123": True})])
+    started = asyncio.get_running_loop().time()
+    out = await check_torbox_cache(session, ["ABC123"])
+    assert out == {}
+    assert asyncio.get_running_loop().time() - started < 0.5
+    assert main.METRICS["torbox_budget_exhausted"] == 1
+    # The limiter now holds back every Torbox caller
+    assert not await main.TORBOX_RATE_LIMITER.acquire(deadline=main.time.monotonic() + 1)
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_limits_rate_and_respects_deadline():
+    from main import TokenBucket
+    import time
+    bucket = TokenBucket(rate=20, capacity=2)
+    assert await bucket.acquire()
+    assert await bucket.acquire()
+    # The bucket is empty: the next token is ~50ms away
+    assert not await bucket.acquire(deadline=time.monotonic() + 0.01)
+    started = time.monotonic()
+    assert await bucket.acquire(deadline=time.monotonic() + 1)
+    assert time.monotonic() - started >= 0.03
+
+
+def test_parse_retry_after():
+    from main import _parse_retry_after
+    assert _parse_retry_after({"Retry-After": "3"}) == 3.0
+    assert _parse_retry_after({"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}) == 0.0
+    assert _parse_retry_after({}) is None
+    assert _parse_retry_after(None) is None
+
+
+@pytest.mark.asyncio
+async def test_check_torbox_cache_breaker_opens_and_serves_stale(monkeypatch):
+    import main
+    monkeypatch.setattr(main, "TORBOX_RETRY_BACKOFF", 0)
+    monkeypatch.setattr(main, "TORBOX_BREAKER", main.CircuitBreaker("torbox", 3, 5.0, 30))
+    # abc123 was cached on Torbox a while ago; its entry has since expired
+    main.TORBOX_STATUS_CACHE.store(["abc123"], {"abc123": True}, now=main.time.time() - 2 * main.TORBOX_CACHE_POSITIVE_TTL)
+    session = FakeSession([(503, {})])
+    out = await check_torbox_cache(session, ["ABC123", "DEF456"])
+    assert out == {"abc123": True}
+    assert out.stale == {"abc123"}
+    assert main.TORBOX_BREAKER.state == "open"
+    # While open, searches don't touch Torbox at all
+    session.last_payload = None
+    out = await check_torbox_cache(session, ["ABC123"])
+    assert session.last_payload is None
+    assert out == {"abc123": True} and out.stale == {"abc123"}
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_half_open_probe(monkeypatch):
+    from main import CircuitBreaker
+    breaker = CircuitBreaker("test", 2, 1.0, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+    await asyncio.sleep(0.06)
+    # One probe is let through; a slow probe re-opens the breaker
+    assert breaker.allow() and breaker.state == "half-open"
+    assert not breaker.allow()
+    breaker.record_success(latency=2.0)
+    assert breaker.state == "open"
+    await asyncio.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success(latency=0.1)
+    assert breaker.state == "closed" and breaker.allow()
+
+
+async def _half_open_breaker(main, monkeypatch):
+    breaker = main.CircuitBreaker("torbox", 1, 5.0, reset_timeout=0.01)
+    monkeypatch.setattr(main, "TORBOX_BREAKER", breaker)
+    breaker.record_failure()
+    await asyncio.sleep(0.02)
+    return breaker
+
+
+@pytest.mark.asyncio
+async def test_cancelled_breaker_probe_frees_the_probe_slot(monkeypatch):
+    import main
+    monkeypatch.setattr(main, "TORBOX_BATCHER", None)
+    breaker = await _half_open_breaker(main, monkeypatch)
+    session = SlowSession(delay=5)
+    search = asyncio.create_task(check_torbox_cache(session, ["abc123"]))
+    while not session.in_flight:
+        await asyncio.sleep(0.001)
+    assert breaker.state == "half-open" and not breaker.allow()
+    search.cancel()
+    await asyncio.gather(search, return_exceptions=True)
+    # The next call may probe Torbox again
+    assert breaker.allow()
+
+
+@pytest.mark.asyncio
+async def test_breaker_probe_with_unparsable_body_counts_as_failure(monkeypatch):
+    import main
+    breaker = await _half_open_breaker(main, monkeypatch)
+
+    def not_json():
+        raise ValueError("Expecting value: line 1 column 1 (char 0)")
+
+    out = await check_torbox_cache(FakeSession([(200, not_json)]), ["abc123"])
+    assert out == {}
+    assert breaker.state == "open" and breaker.failures == 2
+    await asyncio.sleep(0.02)
+    assert breaker.allow()
+
+
+@pytest.mark.asyncio
+async def test_refresh_hot_torbox_statuses_rechecks_expiring_hot_entries(monkeypatch):
+    import main
+    cache = main.TORBOX_STATUS_CACHE
+    now = main.time.time()
+    hot = [f"hot{i:03d}" for i in range(TORBOX_CHUNK_SIZE)]
+    # Entries stored long ago are close to expiry
+    cache.store(hot + ["cold"], {h: True for h in hot}, now=now - main.TORBOX_CACHE_POSITIVE_TTL + 30)
+    # Due within the look-ahead window, but not before the next pass
+    cache.store(["partial"], {}, now=now - main.TORBOX_CACHE_NEGATIVE_TTL + 200)
+    cache.store(["fresh"], {"fresh": True}, now=now)
+    for _ in range(main.TORBOX_REFRESH_MIN_HITS):
+        cache.lookup(hot + ["fresh"])
+        cache.lookup(["partial"])
+    session = SlowSession(delay=0)
+    refreshed = await main.refresh_hot_torbox_statuses(session, now=now)
+    # One full chunk of hot, expiring hashes; "cold" was never searched, "fresh" isn't due,
+    # and the lone trailing "partial" can wait for the next pass
+    assert refreshed == TORBOX_CHUNK_SIZE
+    assert len(session.payloads) == 1 and sorted(session.payloads[0]) == sorted(hot)
+    assert cache.refresh_candidates(now + main.TORBOX_REFRESH_AHEAD, main.TORBOX_REFRESH_MIN_HITS) == [
+        ("partial", pytest.approx(now + 200))
+    ]
+    cache.decay_access()
+    assert all(n < main.TORBOX_REFRESH_MIN_HITS for n in cache.access.values())
+
+
+def test_torbox_status_cache_ttls_and_persistence(tmp_path):
+    from main import TorboxStatusCache
+    path = str(tmp_path / "cache.sqlite3")
+    cache = TorboxStatusCache(path, positive_ttl=100, negative_ttl=10)
+    cache.store(["pos", "neg"], {"pos": {"hash": "pos"}}, now=1000)
+    # A new instance on the same file sees the stored rows
+    reopened = TorboxStatusCache(path, positive_ttl=100, negative_ttl=10)
+    assert reopened.lookup(["pos", "neg"], now=1005) == ({"pos": {"hash": "pos"}}, [])
+    # The negative entry expires first
+    assert reopened.lookup(["pos", "neg"], now=1050) == ({"pos": {"hash": "pos"}}, ["neg"])
+    assert reopened.lookup(["pos", "neg"], now=1200) == ({}, ["pos", "neg"])
+
+
+def test_torbox_status_cache_counts_lookups_only_for_refresh_ahead():
+    from main import TorboxStatusCache
+    tracked = TorboxStatusCache(":memory:", track_access=True)
+    untracked = TorboxStatusCache(":memory:", track_access=False)
+    for cache in (tracked, untracked):
+        cache.lookup(["a", "b"])
+        cache.lookup(["a"])
+    assert tracked.access == {"a": 2, "b": 1}
+    # Nothing would ever decay these counts without the refresh-ahead loop
+    assert not untracked.access and untracked.stats()["tracked_hashes"] == 0
+
+
 def test_extract_info_hashes_order():
     # Create a fake prowlarr result with mixed-case infoHash and duplicates
     from main import extract_info_hashes
@@ -0,0 +1,102 @@
+import gzip
+import zlib
+
+import pytest
+
+import main
+from main import TorznabFeed, as_search_item, feed_response
+
+
+def sample_feed(cached=None):
+    items = [
+        as_search_item({
+            'infoHash': f'{i:040x}',
+            'title': f'Release {i}',
+            'magnetUri': f'magnet:?xt=urn:btih:{i:040x}&tr=udp://t{i}/announce',
+            'seeders': i,
+            'size': 1000 + i,
+            'publishDate': '2024-05-10T16:57:09Z',
+        })
+        for i in range(50)
+    ]
+    return TorznabFeed(items, cached or {})
+
+
+async def read_body(response):
+    return b''.join([chunk async for chunk in response.body_iterator])
+
+
+@pytest.mark.asyncio
+async def test_gzip_and_deflate_decode_to_the_identity_body():
+    feed = sample_feed()
+    plain = await read_body(feed_response(feed))
+    gz = feed_response(feed, {'accept-encoding': 'gzip, deflate'})
+    assert gz.headers['content-encoding'] == 'gzip'
+    assert gz.headers['vary'] == 'Accept-Encoding'
+    assert gzip.decompress(await read_body(gz)) == plain
+    deflated = feed_response(feed, {'accept-encoding': 'deflate'})
+    assert deflated.headers['content-encoding'] == 'deflate'
+    assert zlib.decompress(await read_body(deflated)) == plain
+    assert main.METRICS['feed_gzip'] == 1 and main.METRICS['feed_deflate'] == 1
+
+
+@pytest.mark.parametrize('accept, expected', [
+    (None, None),
+    ('identity', None),
+    ('gzip;q=0, deflate', 'deflate'),
+    ('deflate;q=0.5, gzip;q=0.8', 'gzip'),
+    ('gzip;q=0.2, deflate;q=0.9', 'deflate'),
+    ('*', 'gzip'),
+    ('*;q=0', None),
+    ('br', None),
+])
+def test_accept_encoding_negotiation(accept, expected):
+    assert main._negotiate_encoding(accept) == expected
+
+
+def test_compression_can_be_disabled(monkeypatch):
+    monkeypatch.setattr(main, 'PACHELARR_COMPRESSION_LEVEL', 0)
+    response = feed_response(sample_feed(), {'accept-encoding': 'gzip'})
+    assert 'content-encoding' not in response.headers
+
+
+def test_etag_is_stable_and_tracks_feed_inputs():
+    etag = sample_feed().etag()
+    assert etag.startswith('W/"')
+    assert sample_feed().etag() == etag
+    assert sample_feed({f'{1:040x}': True}).etag() != etag
+    assert TorznabFeed().etag() != etag
+
+
+@pytest.mark.asyncio
+async def test_matching_if_none_match_answers_304_without_rendering(monkeypatch):
+    feed = sample_feed()
+    first = feed_response(feed)
+    etag = first.headers['etag']
+    await read_body(first)
+    assert feed_response(TorznabFeed(), {'if-none-match': etag}).status_code == 200
+
+    def no_render(self):
+        raise AssertionError('feed rendered for a conditional hit')
+
+    monkeypatch.setattr(TorznabFeed, 'iter_xml', no_render)
+    for header in (etag, etag[2:], f'"other", {etag}', '*'):
+        response = feed_response(feed, {'if-none-match': header})
+        assert response.status_code == 304
+        assert response.headers['etag'] == etag
+        assert response.body == b''
+    assert main.METRICS['feed_not_modified'] == 4
+
+
+@pytest.mark.asyncio
+async def test_undated_items_render_the_date_the_etag_covers():
+    item = as_search_item({'infoHash': f'{1:040x}', 'title': 'Undated', 'magnetUri': f'magnet:?xt=urn:btih:{1:040x}'})
+    feed = TorznabFeed([item], {})
+    body = await read_body(feed_response(feed))
+    assert feed.created.strftime('%a, %d %b %Y %H:%M:%S GMT').encode() in body
+    assert await read_body(feed_response(feed)) == body
+    # A rebuilt feed renders a new pubDate, so it must not match the old ETag
+    later = TorznabFeed([item], {})
+    later.created = feed.created.replace(year=feed.created.year + 1)
+    assert later.etag() != feed.etag()
+    assert sample_feed().etag() == sample_feed().etag()
@@ -0,0 +1,71 @@
+from lxml import etree as ET
+
+import main
+from main import generate_torznab_xml, iter_torznab_xml
+
+
+def sample_items(n):
+    # Every item has a hash and a guid, so the parsed tree re-serializes identically
+    return [
+        {
+            'infoHash': f'{i:040x}',
+            'title': f'Amélie {i} – 東京 & <friends>',
+            'magnetUri': f'magnet:?xt=urn:btih:{i:040x}&tr=udp://t{i % 3}/announce',
+            'seeders': i,
+            'leechers': 1,
+            'size': 1000 + i,
+            'publishDate': '2024-05-10T16:57:09Z',
+        }
+        for i in range(n)
+    ]
+
+
+def test_streamed_feed_matches_whole_tree_serialization():
+    items = sample_items(300)
+    cached = {f'{i:040x}': True for i in range(0, 300, 2)}
+    chunks = list(iter_torznab_xml(items, cached, {f'{1:040x}': 50}))
+    assert len(chunks) > 1
+    xml = b''.join(chunks)
+    assert xml == generate_torznab_xml(items, cached, {f'{1:040x}': 50})
+    # Re-serializing the parsed document as one tree gives the same bytes
+    tree = ET.fromstring(xml)
+    assert ET.tostring(tree, pretty_print=True, xml_declaration=True, encoding='UTF-8') == xml
+    assert b'xmlns:torznab' not in xml.split(b'<item>', 1)[1]
+    assert len(tree.findall('.//item')) == 300
+
+
+def test_compact_feed_is_the_same_document_without_whitespace():
+    items = sample_items(5)
+    pretty = generate_torznab_xml(items, {}, pretty=True)
+    compact = generate_torznab_xml(items, {}, pretty=False)
+    parser = ET.XMLParser(remove_blank_text=True)
+    assert compact == ET.tostring(ET.fromstring(pretty, parser), xml_declaration=True, encoding='UTF-8')
+    assert len(compact) < len(pretty)
+
+
+def test_empty_feed_envelope():
+    xml = generate_torznab_xml([], {})
+    assert xml == (
+        b"<?xml version='1.0' encoding='UTF-8'?>\n"
+        b'<rss xmlns:torznab="http://torznab.com/schemas/2015/feed" version="2.0">\n'
+        b'  <channel>\n    <title>Torbox Cached Indexer</title>\n  </channel>\n</rss>\n'
+    )
+    assert main.TorznabFeed().iter_xml().__next__() == main.create_empty_rss()
+
+
+def test_rendering_does_not_modify_the_items():
+    # Unconsolidated items (as cached by the Prowlarr search cache) are shared between requests
+    items = [main.as_search_item(item) for item in sample_items(4)]
+    items.append(main.as_search_item({
+        'infoHash': f'{1:040x}', 'title': 'dupe', 'seeders': 9,
+        'magnetUri': f'magnet:?xt=urn:btih:{1:040x}&tr=udp://other/announce',
+    }))
+    # Hashless items pass through consolidation as the shared originals
+    items.append(main.as_search_item({'title': 'No hash', 'magnetUri': 'magnet:?dn=nohash', 'seeders': 1}))
+    consolidated = main.consolidate_all_items(items, {})
+    # ...and so are consolidated results, between coalesced requests rendering the same feed
+    for results in (items, consolidated):
+        before = [item.as_dict() for item in results]
+        first = generate_torznab_xml(results, {})
+        assert [item.as_dict() for item in results] == before
+        assert generate_torznab_xml(results, {}) == first
@@ -0,0 +1,57 @@
+import pytest
+from aiohttp import web
+
+import main
+
+
+@pytest.mark.asyncio
+async def test_upstream_clients_reuse_connections():
+    async def ok(request):
+        return web.json_response({"ok": True})
+
+    app = web.Application()
+    app.router.add_get("/", ok)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    clients = main.UpstreamClients({"prowlarr": {"limit": 4, "timeout": 5}})
+    try:
+        session = clients.get("prowlarr")
+        assert clients.get("prowlarr") is session
+        for _ in range(3):
+            async with session.get(f"http://127.0.0.1:{port}/") as resp:
+                assert (await resp.json()) == {"ok": True}
+        stats = clients.stats()["prowlarr"]
+        assert stats["requests"] == 3
+        assert stats["connections_created"] == 1
+        assert stats["connections_reused"] == 2
+    finally:
+        await clients.close()
+        await runner.cleanup()
+    assert session.closed
+
+
+def test_upstream_clients_refuse_to_switch_event_loops():
+    import asyncio
+
+    clients = main.UpstreamClients({"tmdb": {"limit": 1, "timeout": 1}})
+
+    async def get():
+        return clients.get("tmdb")
+
+    first, second = asyncio.new_event_loop(), asyncio.new_event_loop()
+    try:
+        session = first.run_until_complete(get())
+        # Replacing the session here would leak its connector
+        with pytest.raises(RuntimeError):
+            second.run_until_complete(get())
+        first.run_until_complete(clients.close())
+        assert session.closed
+        replacement = second.run_until_complete(get())
+        assert replacement is not session
+        second.run_until_complete(clients.close())
+    finally:
+        first.close()
+        second.close()
@@ -0,0 +1,160 @@
+"""Offline TMDB ID -> title index built from TMDB's daily ID exports.
+
+TMDB publishes gzipped JSON-lines files listing every movie and TV series ID
+with its original title (https://developer.themoviedb.org/docs/daily-id-exports).
+`build_index` packs those into one sorted binary file, and `TitleIndex`
+memory-maps it and answers lookups with a binary search, so resolving a TMDB
+ID costs neither a network round-trip nor loading the export into memory.
+
+File layout: the magic, a little-endian uint32 record count, fixed-size
+records sorted by key, then the UTF-8 titles. A record holds the key (kind
+in the high 32 bits, TMDB ID in the low 32), the title offset into the title
+area and its length in bytes.
+
+Usage: python tmdb_index.py OUTPUT movie_ids_MM_DD_YYYY.json.gz tv_series_ids_MM_DD_YYYY.json.gz
+"""
+import gzip
+import json
+import mmap
+import os
+import shutil
+import struct
+import sys
+from array import array
+from typing import Iterable, Optional
+
+MAGIC = b'PTMDBIX1'
+_HEADER = struct.Struct('<I')
+_RECORD = struct.Struct('<QIH')
+_MAX_TITLE_BYTES = 0xFFFF
+_ROW_MASK = (1 << 31) - 1
+
+KINDS = {'movie': 0, 'tv': 1}
+# Export files are named after what they list, e.g. movie_ids_05_15_2024.json.gz
+_EXPORT_PREFIXES = (('movie_ids', 'movie'), ('tv_series_ids', 'tv'))
+
+
+def export_kind(path):
+    """Returns 'movie' or 'tv' for a TMDB export file name, or None for other exports."""
+    name = os.path.basename(path)
+    for prefix, kind in _EXPORT_PREFIXES:
+        if name.startswith(prefix):
+            return kind
+    return None
+
+
+def _read_export(path):
+    """Yields (tmdb_id, title) from one gzipped JSON-lines export, skipping bad lines."""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue
+            title = row.get('original_title') or row.get('original_name')
+            tmdb_id = row.get('id')
+            if title and isinstance(tmdb_id, int) and 0 <= tmdb_id < 2 ** 32:
+                yield tmdb_id, title
+
+
+def build_index(exports: Iterable[str], output: str) -> int:
+    """Writes the index for the movie/TV `exports` to `output`; returns the entry count.
+
+    The file is written next to `output` and renamed into place, so readers
+    never see a partial index. Other export types are ignored, and a later
+    row for the same ID wins.
+
+    The exports list well over a million titles, so they are not held in
+    memory: titles are spooled to a scratch file as they are read and only
+    two packed integers per row are kept for sorting.
+    """
+    tmp, spool_path = f"{output}.tmp", f"{output}.titles.tmp"
+    # rows[n] = key << 31 | n sorts by key, then by row; spans[n] = spooled title offset << 16 | length
+    rows, spans = array('Q'), array('Q')
+    try:
+        with open(spool_path, 'w+b') as spool:
+            offset = 0
+            for path in exports:
+                kind = export_kind(path)
+                if kind is None:
+                    continue
+                high = KINDS[kind] << 32
+                for tmdb_id, title in _read_export(path):
+                    title = title.encode('utf-8')[:_MAX_TITLE_BYTES]
+                    if len(rows) > _ROW_MASK or offset + len(title) > 0xFFFFFFFF:
+                        raise ValueError("TMDB exports are too large to index")
+                    spans.append(offset << 16 | len(title))
+                    rows.append((high | tmdb_id) << 31 | len(rows))
+                    spool.write(title)
+                    offset += len(title)
+            rows = array('Q', sorted(rows))
+            last = len(rows) - 1
+            count = sum(1 for i in range(len(rows)) if i == last or rows[i] >> 31 != rows[i + 1] >> 31)
+            with open(tmp, 'wb') as f:
+                f.write(MAGIC)
+                f.write(_HEADER.pack(count))
+                for i, row in enumerate(rows):
+                    if i == last or row >> 31 != rows[i + 1] >> 31:
+                        span = spans[row & _ROW_MASK]
+                        f.write(_RECORD.pack(row >> 31, span >> 16, span & 0xFFFF))
+                # Superseded titles stay in the title area, unreferenced
+                spool.seek(0)
+                shutil.copyfileobj(spool, f)
+        os.replace(tmp, output)
+    finally:
+        for path in (spool_path, tmp):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    return count
+
+
+class TitleIndex:
+    """Read-only, memory-mapped view of an index written by build_index."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not a TMDB title index")
+        (self._count,) = _HEADER.unpack_from(self._map, len(MAGIC))
+        self._records = len(MAGIC) + _HEADER.size
+        self._titles = self._records + self._count * _RECORD.size
+
+    def __len__(self):
+        return self._count
+
+    def get(self, kind: str, tmdb_id) -> Optional[str]:
+        """Returns the original title for a 'movie' or 'tv' TMDB ID, or None."""
+        try:
+            high, tmdb_id = KINDS[kind] << 32, int(tmdb_id)
+        except (KeyError, TypeError, ValueError):
+            return None
+        if not 0 <= tmdb_id < 2 ** 32:
+            return None
+        key = high | tmdb_id
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            found, offset, length = _RECORD.unpack_from(self._map, self._records + mid * _RECORD.size)
+            if found < key:
+                lo = mid + 1
+            elif found > key:
+                hi = mid
+            else:
+                start = self._titles + offset
+                return self._map[start:start + length].decode('utf-8', 'ignore')
+        return None
+
+    def close(self):
+        self._map.close()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        sys.exit(__doc__.rsplit('Usage: ', 1)[1])
+    count = build_index(sys.argv[2:], sys.argv[1])
+    print(f"Wrote {count} titles to {sys.argv[1]}")